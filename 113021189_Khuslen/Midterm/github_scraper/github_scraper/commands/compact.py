@@ -0,0 +1,67 @@
+import glob
+import os
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.exporters import XmlItemExporter
+from scrapy.utils.project import data_path
+
+from ..state import CONTENT_FIELDS, DELTA_DIR, RepoState
+
+
+class Command(ScrapyCommand):
+    # scrapy compact [-o repositories.xml] [--keep-deltas]
+    #
+    # Rebuilds the full snapshot from the crawl-state store, the same feed
+    # github_spider used to rewrite on every run, then drops the tombstones
+    # of deleted repositories and the delta feeds the snapshot now covers.
+
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options]'
+
+    def short_desc(self):
+        return 'Rebuild the full repositories feed from the crawl state and delta feeds'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('-o', '--output', default='repositories.xml',
+                            help='snapshot file to write (default: repositories.xml)')
+        parser.add_argument('--keep-deltas', action='store_true',
+                            help='keep the delta feeds and the deleted repositories')
+
+    def run(self, args, opts):
+        if args:
+            raise UsageError()
+        state_file = data_path(self.settings.get('REPO_STATE_FILE', 'repo_state.db'))
+        if not os.path.exists(state_file):
+            raise UsageError(f'no crawl state at {state_file}; run `scrapy crawl github_spider` first')
+        deltas = sorted(glob.glob(os.path.join(DELTA_DIR, 'repositories-*.xml')))
+
+        state = RepoState(state_file)
+        try:
+            # Written next to the output and renamed over it, so readers never
+            # see a half-written snapshot.
+            partial = opts.output + '.partial'
+            count = 0
+            with open(partial, 'wb') as f:
+                exporter = XmlItemExporter(f, item_element='repository', root_element='repositories',
+                                           fields_to_export=list(CONTENT_FIELDS), encoding='utf-8')
+                exporter.start_exporting()
+                for item in state.snapshot():
+                    exporter.export_item(item)
+                    count += 1
+                exporter.finish_exporting()
+            os.replace(partial, opts.output)
+            purged = 0
+            if not opts.keep_deltas:
+                purged = state.purge_deleted()
+                for path in deltas:
+                    os.remove(path)
+        finally:
+            state.close()
+
+        print(f'{opts.output}: {count} repositories from {len(deltas)} delta feeds'
+              + ('' if opts.keep_deltas else f', {purged} deleted repositories purged'))
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.project import data_path
+
+from ..frontier import AccountFrontier, read_accounts
+
+
+class Command(ScrapyCommand):
+    # scrapy crawlshards [--workers 4] [--accounts FILE] [--jobdir jobs] [-a NAME=VALUE] [spider]
+    #
+    # Crawls the due accounts of the frontier with one `scrapy crawl` process
+    # per shard. An account's shard only depends on its login and the number
+    # of workers, so the processes never share an account and a rerun sends
+    # every account to the same process as before.
+    #
+    # Each process keeps its request queue in its own JOBDIR under --jobdir:
+    # press Ctrl-C once to pause and run the same command again to resume.
+    # A shard that finishes deletes its JOBDIR, so the next run starts fresh.
+    # A different --workers moves accounts between shards, so let a paused
+    # crawl finish (or delete --jobdir) before changing it.
+
+    requires_project = True
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options] [spider]'
+
+    def short_desc(self):
+        return 'Crawl the account frontier with one process per shard'
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument('--workers', type=int, default=4, help='worker processes (default: 4)')
+        parser.add_argument('--accounts', metavar='FILE', help='add the logins in FILE to the frontier first')
+        parser.add_argument('--jobdir', default='jobs',
+                            help='directory for the JOBDIR and log of every worker (default: jobs)')
+        parser.add_argument('-a', dest='spargs', action='append', default=[], metavar='NAME=VALUE',
+                            help='spider argument passed to every worker')
+
+    def run(self, args, opts):
+        if len(args) > 1:
+            raise UsageError()
+        if opts.workers < 1:
+            raise UsageError('--workers must be at least 1')
+        spider = args[0] if args else 'github_spider'
+
+        # Loaded here once rather than by every worker.
+        frontier = AccountFrontier(data_path(self.settings.get('FRONTIER_FILE', 'frontier.db')))
+        try:
+            added = frontier.add(read_accounts(opts.accounts)) if opts.accounts else 0
+            added += frontier.drain_queue()
+            revisit = self.settings.getfloat('FRONTIER_REVISIT_HOURS', 24) * 3600
+            due = [len(frontier.due(shard, opts.workers, revisit)) for shard in range(opts.workers)]
+        finally:
+            frontier.close()
+        print(f'{added} accounts added; due per shard: {", ".join(map(str, due))}')
+
+        os.makedirs(opts.jobdir, exist_ok=True)
+        workers = []
+        for shard in range(opts.workers):
+            name = os.path.join(opts.jobdir, f'{spider}-{shard}-of-{opts.workers}')
+            command = [sys.executable, '-m', 'scrapy', 'crawl', spider,
+                       '-a', 'frontier=1', '-a', f'shard={shard}', '-a', f'shards={opts.workers}',
+                       '-s', f'JOBDIR={name}', '--logfile', f'{name}.log']
+            for arg in opts.spargs:
+                command += ['-a', arg]
+            for setting in opts.set:
+                command += ['-s', setting]
+            workers.append(subprocess.Popen(command))
+
+        # Ctrl-C reaches the workers too; they close down gracefully, saving
+        # their queues, while this process keeps waiting for them.
+        codes = []
+        for worker in workers:
+            while True:
+                try:
+                    codes.append(worker.wait())
+                    break
+                except KeyboardInterrupt:
+                    print('Pausing; run the same command again to resume', file=sys.stderr)
+        for shard, code in enumerate(codes):
+            if code:
+                print(f'shard {shard} failed with exit code {code}, see its log in {opts.jobdir}', file=sys.stderr)
+                self.exitcode = 1
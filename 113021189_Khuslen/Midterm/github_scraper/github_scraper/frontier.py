@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+
+def shard_key(login):
+    # A stable 32-bit hash of the login; account belongs to shard
+    # shard_key % shards in every process and every run.
+    return int.from_bytes(hashlib.sha1(login.lower().encode('utf-8')).digest()[:4], 'big')
+
+
+def read_accounts(path):
+    # One login per line; blank lines and # comments are skipped.
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            login = line.split('#', 1)[0].strip()
+            if login:
+                yield login
+
+
+class AccountFrontier:
+    # The accounts to crawl, kept between runs and shared by every worker
+    # process. Accounts are added from a file (-a accounts=FILE, or
+    # `scrapy crawlshards --accounts FILE`) or by other programs inserting
+    # logins into the account_queue table:
+    #
+    #   INSERT INTO account_queue (login) VALUES ('octocat');
+    #
+    # Accounts are due once their listing was last crawled more than the
+    # revisit interval ago, stalest first and never crawled before that.
+    # The listing page an account has reached is saved as it goes, so an
+    # interrupted crawl resumes where it left off.
+
+    def __init__(self, path):
+        # Every worker process writes to the same file; WAL lets them read
+        # while another writes and the timeout waits out each other's writes.
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS accounts (
+                login TEXT PRIMARY KEY COLLATE NOCASE,
+                shard_key INTEGER NOT NULL,
+                added REAL NOT NULL,
+                last_crawled REAL,
+                next_page TEXT,
+                run INTEGER,
+                failures INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS accounts_staleness ON accounts (last_crawled);
+            CREATE TABLE IF NOT EXISTS account_queue (
+                id INTEGER PRIMARY KEY,
+                login TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def add(self, logins):
+        # Adds the accounts that are not in the frontier yet; returns how many.
+        now = time.time()
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO accounts (login, shard_key, added) VALUES (?, ?, ?)",
+                ((login, shard_key(login), now) for login in logins))
+            return self.conn.total_changes - before
+
+    def drain_queue(self):
+        # Moves the logins waiting in account_queue into the frontier.
+        with self.conn:
+            rows = self.conn.execute("SELECT id, login FROM account_queue ORDER BY id").fetchall()
+            if not rows:
+                return 0
+            self.conn.execute("DELETE FROM account_queue WHERE id <= ?", (rows[-1][0],))
+        return self.add(login.strip() for _, login in rows if login.strip())
+
+    def due(self, shard=0, shards=1, revisit=24 * 3600):
+        # (login, next_page, run) for the accounts of this shard that are due,
+        # accounts with an interrupted listing first, then the stalest.
+        return self.conn.execute("""
+            SELECT login, next_page, run FROM accounts
+            WHERE shard_key % ? = ?
+              AND (next_page IS NOT NULL OR last_crawled IS NULL OR last_crawled <= ?)
+            ORDER BY next_page IS NULL, last_crawled IS NOT NULL, last_crawled, login
+        """, (shards, shard, time.time() - revisit)).fetchall()
+
+    def start(self, login, run):
+        with self.conn:
+            self.conn.execute("UPDATE accounts SET run = ? WHERE login = ?", (run, login))
+
+    def advance(self, login, next_page):
+        # The listing page to resume the account from.
+        with self.conn:
+            self.conn.execute("UPDATE accounts SET next_page = ? WHERE login = ?", (next_page, login))
+
+    def finish(self, login, failed=False):
+        # The account's listing is done, or failed; either way it goes to
+        # the back of the frontier until its next revisit.
+        with self.conn:
+            self.conn.execute("""
+                UPDATE accounts SET last_crawled = ?, next_page = NULL, run = NULL,
+                    failures = CASE WHEN ? THEN failures + 1 ELSE 0 END
+                WHERE login = ?
+            """, (time.time(), failed, login))
+
+    def close(self):
+        self.conn.close()
@@ -7,4 +7,5 @@ class RepositoryItem:
     about: str                  
     last_updated: str          
     languages: Optional[List[str]] = None  
-    commits: Optional[int] = None 
\ No newline at end of file
+    commits: Optional[int] = None
+    change: Optional[str] = None  # 'new', 'changed' or 'deleted' in the delta feed 
\ No newline at end of file
@@ -0,0 +1,70 @@
+import json
+import re
+from urllib.parse import parse_qs, urlparse
+
+# Repository metadata from the GitHub API rather than the repository's HTML
+# page, by far the largest page github_spider downloads:
+#
+# - description and languages for a batch of repositories in one GraphQL
+#   query, an aliased repository() field per repository;
+# - the commit count from GET /repos/{owner}/{repo}/commits?per_page=1, whose
+#   rel="last" link points at page N of N one-commit pages. The body holds a
+#   single commit, and an empty repository answers 409.
+
+LANGUAGES_FIRST = 10
+
+_last_link = re.compile(r'<([^>]*)>\s*;\s*rel="last"')
+
+
+def owner_and_name(url):
+    # ('owner', 'repo') from https://github.com/owner/repo.
+    owner, name = urlparse(url).path.strip('/').split('/')[:2]
+    return owner, name
+
+
+def graphql_query(urls):
+    # The repository at urls[i] is aliased r<i> in the response.
+    fields = []
+    for i, url in enumerate(urls):
+        owner, name = owner_and_name(url)
+        # JSON string literals are valid GraphQL strings.
+        fields.append(
+            f'  r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{\n'
+            f'    description\n'
+            f'    languages(first: {LANGUAGES_FIRST}, orderBy: {{field: SIZE, direction: DESC}}) {{ nodes {{ name }} }}\n'
+            f'  }}')
+    return 'query {\n' + '\n'.join(fields) + '\n}'
+
+
+def graphql_results(data, count):
+    # One dict (description, languages) per repository of the query, or
+    # None for a repository that could not be resolved.
+    repositories = (data.get('data') or {})
+    results = []
+    for i in range(count):
+        repo = repositories.get(f'r{i}')
+        if repo is None:
+            results.append(None)
+            continue
+        nodes = (repo.get('languages') or {}).get('nodes') or []
+        results.append({
+            'description': repo.get('description'),
+            'languages': [node['name'] for node in nodes] or None,
+        })
+    return results
+
+
+def commits_url(api_url, url):
+    owner, name = owner_and_name(url)
+    return f'{api_url}/repos/{owner}/{name}/commits?per_page=1'
+
+
+def commit_count(status, link, body):
+    # Commit count from a commits?per_page=1 response.
+    if status == 409:
+        return 0
+    match = _last_link.search(link or '')
+    if match:
+        return int(parse_qs(urlparse(match.group(1)).query)['page'][0])
+    # No rel="last": everything fit on this one page.
+    return len(json.loads(body))
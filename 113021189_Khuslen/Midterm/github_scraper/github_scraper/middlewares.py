@@ -3,7 +3,12 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
+from email.utils import parsedate_to_datetime
+
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -101,3 +106,169 @@ class GithubScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class DomainThrottle:
+    # What AdaptiveThrottleMiddleware knows about one download slot
+    # (normally one host).
+    def __init__(self, key, target):
+        self.key = key
+        self.slot = None
+        self.delay = None
+        self.target = target
+        self.backoff_until = 0.0
+
+
+class AdaptiveThrottleMiddleware:
+    # Replaces a fixed DOWNLOAD_DELAY with a delay per domain that follows
+    # the server:
+    # - like AutoThrottle, the delay moves towards latency / target
+    #   concurrency, so about that many requests are in flight per domain,
+    #   and each domain's slot never has more than its concurrency limit
+    #   transferring at once;
+    # - a 429, or a 403 with X-RateLimit-Remaining: 0, halves the domain's
+    #   target concurrency, waits at least Retry-After (or until
+    #   X-RateLimit-Reset) and retries the request; the target then grows
+    #   back by one per window of successful responses;
+    # - X-RateLimit-Remaining/X-RateLimit-Reset spread the remaining requests
+    #   over the time left until the reset instead of spending them at once.
+    # It adjusts the downloader slots the same way the AutoThrottle extension
+    # does, so the two should not be enabled together.
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_THROTTLE_ENABLED"):
+            raise NotConfigured
+        if settings.getbool("AUTOTHROTTLE_ENABLED"):
+            raise NotConfigured("AdaptiveThrottleMiddleware and AutoThrottle both set download delays")
+        self.crawler = crawler
+        self.start_delay = settings.getfloat("ADAPTIVE_THROTTLE_START_DELAY", 1.0)
+        self.min_delay = settings.getfloat("ADAPTIVE_THROTTLE_MIN_DELAY", 0.0)
+        self.max_delay = settings.getfloat("ADAPTIVE_THROTTLE_MAX_DELAY", 60.0)
+        self.target_concurrency = settings.getfloat("ADAPTIVE_THROTTLE_TARGET_CONCURRENCY", 4.0)
+        self.max_concurrency = settings.getint("ADAPTIVE_THROTTLE_MAX_CONCURRENCY", 8)
+        self.domain_concurrency = settings.getdict("ADAPTIVE_THROTTLE_DOMAIN_CONCURRENCY")
+        self.max_retries = settings.getint("ADAPTIVE_THROTTLE_MAX_RETRIES", 5)
+        self.debug = settings.getbool("ADAPTIVE_THROTTLE_DEBUG")
+        self.domains = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        return s
+
+    def _throttle(self, request):
+        # Returns the domain's state and its downloader slot, or None for the
+        # slot before the downloader created it. Slots are dropped when they
+        # go idle, so a new one gets the delay learned so far.
+        key = request.meta.get("download_slot") or urlparse_cached(request).hostname or ""
+        throttle = self.domains.get(key)
+        if throttle is None:
+            throttle = self.domains[key] = DomainThrottle(key, self.target_concurrency)
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None and slot is not throttle.slot:
+            throttle.slot = slot
+            slot.delay = self.start_delay if throttle.delay is None else throttle.delay
+            slot.concurrency = self.domain_concurrency.get(key, self.max_concurrency)
+        return throttle, slot
+
+    def process_request(self, request, spider):
+        self._throttle(request)
+        return None
+
+    def process_response(self, request, response, spider):
+        throttle, slot = self._throttle(request)
+        if slot is None:
+            return response
+
+        if self._rate_limited(response):
+            return self._back_off(request, response, spider, throttle, slot)
+
+        delay = slot.delay
+        latency = request.meta.get("download_latency")
+        if latency is not None and response.status < 400:
+            throttle.target = min(self.target_concurrency, throttle.target + 1 / throttle.target)
+            target_delay = latency / throttle.target
+            # Slow down at once, speed up gradually.
+            delay = max(target_delay, (slot.delay + target_delay) / 2)
+        delay = max(delay, self._quota_delay(response))
+        self._set_delay(throttle, slot, delay, latency, response, spider)
+        return response
+
+    def _rate_limited(self, response):
+        return response.status == 429 or (
+            response.status == 403 and response.headers.get("X-RateLimit-Remaining") == b"0")
+
+    def _back_off(self, request, response, spider, throttle, slot):
+        stats = self.crawler.stats
+        now = time.time()
+        # Responses to requests that were already in flight when the first
+        # 429 arrived are retried without backing off again.
+        if now >= throttle.backoff_until:
+            throttle.target = max(1.0, throttle.target / 2)
+            wait = self._retry_after(response)
+            delay = max(wait or 0.0, slot.delay * 2, self.start_delay)
+            self._set_delay(throttle, slot, delay, None, response, spider)
+            throttle.backoff_until = now + slot.delay
+            stats.inc_value("adaptive_throttle/backoffs", spider=spider)
+
+        retries = request.meta.get("throttle_retry_times", 0) + 1
+        if retries > self.max_retries:
+            stats.inc_value("adaptive_throttle/gave_up", spider=spider)
+            spider.logger.warning("Gave up on %s after %d rate-limited attempts", request.url, retries)
+            return response
+        stats.inc_value("adaptive_throttle/retries", spider=spider)
+        retry = request.copy()
+        retry.meta["throttle_retry_times"] = retries
+        retry.dont_filter = True
+        return retry
+
+    @staticmethod
+    def _retry_after(response):
+        # Seconds to wait from Retry-After (seconds or an HTTP date), or from
+        # X-RateLimit-Reset (epoch seconds); None if neither is given.
+        value = response.headers.get("Retry-After")
+        if value:
+            value = value.decode("latin-1").strip()
+            if value.isdigit():
+                return float(value)
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+        reset = response.headers.get("X-RateLimit-Reset")
+        if reset and reset.isdigit():
+            return max(0.0, int(reset) - time.time())
+        return None
+
+    @staticmethod
+    def _quota_delay(response):
+        # The delay that makes the remaining quota last until it resets.
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if not (remaining and reset and remaining.isdigit() and reset.isdigit()):
+            return 0.0
+        return max(0.0, int(reset) - time.time()) / (int(remaining) + 1)
+
+    def _set_delay(self, throttle, slot, delay, latency, response, spider):
+        old = slot.delay
+        slot.delay = throttle.delay = min(self.max_delay, max(self.min_delay, delay))
+        if self.debug:
+            spider.logger.info(
+                "slot: %s | status: %d | latency: %s | target concurrency: %.1f | delay: %.2f -> %.2f",
+                throttle.key, response.status,
+                "-" if latency is None else f"{latency * 1000:.0f} ms", throttle.target, old, slot.delay)
+
+    def spider_opened(self, spider):
+        # The downloader creates a domain's slot after process_request has
+        # run for its first request, with the default delay, so that is set
+        # to the start delay as AutoThrottle does; otherwise the first burst
+        # goes out with no delay at all. Scrapy 2.13+ keeps the default on
+        # the downloader, older versions read spider.download_delay.
+        downloader = self.crawler.engine.downloader
+        if hasattr(downloader, "_delay"):
+            downloader._delay = self.start_delay
+        else:
+            spider.download_delay = self.start_delay
+        spider.logger.info("Adaptive throttle enabled, target concurrency %.1f per domain" % self.target_concurrency)
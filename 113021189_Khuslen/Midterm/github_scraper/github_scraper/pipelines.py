@@ -6,8 +6,35 @@
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.extensions.feedexport import ItemFilter
 
 
 class GithubScraperPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class RepoStatePipeline:
+    # Records every scraped repository in the spider's RepoState and sets
+    # item.change to 'new' or 'changed', or to None when its content is the
+    # same as in the last run. Items the spider marks 'deleted' become
+    # tombstones.
+    def process_item(self, item, spider):
+        state = getattr(spider, 'repo_state', None)
+        if state is None:
+            return item
+        adapter = ItemAdapter(item)
+        if adapter.get('change') == 'deleted':
+            state.mark_deleted(adapter['url'], spider.run)
+        else:
+            adapter['change'] = state.record(adapter.asdict(), spider.run)
+        if adapter['change']:
+            spider.crawler.stats.inc_value(f"repo_state/{adapter['change']}")
+        return item
+
+
+class ChangedItemFilter(ItemFilter):
+    # Feed item_filter that keeps only new, changed and deleted repositories,
+    # so the feed holds this run's delta rather than a full snapshot.
+    def accepts(self, item):
+        return ItemAdapter(item).get('change') is not None
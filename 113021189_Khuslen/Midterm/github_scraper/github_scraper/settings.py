@@ -7,11 +7,16 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+
 BOT_NAME = "github_scraper"
 
 SPIDER_MODULES = ["github_scraper.spiders"]
 NEWSPIDER_MODULE = "github_scraper.spiders"
 
+# Project commands, e.g. `scrapy compact` and `scrapy crawlshards`
+COMMANDS_MODULE = "github_scraper.commands"
+
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 #USER_AGENT = "github_scraper (+http://www.yourdomain.com)"
@@ -50,9 +55,10 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "github_scraper.middlewares.GithubScraperDownloaderMiddleware": 543,
-#}
+# AdaptiveThrottleMiddleware has to see 429 responses before RetryMiddleware (550).
+DOWNLOADER_MIDDLEWARES = {
+    "github_scraper.middlewares.AdaptiveThrottleMiddleware": 560,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -62,9 +68,29 @@ ROBOTSTXT_OBEY = True
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "github_scraper.pipelines.GithubScraperPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "github_scraper.pipelines.RepoStatePipeline": 300,
+}
+
+# Last scraped item and content hash per repository, used to skip unchanged
+# repositories and to write only the delta of each run; relative paths are
+# inside the project's .scrapy directory
+REPO_STATE_FILE = "repo_state.db"
+
+# Accounts to crawl with -a accounts=FILE or `scrapy crawlshards`, each
+# revisited once its last crawl is this many hours old
+FRONTIER_FILE = "frontier.db"
+FRONTIER_REVISIT_HOURS = 24
+
+# Repository languages, description and commit count come from the GitHub
+# API, METADATA_BATCH_SIZE repositories per GraphQL query, when a token is
+# set (GraphQL needs one) or -a api_url= points at another server; without
+# either, each repository's HTML page is downloaded instead. Unauthenticated
+# REST calls alone would not do: they are limited to 60 an hour, less than
+# one commit count each for a single account's repositories.
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN", "")
+METADATA_BATCH_SIZE = 30
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -79,13 +105,33 @@ ROBOTSTXT_OBEY = True
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
+# Adaptive throttling per domain (see middlewares.AdaptiveThrottleMiddleware),
+# used instead of AutoThrottle and a fixed DOWNLOAD_DELAY
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_START_DELAY = 1.0
+ADAPTIVE_THROTTLE_MIN_DELAY = 0.0
+ADAPTIVE_THROTTLE_MAX_DELAY = 60.0
+# Requests in flight per domain the delay aims for
+ADAPTIVE_THROTTLE_TARGET_CONCURRENCY = 4.0
+# Most requests transferring at once per domain, with overrides by host
+ADAPTIVE_THROTTLE_MAX_CONCURRENCY = 8
+ADAPTIVE_THROTTLE_DOMAIN_CONCURRENCY = {
+    "api.github.com": 4,
+}
+# Retries of a rate-limited (429) request before it is given up
+ADAPTIVE_THROTTLE_MAX_RETRIES = 5
+#ADAPTIVE_THROTTLE_DEBUG = False
+
 # Enable and configure HTTP caching (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# RFC2616Policy revalidates stored pages with If-None-Match/If-Modified-Since,
+# so unchanged pages come back as a body-less 304
+HTTPCACHE_ENABLED = True
+HTTPCACHE_POLICY = "scrapy.extensions.httpcache.RFC2616Policy"
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_IGNORE_HTTP_CODES = [429, 500, 502, 503, 504]
+HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
 
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
@@ -1,37 +1,168 @@
 import scrapy
 import re
+import json
+import shutil
+from scrapy import signals
+from scrapy.utils.project import data_path
+from ..frontier import AccountFrontier, read_accounts
 from ..items import RepositoryItem
+from ..metadata import commit_count, commits_url, graphql_query, graphql_results
+from ..state import DELTA_DIR, RepoState
 
 class GithubSpiderSpider(scrapy.Spider):
     name = 'github_spider'
-    start_urls = ['https://github.com/113021189?tab=repositories']
+
+    def __init__(self, user='113021189', base_url='https://github.com', refresh='',
+                 accounts='', frontier='', shard='0', shards='1', api_url='', *args, **kwargs):
+        # base_url and api_url point the spider at another server, e.g.
+        # mock_github.py:
+        #   scrapy crawl github_spider -a base_url=http://127.0.0.1:8000 -a api_url=http://127.0.0.1:8000/api
+        # -a refresh=1 fetches every repository again, changed or not.
+        #
+        # Instead of the one user, -a accounts=FILE adds the logins in FILE to
+        # the account frontier and crawls the accounts that are due, and
+        # -a frontier=1 crawls those already in it. -a shard=I -a shards=N
+        # keeps to the accounts of shard I; `scrapy crawlshards` runs one
+        # process per shard.
+        super().__init__(*args, **kwargs)
+        self.base_url = base_url.rstrip('/')
+        self.user = user
+        self.api_url = api_url
+        self.refresh = bool(refresh)
+        self.accounts_file = accounts
+        self.use_frontier = bool(accounts or frontier)
+        self.shard = int(shard)
+        self.shards = int(shards)
+        if not 0 <= self.shard < self.shards:
+            raise ValueError(f'shard must be between 0 and {self.shards - 1}, not {self.shard}')
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Not spider.state: with a JOBDIR, Scrapy keeps its own dict there.
+        spider.repo_state = RepoState(data_path(crawler.settings.get('REPO_STATE_FILE', 'repo_state.db')))
+        spider.run = spider.repo_state.begin_run(job=crawler.settings.get('JOBDIR'))
+        # See GITHUB_API_URL in settings.py.
+        token = crawler.settings.get('GITHUB_TOKEN')
+        spider.api_url = (spider.api_url or (crawler.settings.get('GITHUB_API_URL') if token else '')).rstrip('/')
+        spider.api_headers = {'Accept': 'application/vnd.github+json'}
+        if token:
+            spider.api_headers['Authorization'] = f'Bearer {token}'
+        spider.frontier = None
+        if spider.use_frontier:
+            spider.frontier = AccountFrontier(data_path(crawler.settings.get('FRONTIER_FILE', 'frontier.db')))
+            if spider.accounts_file:
+                spider.frontier.add(read_accounts(spider.accounts_file))
+            spider.frontier.drain_queue()
+        spider.finish_reason = None
+        crawler.signals.connect(spider.engine_stopped, signal=signals.engine_stopped)
+        return spider
+
+    def closed(self, reason):
+        self.finish_reason = reason
+        self.repo_state.finish_run(self.run, reason)
+        self.repo_state.close()
+        if self.frontier is not None:
+            self.frontier.close()
+
+    def engine_stopped(self):
+        # Once a crawl has finished, its JOBDIR is only in the way: the next
+        # run with the same JOBDIR would drop every listing request as seen
+        # before and the accounts would stay due for good. A paused crawl
+        # keeps it to resume. The scheduler and SpiderState have written
+        # their files by the time the engine stops.
+        jobdir = self.settings.get('JOBDIR')
+        if jobdir and self.finish_reason == 'finished':
+            shutil.rmtree(jobdir, ignore_errors=True)
+
+    async def start(self):
+        # Scrapy 2.13+ only calls start(); start_requests() is what older
+        # versions call.
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        # Scrapy asks for the next account only when it has room for more
+        # requests, so thousands of accounts are read as the crawl goes.
+        # Every account's listing is its own chain of requests: the next
+        # page is queued as soon as the previous one is parsed, without
+        # waiting for other accounts.
+        if self.frontier is None:
+            yield self.listing_request(self.user)
+            return
+        revisit = self.settings.getfloat('FRONTIER_REVISIT_HOURS', 24) * 3600
+        for login, next_page, run in self.frontier.due(self.shard, self.shards, revisit):
+            if next_page is None or run is None:
+                self.frontier.start(login, self.run)
+                next_page, run = None, self.run
+            yield self.listing_request(login, next_page, run)
+
+    def listing_request(self, login, url=None, run=None):
+        # Not dont_filter: when a paused crawl resumes from its JOBDIR, pages
+        # it already downloaded are dropped as duplicates. The JOBDIR is
+        # removed once the crawl finishes (see engine_stopped), so the next
+        # run fetches every listing again.
+        return scrapy.Request(
+            url or f'{self.base_url}/{login}?tab=repositories',
+            callback=self.parse,
+            errback=self.listing_failed,
+            meta={'account': login, 'run': run or self.run}
+        )
+
+    def listing_failed(self, failure):
+        login = failure.request.meta['account']
+        self.logger.error("Listing of %s failed: %r", login, failure.value)
+        self.crawler.stats.inc_value('frontier/failed')
+        if self.frontier is not None:
+            self.frontier.finish(login, failed=True)
+
+    def deleted_items(self, login):
+        # Repositories of the account that were not in this run's listing.
+        for previous in self.repo_state.missing(self.run, f'{self.base_url}/{login}/'):
+            yield RepositoryItem(
+                url=previous['url'],
+                about=previous['about'],
+                last_updated=previous['last_updated'],
+                languages=previous['languages'],
+                commits=previous['commits'],
+                change='deleted'
+            )
     
     custom_settings = {
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+        # Each run writes only its new, changed and deleted repositories;
+        # `scrapy compact` rebuilds repositories.xml from the state store.
         'FEEDS': {
-            'repositories.xml': {
+            f'{DELTA_DIR}/repositories-%(time)s-%(shard)s.xml': {
                 'format': 'xml',
-                'item_element': 'repository',
-                'root_element': 'repositories',
+                # Exporter options only take effect under item_export_kwargs;
+                # the elements match the snapshot `scrapy compact` writes.
+                'item_export_kwargs': {'item_element': 'repository', 'root_element': 'repositories'},
+                'item_filter': 'github_scraper.pipelines.ChangedItemFilter',
                 'overwrite': True
             }
         },
-        'DOWNLOAD_DELAY': 2,
         'FEED_EXPORT_ENCODING': 'utf-8'
     }
 
     def parse(self, response):
+        login = response.meta['account']
+        run = response.meta['run']
+
         # Extract repositories from current page
         repos = response.css('div[data-turbo-frame="repo-list-turbo-frame"] li')
         if not repos:
             self.logger.error("No repositories found! Check CSS selectors")
             
+        listed = []
+        pending = []
         for repo in repos:
             item = RepositoryItem(
                 url=response.urljoin(repo.css('a[itemprop="name codeRepository"]::attr(href)').get()),
                 about=(repo.css('p[itemprop="description"]::text').get() or '').strip(),
                 last_updated=repo.css('relative-time::attr(datetime)').get()
             )
+            listed.append(item.url)
             
             # Improved empty repo detection
             is_empty = "This repository is empty" in repo.get()
@@ -39,22 +170,102 @@ class GithubSpiderSpider(scrapy.Spider):
             if not item.about and not is_empty:
                 item.about = repo.css('a[itemprop="name codeRepository"]::text').get().strip()
 
+            # The listing's timestamp changes with every push, so a repository
+            # with the same timestamp as last time is reused without a request.
+            previous = None if self.refresh else self.repo_state.get(item.url)
+
             if is_empty:
                 item.languages = None
                 item.commits = None
                 yield item
+            elif previous and previous['last_updated'] == item.last_updated:
+                item.languages = previous['languages']
+                item.commits = previous['commits']
+                self.crawler.stats.inc_value('repo_state/unchanged')
+                yield item
+            elif self.api_url:
+                pending.append(item)
             else:
-                yield response.follow(
-                    item.url,
-                    callback=self.parse_repository_details,
-                    meta={'item': item},
-                    dont_filter=True
-                )
+                yield self.details_request(item)
+
+        yield from self.metadata_requests(pending)
+
+        self.repo_state.touch(listed, self.run)
 
         # Enhanced pagination handling
         next_page = response.css('a[data-test-selector="pagination-next"]::attr(href)').get()
         if next_page:
-            yield response.follow(next_page, self.parse)
+            next_url = response.urljoin(next_page)
+            if self.frontier is not None:
+                self.frontier.advance(login, next_url)
+            yield self.listing_request(login, next_url, run)
+        else:
+            if self.frontier is not None:
+                self.frontier.finish(login)
+            # Only a listing read from its first page in this run knows
+            # which repositories are gone.
+            if repos and run == self.run:
+                yield from self.deleted_items(login)
+
+    def details_request(self, item):
+        return scrapy.Request(
+            item.url,
+            callback=self.parse_repository_details,
+            meta={'item': item},
+            dont_filter=True
+        )
+
+    def metadata_requests(self, items):
+        # Languages and description of up to METADATA_BATCH_SIZE repositories
+        # per GraphQL request, then one small request each for the commits.
+        size = self.settings.getint('METADATA_BATCH_SIZE', 30)
+        for start in range(0, len(items), size):
+            batch = items[start:start + size]
+            yield scrapy.Request(
+                f'{self.api_url}/graphql',
+                method='POST',
+                body=json.dumps({'query': graphql_query([item.url for item in batch])}),
+                headers={**self.api_headers, 'Content-Type': 'application/json'},
+                callback=self.parse_metadata,
+                errback=self.metadata_failed,
+                meta={'items': batch, 'dont_cache': True, 'dont_obey_robotstxt': True},
+                dont_filter=True
+            )
+
+    def parse_metadata(self, response):
+        items = response.meta['items']
+        for item, result in zip(items, graphql_results(json.loads(response.text), len(items))):
+            if result is None:
+                # Renamed or made private since the listing; the page redirects.
+                yield self.details_request(item)
+                continue
+            if result['description']:
+                item.about = result['description'].strip()
+            item.languages = result['languages']
+            yield scrapy.Request(
+                commits_url(self.api_url, item.url),
+                headers=self.api_headers,
+                callback=self.parse_commit_count,
+                errback=self.commit_count_failed,
+                meta={'item': item, 'handle_httpstatus_list': [409], 'dont_obey_robotstxt': True},
+                dont_filter=True
+            )
+
+    def metadata_failed(self, failure):
+        # The API is unavailable or refused the token: fall back to the pages.
+        self.logger.warning("Metadata query failed, fetching repository pages instead: %r", failure.value)
+        for item in failure.request.meta['items']:
+            yield self.details_request(item)
+
+    def parse_commit_count(self, response):
+        item = response.meta['item']
+        link = response.headers.get('Link', b'').decode('latin-1')
+        item.commits = commit_count(response.status, link, response.text)
+        yield item
+
+    def commit_count_failed(self, failure):
+        self.logger.warning("Commit count failed, fetching the repository page instead: %r", failure.value)
+        yield self.details_request(failure.request.meta['item'])
 
     def parse_repository_details(self, response):
         item = response.meta['item']
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+# Each run's new, changed and deleted repositories are written here, one
+# feed file per run; `scrapy compact` folds them into the full snapshot.
+DELTA_DIR = 'deltas'
+
+# Item fields that make up a repository's content. RepositoryItem.change is
+# about the delta, not the repository, and is left out of the hash.
+CONTENT_FIELDS = ('url', 'about', 'last_updated', 'languages', 'commits')
+
+
+def content_hash(item):
+    content = {field: item.get(field) for field in CONTENT_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class RepoState:
+    # The last item scraped for every repository URL with a hash of its
+    # content, kept between runs. The spider uses it to skip repositories
+    # whose listing timestamp has not changed (see GithubSpiderSpider.parse),
+    # RepoStatePipeline to tell new and changed repositories from unchanged
+    # ones, and the spider again at the end of each account's listing to
+    # find the deleted ones: those not seen in the run. Deleted repositories stay as
+    # tombstones until the next compaction.
+
+    COMMIT_EVERY = 100
+    COMMIT_SECONDS = 1.0
+
+    def __init__(self, path):
+        # Shared by the worker processes of `scrapy crawlshards`; a pending
+        # commit holds the write lock for at most COMMIT_SECONDS.
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS repositories (
+                url TEXT PRIMARY KEY,
+                last_updated TEXT,
+                item TEXT NOT NULL
+            )
+        """)
+        # State files from before content hashes get the new columns; their
+        # rows count as never seen, and compare as changed once.
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(repositories)")}
+        for column in ('content_hash TEXT', 'seen_run INTEGER', 'deleted_run INTEGER'):
+            if column.split()[0] not in columns:
+                self.conn.execute(f"ALTER TABLE repositories ADD COLUMN {column}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                started TEXT NOT NULL,
+                finished TEXT,
+                status TEXT
+            )
+        """)
+        if 'job' not in {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}:
+            self.conn.execute("ALTER TABLE runs ADD COLUMN job TEXT")
+        self.conn.commit()
+        self.pending = 0
+        self.first_pending = None
+
+    def begin_run(self, job=None):
+        # A crawl paused and resumed with the same JOBDIR (job) carries on
+        # with the run it started, so what it saw before the pause counts.
+        if job:
+            row = self.conn.execute(
+                "SELECT id FROM runs WHERE job = ? AND (status IS NULL OR status != 'finished') "
+                "ORDER BY id DESC LIMIT 1", (job,)).fetchone()
+            if row:
+                self.conn.execute("UPDATE runs SET finished = NULL, status = NULL WHERE id = ?", row)
+                self.conn.commit()
+                return row[0]
+        run = self.conn.execute("INSERT INTO runs (started, job) VALUES (?, ?)", (_now(), job)).lastrowid
+        self.conn.commit()
+        return run
+
+    def finish_run(self, run, status):
+        self.conn.execute("UPDATE runs SET finished = ?, status = ? WHERE id = ?", (_now(), status, run))
+        self.commit()
+
+    def get(self, url):
+        # The stored item as a dict, or None; deleted repositories are None.
+        row = self.conn.execute(
+            "SELECT item FROM repositories WHERE url = ? AND deleted_run IS NULL", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record(self, item, run):
+        # Stores item (a dict) as seen in run and returns 'new', 'changed',
+        # or None when its content is the same as last time.
+        digest = content_hash(item)
+        row = self.conn.execute(
+            "SELECT content_hash, deleted_run FROM repositories WHERE url = ?", (item['url'],)).fetchone()
+        if row is None or row[1] is not None:
+            change = 'new'
+        elif row[0] != digest:
+            change = 'changed'
+        else:
+            change = None
+        self.conn.execute("""
+            INSERT OR REPLACE INTO repositories (url, last_updated, item, content_hash, seen_run, deleted_run)
+            VALUES (?, ?, ?, ?, ?, NULL)
+        """, (item['url'], item['last_updated'], json.dumps(item), digest, run))
+        self._written()
+        return change
+
+    def touch(self, urls, run):
+        # Marks repositories as seen in run before their items arrive, so
+        # missing() does not count them while their pages are downloading.
+        self.conn.executemany("UPDATE repositories SET seen_run = ? WHERE url = ?", ((run, url) for url in urls))
+        self._written()
+
+    def missing(self, run, prefix):
+        # Items under the URL prefix that were not seen in run and are not
+        # deleted yet.
+        rows = self.conn.execute("""
+            SELECT item FROM repositories
+            WHERE url LIKE ? ESCAPE '\\' AND deleted_run IS NULL AND (seen_run IS NULL OR seen_run != ?)
+            ORDER BY url
+        """, (prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%', run))
+        return [json.loads(item) for item, in rows]
+
+    def mark_deleted(self, url, run):
+        self.conn.execute("UPDATE repositories SET deleted_run = ? WHERE url = ?", (run, url))
+        self._written()
+
+    def snapshot(self):
+        # Every repository that is not deleted, by URL.
+        rows = self.conn.execute("SELECT item FROM repositories WHERE deleted_run IS NULL ORDER BY url")
+        return (json.loads(item) for item, in rows)
+
+    def purge_deleted(self):
+        # Drops the tombstones; returns how many there were.
+        count = self.conn.execute("DELETE FROM repositories WHERE deleted_run IS NOT NULL").rowcount
+        self.commit()
+        return count
+
+    def _written(self):
+        self.pending += 1
+        if self.first_pending is None:
+            self.first_pending = time.monotonic()
+        if self.pending >= self.COMMIT_EVERY or time.monotonic() - self.first_pending >= self.COMMIT_SECONDS:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+        self.first_pending = None
+
+    def close(self):
+        self.commit()
+        self.conn.close()
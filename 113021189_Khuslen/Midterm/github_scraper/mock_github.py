@@ -0,0 +1,471 @@
+# Local stand-in for github.com that serves a user's repository list and
+# repository pages in the markup github_spider parses, with simulated latency
+# and rate limiting:
+#
+#   python mock_github.py --repos 500 --rate 20 --burst 40
+#   scrapy crawl github_spider -a base_url=http://127.0.0.1:8000
+#
+# Requests beyond the token bucket (--rate per second, --burst at once) get
+# 429 with Retry-After; every response carries X-RateLimit-* headers. Pages
+# have an ETag and repository pages a Last-Modified date, and matching
+# If-None-Match/If-Modified-Since requests get a 304.
+#
+# Under /api it also stands in for api.github.com: the REST commit list with
+# per_page/page and a Link header (/api/repos/<user>/<repo>/commits), and a
+# /api/graphql endpoint answering batched repository(owner:, name:) queries
+# with description and languages, for
+#
+#   scrapy crawl github_spider -a base_url=http://127.0.0.1:8000 -a api_url=http://127.0.0.1:8000/api
+#
+# With --crawl the spider is run against the server and the run is checked:
+# every repository scraped, nothing given up on, and the bytes downloaded
+# per repository; --html fetches repository pages instead of the API. --recrawl then changes
+# --change repositories, deletes --delete others and crawls again with the
+# same HTTP cache and repo state, which should fetch only the changed
+# repositories and write only the changed and deleted ones to its delta feed.
+
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+LANGUAGES = ["Python", "Jupyter Notebook", "C++", "JavaScript", "HTML", "CSS", "Java", "Go"]
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        # Returns (allowed, tokens left, seconds until the next token).
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, int(self.tokens), 0.0
+            return False, 0, (1 - self.tokens) / self.rate
+
+    def seconds_to_full(self):
+        return (self.burst - self.tokens) / self.rate
+
+
+class MockGithub:
+    def __init__(self, user, repos, per_page, latency, page_kb, rate, burst, seed=0):
+        self.user = user
+        self.per_page = per_page
+        self.latency = latency
+        self.padding = "<!-- " + "x" * max(page_kb * 1024 - 9, 0) + " -->"
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.repos = [self._repo(i, seed) for i in range(repos)]
+        self.by_name = {repo["name"]: repo for repo in self.repos}
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"requests": 0, "bytes": 0, "repository_pages": 0, "commit_requests": 0,
+                      "graphql_requests": 0, "not_modified": 0, "rate_limited": 0, "in_flight": 0,
+                      "max_in_flight": 0}
+
+    def change(self, count, seed=1):
+        # Pushes a new commit to count random repositories.
+        rng = random.Random(seed)
+        changed = rng.sample([repo for repo in self.repos if not repo["empty"]], count)
+        for repo in changed:
+            updated = datetime.strptime(repo["updated"], "%Y-%m-%dT%H:%M:%SZ") + timedelta(days=1)
+            repo["updated"] = updated.strftime("%Y-%m-%dT%H:%M:%SZ")
+            repo["commits"] += 1
+        return changed
+
+    def delete(self, count, seed=2):
+        # Deletes count random repositories.
+        rng = random.Random(seed)
+        deleted = rng.sample(self.repos, count)
+        for repo in deleted:
+            self.repos.remove(repo)
+            del self.by_name[repo["name"]]
+        return deleted
+
+    def _repo(self, index, seed):
+        rng = random.Random(seed * 100003 + index)
+        updated = datetime(2025, 1, 1, tzinfo=timezone.utc) - timedelta(hours=rng.randrange(24 * 700))
+        return {
+            "name": f"repo-{index:04d}",
+            "about": "" if index % 7 == 0 else f"Project number {index}",
+            "empty": index % 10 == 9,
+            "updated": updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "languages": rng.sample(LANGUAGES, rng.randint(1, 3)),
+            "commits": rng.randint(1, 400),
+        }
+
+    def _count(self, key, delta=1):
+        with self.lock:
+            self.stats[key] += delta
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+    def listing(self, page):
+        start = (page - 1) * self.per_page
+        items = []
+        for repo in self.repos[start:start + self.per_page]:
+            about = f'<p itemprop="description">{repo["about"]}</p>' if repo["about"] else ""
+            empty = "<span>This repository is empty</span>" if repo["empty"] else ""
+            items.append(f'<li><h3><a href="/{self.user}/{repo["name"]}" itemprop="name codeRepository">'
+                         f'\n        {repo["name"]}</a></h3>{about}{empty}'
+                         f'<relative-time datetime="{repo["updated"]}"></relative-time></li>')
+        next_link = ""
+        if start + self.per_page < len(self.repos):
+            next_link = (f'<a data-test-selector="pagination-next" '
+                         f'href="/{self.user}?page={page + 1}&amp;tab=repositories">Next</a>')
+        return (f'<html><body><div data-turbo-frame="repo-list-turbo-frame"><ul>{"".join(items)}</ul></div>'
+                f'{next_link}{self.padding}</body></html>')
+
+    def repository(self, repo):
+        languages = "".join(f'<li class="d-inline" itemprop="keywords"><meta content="{name}"></li>'
+                            for name in repo["languages"])
+        return (f'<html><body><ul>{languages}</ul>'
+                f'<a class="Link--primary" href="/{self.user}/{repo["name"]}/commits/main">'
+                f'<strong>{repo["commits"]}</strong> Commits</a>{self.padding}</body></html>')
+
+    def commits(self, repo, base_url, per_page, page):
+        # One page of the repository's commits, newest first, and its Link
+        # header, as GET /repos/{owner}/{repo}/commits returns them.
+        total = repo["commits"]
+        start = (page - 1) * per_page
+        commits = [self._commit(repo, total - i) for i in range(start, min(start + per_page, total))]
+        last = max(math.ceil(total / per_page), 1)
+        url = f'{base_url}/repos/{self.user}/{repo["name"]}/commits'
+        links = []
+        if page < last:
+            links += [f'<{url}?{urlencode({"per_page": per_page, "page": page + 1})}>; rel="next"',
+                      f'<{url}?{urlencode({"per_page": per_page, "page": last})}>; rel="last"']
+        if page > 1:
+            links += [f'<{url}?{urlencode({"per_page": per_page, "page": 1})}>; rel="first"',
+                      f'<{url}?{urlencode({"per_page": per_page, "page": page - 1})}>; rel="prev"']
+        return json.dumps(commits), ", ".join(links)
+
+    def _commit(self, repo, number):
+        sha = hashlib.sha1(f'{repo["name"]}/{number}'.encode("utf-8")).hexdigest()
+        parent = hashlib.sha1(f'{repo["name"]}/{number - 1}'.encode("utf-8")).hexdigest()
+        author = {"name": self.user, "email": f"{self.user}@users.noreply.github.com", "date": repo["updated"]}
+        api = f"https://api.github.com/repos/{self.user}/{repo['name']}"
+        return {
+            "sha": sha,
+            "node_id": "C_" + sha[:20],
+            "commit": {"author": author, "committer": author, "message": f"Commit {number}",
+                       "tree": {"sha": sha[::-1], "url": f"{api}/git/trees/{sha[::-1]}"},
+                       "url": f"{api}/git/commits/{sha}", "comment_count": 0,
+                       "verification": {"verified": False, "reason": "unsigned", "signature": None, "payload": None}},
+            "url": f"{api}/commits/{sha}",
+            "html_url": f"https://github.com/{self.user}/{repo['name']}/commit/{sha}",
+            "comments_url": f"{api}/commits/{sha}/comments",
+            "author": {"login": self.user, "id": 1, "type": "User", "site_admin": False,
+                       "url": f"https://api.github.com/users/{self.user}"},
+            "committer": {"login": self.user, "id": 1, "type": "User", "site_admin": False,
+                          "url": f"https://api.github.com/users/{self.user}"},
+            "parents": [] if number == 1 else [{"sha": parent, "url": f"{api}/commits/{parent}"}],
+        }
+
+    def graphql(self, query):
+        # Answers every `alias: repository(owner: "...", name: "...")` in the
+        # query with its description and languages, largest first.
+        data, errors = {}, []
+        for alias, owner, name in re.findall(
+                r'(\w+)\s*:\s*repository\(\s*owner:\s*("(?:[^"\\]|\\.)*")\s*,\s*name:\s*("(?:[^"\\]|\\.)*")\s*\)',
+                query):
+            owner, name = json.loads(owner), json.loads(name)
+            repo = self.by_name.get(name) if owner == self.user else None
+            if repo is None:
+                data[alias] = None
+                errors.append({"type": "NOT_FOUND", "path": [alias],
+                               "message": f"Could not resolve to a Repository with the name '{owner}/{name}'."})
+                continue
+            languages = [] if repo["empty"] else repo["languages"]
+            data[alias] = {"description": repo["about"] or None,
+                           "languages": {"nodes": [{"name": language} for language in languages]}}
+        result = {"data": data}
+        if errors:
+            result["errors"] = errors
+        return json.dumps(result)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "MockGithub/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        mock = self.server.mock
+        mock._count("requests")
+        mock._count("in_flight")
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        try:
+            self._serve(mock)
+        finally:
+            mock._count("in_flight", -1)
+
+    def _serve(self, mock):
+        url = urlparse(self.path)
+        if url.path == "/robots.txt":
+            return self._send(200, "User-agent: *\nAllow: /\n", "text/plain")
+
+        headers = {}
+        if mock.bucket:
+            allowed, remaining, wait = mock.bucket.take()
+            headers["X-RateLimit-Limit"] = str(mock.bucket.burst)
+            headers["X-RateLimit-Remaining"] = str(remaining)
+            headers["X-RateLimit-Reset"] = str(math.ceil(time.time() + mock.bucket.seconds_to_full()))
+            if not allowed:
+                mock._count("rate_limited")
+                headers["Retry-After"] = str(math.ceil(wait))
+                return self._send(429, "Too many requests", "text/plain", headers)
+
+        time.sleep(mock.latency * random.uniform(0.5, 1.5))
+        parts = url.path.strip("/").split("/")
+        if parts[0] == "api":
+            return self._api(mock, parts[1:], parse_qs(url.query), headers)
+        if self.command != "GET":
+            return self._send(405, "Method not allowed", "text/plain", headers)
+        if parts == [mock.user]:
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            return self._send_page(mock.listing(page), None, headers)
+        if len(parts) == 2 and parts[0] == mock.user and parts[1] in mock.by_name:
+            mock._count("repository_pages")
+            repo = mock.by_name[parts[1]]
+            modified = datetime.strptime(repo["updated"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+            return self._send_page(mock.repository(repo), modified, headers)
+        return self._send(404, "Not found", "text/plain", headers)
+
+    def _api(self, mock, parts, query, headers):
+        base_url = f"http://{self.headers['Host']}/api"
+        if parts == ["graphql"] and self.command == "POST":
+            mock._count("graphql_requests")
+            try:
+                request = json.loads(self.body)
+            except ValueError:
+                return self._send(400, json.dumps({"message": "Problems parsing JSON"}), "application/json", headers)
+            return self._send(200, mock.graphql(request.get("query", "")), "application/json", headers)
+        if (self.command == "GET" and len(parts) == 4 and parts[0] == "repos" and parts[1] == mock.user
+                and parts[2] in mock.by_name and parts[3] == "commits"):
+            mock._count("commit_requests")
+            repo = mock.by_name[parts[2]]
+            if repo["empty"]:
+                return self._send(409, json.dumps({"message": "Git Repository is empty."}), "application/json",
+                                  headers)
+            per_page = min(int(query.get("per_page", ["30"])[0]), 100)
+            page = int(query.get("page", ["1"])[0])
+            body, link = mock.commits(repo, base_url, per_page, page)
+            if link:
+                headers["Link"] = link
+            return self._send_page(body, None, headers, "application/json")
+        return self._send(404, json.dumps({"message": "Not Found"}), "application/json", headers)
+
+    def _send_page(self, body, modified, headers, content_type="text/html"):
+        # Like github.com: cacheable, but to be revalidated on every use.
+        headers["ETag"] = '"%s"' % hashlib.sha1(body.encode("utf-8")).hexdigest()[:20]
+        headers["Cache-Control"] = "max-age=0, private, must-revalidate"
+        if modified:
+            headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+        if self._not_modified(headers["ETag"], modified):
+            self.server.mock._count("not_modified")
+            return self._send(304, "", content_type, headers)
+        return self._send(200, body, content_type, headers)
+
+    def _not_modified(self, etag, modified):
+        if self.headers.get("If-None-Match"):
+            return etag in [tag.strip() for tag in self.headers["If-None-Match"].split(",")]
+        since = self.headers.get("If-Modified-Since")
+        if since and modified:
+            try:
+                return modified <= parsedate_to_datetime(since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _send(self, status, body, content_type, headers=()):
+        body = body.encode("utf-8") if status != 304 else b""
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.mock._count("bytes", len(body))
+
+
+def serve(mock, host="127.0.0.1", port=8000):
+    # Starts the server on a daemon thread and returns it; port 0 picks a free one.
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.mock = mock
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_spider(base_url, user, work_dir, fixed_delay=None, html=False):
+    # Runs in a child process (Twisted's reactor cannot be started twice):
+    # crawls base_url and prints the crawl stats as JSON. The delta feeds,
+    # HTTP cache and repo state live in work_dir so the project's are left
+    # alone.
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from github_scraper.spiders.github_spider import GithubSpiderSpider
+
+    settings = get_project_settings()
+    feeds = GithubSpiderSpider.custom_settings["FEEDS"]
+    overrides = {
+        "FEEDS": {os.path.join(work_dir, path): options for path, options in feeds.items()},
+        "HTTPCACHE_DIR": os.path.join(work_dir, "httpcache"),
+        "REPO_STATE_FILE": os.path.join(work_dir, "repo_state.db"),
+        "LOG_LEVEL": "INFO",
+    }
+    if fixed_delay is not None:
+        # The old behaviour, for comparison.
+        overrides.update(ADAPTIVE_THROTTLE_ENABLED=False, DOWNLOAD_DELAY=fixed_delay)
+    for name, value in overrides.items():
+        settings.set(name, value, priority="cmdline")
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler("github_spider")
+    process.crawl(crawler, user=user, base_url=base_url, api_url="" if html else base_url + "/api")
+    process.start()
+    print(json.dumps(crawler.stats.get_stats(), default=str))
+
+
+def crawl(base_url, user, work_dir, fixed_delay=None, html=False):
+    command = [sys.executable, os.path.abspath(__file__), "--run-spider", base_url, "--user", user,
+               "--work-dir", work_dir]
+    if fixed_delay is not None:
+        command += ["--fixed-delay", str(fixed_delay)]
+    if html:
+        command.append("--html")
+    result = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def delta_size(work_dir):
+    # Repositories in the newest delta feed.
+    feeds = sorted(glob.glob(os.path.join(work_dir, "deltas", "*.xml")), key=os.path.getmtime)
+    if not feeds:
+        return 0
+    with open(feeds[-1], encoding="utf-8") as f:
+        return f.read().count("<repository>")
+
+
+def check(mock, stats, elapsed, work_dir, delta):
+    # delta holds the expected number of new, changed and deleted repositories.
+    scraped = stats.get("item_scraped_count", 0)
+    scraped_expected = len(mock.repos) + delta["deleted"]
+    written = delta_size(work_dir)
+    print(f"{scraped}/{scraped_expected} repositories in {elapsed:.1f} s, {mock.stats['requests']} requests "
+          f"({mock.stats['repository_pages']} repository pages, {mock.stats['graphql_requests']} GraphQL queries, "
+          f"{mock.stats['commit_requests']} commit counts, {mock.stats['not_modified']} not modified), "
+          f"{mock.stats['bytes'] / 1024:.0f} KiB, {mock.stats['bytes'] / max(scraped, 1) / 1024:.1f} KiB per repository, "
+          f"{mock.stats['rate_limited']} rate limited, at most {mock.stats['max_in_flight']} at once, "
+          f"{stats.get('adaptive_throttle/backoffs', 0)} backoffs, "
+          f"{stats.get('repo_state/unchanged', 0)} unchanged repositories skipped, "
+          f"{written} in the delta feed")
+    failures = []
+    if scraped != scraped_expected:
+        failures.append(f"scraped {scraped} of {scraped_expected} repositories")
+    for change, count in delta.items():
+        if stats.get(f"repo_state/{change}", 0) != count:
+            failures.append(f"{stats.get(f'repo_state/{change}', 0)} repositories {change}, expected {count}")
+    if written != sum(delta.values()):
+        failures.append(f"delta feed has {written} repositories, expected {sum(delta.values())}")
+    if stats.get("adaptive_throttle/gave_up"):
+        failures.append(f"gave up on {stats['adaptive_throttle/gave_up']} rate-limited requests")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock github.com with latency and rate limiting.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--user", default="113021189")
+    parser.add_argument("--repos", type=int, default=500)
+    parser.add_argument("--per-page", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean seconds per response")
+    parser.add_argument("--page-kb", type=int, default=50, help="padding added to every HTML page")
+    parser.add_argument("--rate", type=float, default=20, help="requests per second allowed, 0 for no limit")
+    parser.add_argument("--burst", type=int, default=40)
+    parser.add_argument("--crawl", action="store_true", help="run github_spider against the server and check it")
+    parser.add_argument("--recrawl", action="store_true", help="with --crawl, change some repositories and crawl again")
+    parser.add_argument("--change", type=int, default=5, help="repositories changed before the recrawl")
+    parser.add_argument("--delete", type=int, default=3, help="repositories deleted before the recrawl")
+    parser.add_argument("--fixed-delay", type=float, help="with --crawl, use this DOWNLOAD_DELAY instead")
+    parser.add_argument("--html", action="store_true", help="with --crawl, fetch repository pages instead of the API")
+    parser.add_argument("--run-spider", metavar="BASE_URL", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_spider:
+        run_spider(args.run_spider, args.user, args.work_dir, args.fixed_delay, args.html)
+        return 0
+
+    mock = MockGithub(args.user, args.repos, args.per_page, args.latency, args.page_kb, args.rate, args.burst)
+    server = serve(mock, port=0 if args.crawl else args.port)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    if not args.crawl:
+        print(f"Serving {args.repos} repositories of {args.user} at {base_url}", file=sys.stderr)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(mock.stats, file=sys.stderr)
+            return 0
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.monotonic()
+        failures = check(mock, crawl(base_url, args.user, work_dir, args.fixed_delay, args.html),
+                         time.monotonic() - start, work_dir, {"new": args.repos, "changed": 0, "deleted": 0})
+        if args.recrawl:
+            changed = mock.change(args.change)
+            deleted = mock.delete(args.delete)
+            changed = [repo for repo in changed if repo not in deleted]
+            mock.reset_stats()
+            start = time.monotonic()
+            failures += check(mock, crawl(base_url, args.user, work_dir, args.fixed_delay, args.html),
+                              time.monotonic() - start, work_dir,
+                              {"new": 0, "changed": len(changed), "deleted": len(deleted)})
+            fetched = mock.stats["repository_pages"] + mock.stats["commit_requests"]
+            if fetched != len(changed):
+                failures.append(f"recrawl fetched metadata of {fetched} repositories "
+                                f"for {len(changed)} changed repositories")
+    server.shutdown()
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests live next to scrapy.cfg, one level above the github_scraper package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from github_scraper.frontier import AccountFrontier, read_accounts, shard_key
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = AccountFrontier(str(tmp_path / 'frontier.db'))
+    yield frontier
+    frontier.close()
+
+
+def logins(rows):
+    return [login for login, _, _ in rows]
+
+
+def test_due_order_interrupted_then_new_then_stalest(frontier):
+    frontier.add(['old', 'older', 'new', 'paused'])
+    now = time.time()
+    frontier.conn.execute("UPDATE accounts SET last_crawled = ? WHERE login = 'old'", (now - 2 * 3600,))
+    frontier.conn.execute("UPDATE accounts SET last_crawled = ? WHERE login = 'older'", (now - 3 * 3600,))
+    frontier.conn.execute("UPDATE accounts SET last_crawled = ? WHERE login = 'paused'", (now,))
+    frontier.advance('paused', 'https://github.com/paused?page=3')
+
+    assert logins(frontier.due(revisit=3600)) == ['paused', 'new', 'older', 'old']
+    # Crawled within the revisit interval and not interrupted: not due.
+    assert logins(frontier.due(revisit=4 * 3600)) == ['paused', 'new']
+
+
+def test_finish_sends_an_account_to_the_back(frontier):
+    frontier.add(['a', 'b'])
+    frontier.finish('a')
+    assert logins(frontier.due(revisit=0)) == ['b', 'a']
+    assert logins(frontier.due(revisit=3600)) == ['b']
+
+
+def test_shards_split_accounts_without_overlap(frontier):
+    accounts = [f'user{i}' for i in range(200)]
+    assert frontier.add(accounts + ['USER1']) == 200
+    shards = [set(logins(frontier.due(shard, 4))) for shard in range(4)]
+    assert set().union(*shards) == set(accounts)
+    assert sum(map(len, shards)) == len(accounts)
+    assert all(shard_key(login) % 4 == i for i, shard in enumerate(shards) for login in shard)
+    assert all(shards)
+
+
+def test_read_accounts_skips_comments(tmp_path):
+    path = tmp_path / 'accounts.txt'
+    path.write_text('octocat\n\n# team\ntorvalds  # kernel\n', encoding='utf-8')
+    assert list(read_accounts(str(path))) == ['octocat', 'torvalds']
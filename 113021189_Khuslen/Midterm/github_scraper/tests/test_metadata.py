@@ -0,0 +1,42 @@
+import json
+
+from github_scraper.metadata import commit_count, commits_url, graphql_query, graphql_results
+
+
+def test_graphql_query_aliases_each_repository():
+    query = graphql_query(['https://github.com/a/one', 'https://github.com/b/two'])
+    assert 'r0: repository(owner: "a", name: "one")' in query
+    assert 'r1: repository(owner: "b", name: "two")' in query
+
+
+def test_graphql_results_in_query_order():
+    data = {'data': {
+        'r0': {'description': 'First', 'languages': {'nodes': [{'name': 'Python'}, {'name': 'C'}]}},
+        'r1': None,
+        'r2': {'description': None, 'languages': {'nodes': []}},
+    }}
+    assert graphql_results(data, 3) == [
+        {'description': 'First', 'languages': ['Python', 'C']},
+        None,
+        {'description': None, 'languages': None},
+    ]
+
+
+def test_graphql_results_without_data():
+    assert graphql_results({'errors': [{'message': 'Bad credentials'}]}, 2) == [None, None]
+
+
+def test_commits_url():
+    assert commits_url('https://api.github.com', 'https://github.com/a/one') == \
+        'https://api.github.com/repos/a/one/commits?per_page=1'
+
+
+def test_commit_count_from_last_link():
+    link = ('<https://api.github.com/repositories/1/commits?per_page=1&page=2>; rel="next", '
+            '<https://api.github.com/repositories/1/commits?per_page=1&page=137>; rel="last"')
+    assert commit_count(200, link, '[{}]') == 137
+
+
+def test_commit_count_single_page_and_empty_repository():
+    assert commit_count(200, '', json.dumps([{'sha': 'abc'}])) == 1
+    assert commit_count(409, '', '{"message": "Git Repository is empty."}') == 0
@@ -0,0 +1,109 @@
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+from scrapy.http import Request, Response
+from scrapy.utils.test import get_crawler
+
+from github_scraper.middlewares import AdaptiveThrottleMiddleware
+
+retry_after = AdaptiveThrottleMiddleware._retry_after
+
+
+def response(**headers):
+    return Response('https://api.github.com/graphql', status=429, headers=headers)
+
+
+def test_retry_after_seconds():
+    assert retry_after(response(**{'Retry-After': '7'})) == 7.0
+
+
+def test_retry_after_http_date():
+    wait = retry_after(response(**{'Retry-After': formatdate(time.time() + 30, usegmt=True)}))
+    assert 25 <= wait <= 30
+
+
+def test_retry_after_date_in_the_past_is_zero():
+    assert retry_after(response(**{'Retry-After': formatdate(time.time() - 30, usegmt=True)})) == 0.0
+
+
+def test_rate_limit_reset_when_there_is_no_retry_after():
+    wait = retry_after(response(**{'X-RateLimit-Reset': str(int(time.time()) + 60)}))
+    assert 55 <= wait <= 60
+
+
+@pytest.mark.parametrize('headers', [{}, {'Retry-After': 'soon'}, {'X-RateLimit-Reset': 'later'}])
+def test_retry_after_unknown(headers):
+    assert retry_after(response(**headers)) is None
+
+
+@pytest.mark.parametrize('downloader', [SimpleNamespace(_delay=0.0), SimpleNamespace()])
+def test_spider_opened_sets_the_start_delay(downloader):
+    crawler = get_crawler(settings_dict={'ADAPTIVE_THROTTLE_ENABLED': True, 'ADAPTIVE_THROTTLE_START_DELAY': 2.5})
+    crawler.engine = SimpleNamespace(downloader=downloader)
+    middleware = AdaptiveThrottleMiddleware.from_crawler(crawler)
+    spider = SimpleNamespace(logger=SimpleNamespace(info=lambda *args: None))
+    middleware.spider_opened(spider)
+    if hasattr(downloader, '_delay'):
+        assert downloader._delay == 2.5
+    else:
+        assert spider.download_delay == 2.5
+
+
+@pytest.fixture
+def throttle():
+    crawler = get_crawler(settings_dict={'ADAPTIVE_THROTTLE_ENABLED': True, 'ADAPTIVE_THROTTLE_START_DELAY': 1.0,
+                                         'ADAPTIVE_THROTTLE_MAX_RETRIES': 2})
+    slot = SimpleNamespace(delay=0.0, concurrency=1)
+    crawler.engine = SimpleNamespace(downloader=SimpleNamespace(slots={'api.github.com': slot}))
+    middleware = AdaptiveThrottleMiddleware.from_crawler(crawler)
+    spider = SimpleNamespace(logger=SimpleNamespace(info=lambda *args: None, warning=lambda *args: None))
+    return middleware, slot, spider
+
+
+def test_429_backs_off_retries_and_recovers(throttle):
+    middleware, slot, spider = throttle
+    request = Request('https://api.github.com/graphql', method='POST')
+    middleware.process_request(request, spider)
+    assert slot.delay == 1.0
+
+    retry = middleware.process_response(request, response(**{'Retry-After': '7'}), spider)
+    assert isinstance(retry, Request) and retry.url == request.url
+    assert retry.dont_filter and retry.meta['throttle_retry_times'] == 1
+    assert slot.delay == 7.0
+    assert middleware.domains['api.github.com'].target == 2.0
+    assert middleware.crawler.stats.get_value('adaptive_throttle/backoffs') == 1
+
+    # A request that was already in flight is retried without backing off again.
+    middleware.process_response(Request(request.url), response(**{'Retry-After': '7'}), spider)
+    assert slot.delay == 7.0
+    assert middleware.crawler.stats.get_value('adaptive_throttle/retries') == 2
+
+    delays = []
+    for _ in range(10):
+        ok = Request(request.url, meta={'download_latency': 0.2})
+        assert middleware.process_response(ok, Response(ok.url, status=200), spider).status == 200
+        delays.append(slot.delay)
+    assert delays == sorted(delays, reverse=True) and delays[0] < 7.0
+    assert slot.delay < 0.2
+    assert middleware.domains['api.github.com'].target > 2.0
+
+
+def test_429_gives_up_after_max_retries(throttle):
+    middleware, slot, spider = throttle
+    request = Request('https://api.github.com/graphql', meta={'throttle_retry_times': 2})
+    middleware.process_request(request, spider)
+    limited = response(**{'Retry-After': '1'})
+    assert middleware.process_response(request, limited, spider) is limited
+    assert middleware.crawler.stats.get_value('adaptive_throttle/gave_up') == 1
+
+
+def test_403_counts_as_rate_limited_only_without_remaining_quota(throttle):
+    middleware, slot, spider = throttle
+    request = Request('https://api.github.com/graphql')
+    middleware.process_request(request, spider)
+    forbidden = Response(request.url, status=403)
+    assert middleware.process_response(request, forbidden, spider) is forbidden
+    exhausted = Response(request.url, status=403, headers={'X-RateLimit-Remaining': '0'})
+    assert isinstance(middleware.process_response(request, exhausted, spider), Request)
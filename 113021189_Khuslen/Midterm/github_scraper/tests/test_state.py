@@ -0,0 +1,54 @@
+import pytest
+
+from github_scraper.state import RepoState
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = RepoState(str(tmp_path / 'state' / 'repo_state.db'))
+    yield state
+    state.close()
+
+
+def item(url, about='About', last_updated='2024-01-01T00:00:00Z'):
+    return {'url': url, 'about': about, 'last_updated': last_updated, 'languages': ['Python'], 'commits': 3}
+
+
+def test_record_tells_new_changed_and_unchanged(state):
+    run = state.begin_run()
+    assert state.record(item('https://github.com/a/one'), run) == 'new'
+    assert state.record(item('https://github.com/a/one'), run) is None
+    assert state.record(item('https://github.com/a/one', about='Changed'), run) == 'changed'
+    # The change marker is not part of the content.
+    assert state.record(dict(item('https://github.com/a/one', about='Changed'), change='new'), run) is None
+
+
+def test_deleted_repositories_come_back_as_new(state):
+    run = state.begin_run()
+    state.record(item('https://github.com/a/one'), run)
+    state.mark_deleted('https://github.com/a/one', run)
+    assert state.get('https://github.com/a/one') is None
+    assert state.record(item('https://github.com/a/one'), state.begin_run()) == 'new'
+
+
+def test_missing_is_what_the_run_did_not_see(state):
+    first = state.begin_run()
+    for url in ('https://github.com/a/one', 'https://github.com/a/two', 'https://github.com/a_b/three'):
+        state.record(item(url), first)
+
+    second = state.begin_run()
+    state.touch(['https://github.com/a/one'], second)
+    # a_b is another account, not matched by the a/ prefix even though _ is
+    # a LIKE wildcard.
+    assert [i['url'] for i in state.missing(second, 'https://github.com/a/')] == ['https://github.com/a/two']
+
+    state.mark_deleted('https://github.com/a/two', second)
+    assert state.missing(second, 'https://github.com/a/') == []
+
+
+def test_a_paused_job_resumes_its_run(state):
+    run = state.begin_run(job='jobs/shard-0')
+    state.finish_run(run, 'shutdown')
+    assert state.begin_run(job='jobs/shard-0') == run
+    state.finish_run(run, 'finished')
+    assert state.begin_run(job='jobs/shard-0') != run
@@ -0,0 +1,65 @@
+import argparse
+import sys
+
+from connection import get_connection, transaction
+from database import connect_db
+from schema import AGGREGATE_TABLES
+
+
+def _actual_query(columns, exprs):
+    values = [e.format(row="transactions") for e in exprs]
+    return f"""
+        SELECT {", ".join(values)}, SUM(amount_cents), COUNT(*) FROM transactions
+        WHERE {" AND ".join(f"{v} IS NOT NULL" for v in values)}
+        GROUP BY {", ".join(values)}
+    """
+
+
+def rebuild():
+    with transaction() as conn:
+        for table, columns, exprs in AGGREGATE_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table} ({', '.join(columns)}, total_cents, count) "
+                         + _actual_query(columns, exprs))
+
+
+def verify():
+    # Returns (table, key, stored (cents, count), actual (cents, count)) for
+    # every aggregate row that disagrees with the transactions table. Totals
+    # are whole cents, so any difference at all is drift.
+    drift = []
+    with get_connection() as conn:
+        for table, columns, exprs in AGGREGATE_TABLES:
+            stored = {row[:-2]: row[-2:] for row in
+                      conn.execute(f"SELECT {', '.join(columns)}, total_cents, count FROM {table}")}
+            actual = {row[:-2]: row[-2:] for row in conn.execute(_actual_query(columns, exprs))}
+            for key in stored.keys() | actual.keys():
+                s_total, s_count = stored.get(key, (0, 0))
+                a_total, a_count = actual.get(key, (0, 0))
+                if s_count != a_count or s_total != a_total:
+                    drift.append((table, key, (s_total, s_count), (a_total, a_count)))
+    return drift
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the summary tables.")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    connect_db()
+
+    if args.command == "rebuild":
+        rebuild()
+        print("Summary tables rebuilt.")
+        return 0
+
+    drift = verify()
+    for table, key, stored, actual in drift:
+        print(f"{table} {'/'.join(map(str, key))}: stored {stored[0] / 100:.2f} ({stored[1]} rows), "
+              f"actual {actual[0] / 100:.2f} ({actual[1]} rows)")
+    print(f"{len(drift)} drifted rows." if drift else "Summary tables are in sync.")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
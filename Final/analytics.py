@@ -0,0 +1,80 @@
+import threading
+
+from connection import data_state, get_connection
+from database import EXPENSE_ID
+
+
+class Snapshot:
+    # Everything the charts need, read from the summary tables in one go.
+
+    def __init__(self, type_totals, category_totals, budgets=()):
+        self.type_totals = type_totals
+        self._category_totals = category_totals
+        self.budgets = budgets
+
+    def category_totals(self, type_="Expense"):
+        return self._category_totals.get(type_, {})
+
+    def type_total(self, type_):
+        return self.type_totals.get(type_, 0)
+
+    def budget_utilisation(self, budgets=None):
+        # Returns (category, spent, budget, percent) with percent capped at 100,
+        # for the budgets table unless a {category: budget} dict is given.
+        if budgets is None:
+            rows = self.budgets
+        else:
+            spent = self.category_totals("Expense")
+            rows = [(category, spent.get(category, 0), budget) for category, budget in budgets.items()]
+        return [(category, amount_spent, budget,
+                 min(int((amount_spent / budget) * 100), 100) if budget else 0)
+                for category, amount_spent, budget in rows]
+
+
+_lock = threading.Lock()
+_cached = None
+_cached_generation = None
+
+
+def _load():
+    with get_connection() as conn:
+        type_totals = dict(conn.execute("""
+            SELECT ty.name, s.total_cents / 100.0 FROM summary_by_type s JOIN types ty ON ty.id = s.type_id
+        """))
+
+        # Grouped on the integer ids; names are joined in after grouping.
+        category_totals = {}
+        for type_, category, total in conn.execute("""
+            SELECT ty.name, c.name, s.total / 100.0 FROM (
+                SELECT type_id, category_id, SUM(total_cents) AS total FROM summary_by_category_month
+                GROUP BY type_id, category_id
+            ) s
+            JOIN types ty ON ty.id = s.type_id
+            JOIN categories c ON c.id = s.category_id
+            ORDER BY ty.name, c.name
+        """):
+            category_totals.setdefault(type_, {})[category] = total
+
+        budgets = conn.execute(f"""
+            SELECT c.name, COALESCE(SUM(s.total_cents), 0) / 100.0, b.amount_cents / 100.0
+            FROM budgets b
+            JOIN categories c ON c.id = b.category_id
+            LEFT JOIN summary_by_category_month s ON s.category_id = b.category_id AND s.type_id = {EXPENSE_ID}
+            GROUP BY b.category_id
+            ORDER BY c.name
+        """).fetchall()
+    return Snapshot(type_totals, category_totals, budgets)
+
+
+def snapshot():
+    # Shared between all charts and reloaded only after a write, by this
+    # process or another one.
+    global _cached, _cached_generation
+    generation = data_state()
+    with _lock:
+        if _cached is not None and _cached_generation == generation:
+            return _cached
+    result = _load()
+    with _lock:
+        _cached, _cached_generation = result, generation
+    return result
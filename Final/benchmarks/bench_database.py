@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from ledger import CATEGORIES, generate_rows
+
+import cache
+import connection
+import database
+import schema
+from exporter import export_transactions
+
+# Times the database layer on synthetic ledgers of each --sizes:
+#   add_transactions       - building the ledger in import batches
+#   add_transaction        - one insert, one commit
+#   get_all_transactions   - every month/year/category filter combination
+#   get_summary, get_monthly_summary
+#   delete, undo           - a batch of --delete-rows random ids and back
+#   export                 - CSV of the whole ledger and of one year
+# The query cache is off so every call reaches SQLite. Results can be saved
+# with --save and compared against an earlier run with --baseline, which
+# exits with status 1 when anything got slower than --tolerance allows.
+#
+# Building 1M+ row ledgers takes minutes; --data-dir keeps them between runs
+# and every run works on a copy.
+
+FINAL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+START = date(2015, 1, 1)
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(rows):
+    for suffix, scale in sorted(SUFFIXES.items(), key=lambda item: -item[1]):
+        if rows >= scale and rows % scale == 0:
+            return f"{rows // scale}{suffix.upper() if suffix == 'm' else suffix}"
+    return str(rows)
+
+
+def timed(func, repeat):
+    # Wall time of each call in ms, and the last result.
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+def summarize(timings, **extra):
+    return dict(median_ms=statistics.median(timings), min_ms=min(timings), max_ms=max(timings),
+                runs=len(timings), **extra)
+
+
+def filter_combinations(year):
+    for month in (None, "06"):
+        for year_ in (None, str(year)):
+            for category in (None, "Health"):
+                name = ",".join(f"{key}={value}" for key, value in
+                                (("month", month), ("year", year_), ("category", category)) if value)
+                yield f"get_all_transactions[{name or 'all'}]", (month, year_, category)
+
+
+def build_ledger(path, rows, args):
+    # Returns the ms it took, or None when an earlier ledger was reused.
+    if os.path.exists(path):
+        return None
+    connection.set_db_name(path)
+    database.connect_db()
+    start = time.perf_counter()
+    database.add_transactions(generate_rows(rows, START, args.days, args.seed, notes=True, skew=args.skew))
+    elapsed = (time.perf_counter() - start) * 1000
+    connection.close_all()
+    return elapsed
+
+
+def run_size(rows, args, work_dir):
+    name = f"ledger-{rows}-d{args.days}-s{args.skew:g}-r{args.seed}-v{schema.LATEST_VERSION}.db"
+    source = os.path.join(args.data_dir or work_dir, name)
+    build_ms = build_ledger(source, rows, args)
+    path = os.path.join(work_dir, "bench.db")
+    if source != path:
+        shutil.copyfile(source, path)
+    connection.set_db_name(path)
+    database.connect_db()
+
+    results = {}
+    wanted = re.compile(args.only) if args.only else None
+
+    def record(name, func, repeat=args.repeat, **extra):
+        if wanted and not wanted.search(name):
+            return
+        timings, result = timed(func, repeat)
+        results[name] = summarize(timings, **extra)
+        print(f"  {name:<58}{results[name]['median_ms']:>12.2f} ms", flush=True)
+        return result
+
+    if build_ms is not None and (not wanted or wanted.search("add_transactions")):
+        results["add_transactions"] = summarize([build_ms], rows=rows)
+        print(f"  {'add_transactions':<58}{build_ms:>12.2f} ms", flush=True)
+
+    year = START.year + args.days // 365 // 2
+    for name, filters in filter_combinations(year):
+        record(name, lambda: database.get_all_transactions(*filters))
+    record("get_summary", database.get_summary)
+    record("get_monthly_summary", database.get_monthly_summary)
+
+    export_path = os.path.join(work_dir, "export.csv")
+    record("export", lambda: export_transactions(export_path), repeat=1)
+    record(f"export[year={year}]", lambda: export_transactions(export_path, year=str(year)))
+
+    # Writes last, so the reads above see the ledger as generated.
+    with connection.get_connection() as conn:
+        last_id = conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] or 0
+    rng = random.Random(args.seed)
+    if not wanted or wanted.search("delete"):
+        # Each run deletes a fresh random batch and undoes it, so the ledger
+        # is back to its original rows for the next one.
+        timings = {"delete": [], "undo": []}
+        for _ in range(args.repeat):
+            ids = rng.sample(range(1, last_id + 1), min(args.delete_rows, last_id))
+            timings["delete"] += timed(lambda: database.delete_transactions(ids), 1)[0]
+            timings["undo"] += timed(database.undo_delete, 1)[0]
+        for name, values in timings.items():
+            results[name] = summarize(values, rows=len(ids))
+            print(f"  {name:<58}{results[name]['median_ms']:>12.2f} ms", flush=True)
+    record("add_transaction", lambda: database.add_transaction(
+        date.today().isoformat(), rng.choice(CATEGORIES), 12.34, "Expense", "bench"), repeat=args.ops)
+
+    connection.close_all()
+    os.remove(path)
+    return results
+
+
+def metadata():
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], cwd=FINAL_DIR, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain")
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "when": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.platform(),
+    }
+
+
+def compare(results, baseline, tolerance, min_ms):
+    # Prints median ratios against the baseline and returns the regressions.
+    # Benchmarks faster than min_ms are too noisy to fail on.
+    regressions = []
+    print(f"\nagainst {baseline['meta'].get('commit')} (tolerance {tolerance:.0%})")
+    for size, benches in results.items():
+        old = baseline["results"].get(size, {})
+        for name, result in benches.items():
+            if name not in old:
+                continue
+            ratio = result["median_ms"] / max(old[name]["median_ms"], 1e-6)
+            flag = "SLOWER" if ratio > 1 + tolerance and result["median_ms"] >= min_ms else ""
+            print(f"  {size:>5} {name:<58}{old[name]['median_ms']:>11.2f}{result['median_ms']:>11.2f}"
+                  f"{ratio:>8.2f}x {flag}")
+            if flag:
+                regressions.append(f"{size} {name} {ratio:.2f}x")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the database layer on synthetic ledgers.")
+    parser.add_argument("--sizes", default="10k,100k", help="comma separated row counts, e.g. 10k,100k,1M,10M")
+    parser.add_argument("--days", type=int, default=3650, help="date span of the ledger")
+    parser.add_argument("--skew", type=float, default=1.0, help="category skew, 0 for uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ops", type=int, default=50, help="single inserts timed for add_transaction")
+    parser.add_argument("--delete-rows", type=int, default=1000)
+    parser.add_argument("--only", help="regular expression selecting benchmarks by name")
+    parser.add_argument("--data-dir", help="keep generated ledgers here and reuse them")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file written by --save to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="never fail on benchmarks faster than this")
+    args = parser.parse_args()
+
+    cache.configure(0)
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for rows in map(parse_size, args.sizes.split(",")):
+            label = size_label(rows)
+            print(f"{label} rows", flush=True)
+            results[label] = run_size(rows, args, work_dir)
+
+    report = {"meta": metadata(), "args": vars(args), "results": results}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_ms)
+        for regression in regressions:
+            print(f"FAIL: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
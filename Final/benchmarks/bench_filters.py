@@ -0,0 +1,77 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from ledger import generate_rows
+
+import connection
+import database
+import schema
+
+# The query get_all_transactions ran before the date indexes were added.
+LEGACY_QUERY = "SELECT id, date, category, amount, type FROM transactions WHERE 1=1"
+
+FILTERS = [
+    ("month+year", dict(month="03", year="2020")),
+    ("year", dict(year="2020")),
+    ("month", dict(month="03")),
+    ("category", dict(category="Health")),
+    ("month+year+category", dict(month="03", year="2020", category="Health")),
+]
+
+
+def legacy_get_all_transactions(month=None, year=None, category=None):
+    query = LEGACY_QUERY
+    params = []
+    if month:
+        query += " AND strftime('%m', date) = ?"
+        params.append(month)
+    if year:
+        query += " AND strftime('%Y', date) = ?"
+        params.append(year)
+    if category:
+        query += " AND category = ?"
+        params.append(category)
+    query += " ORDER BY date DESC"
+    with connection.get_connection() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+def median_ms(func, kwargs, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(**kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter latency before and after the date indexes.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.set_db_name(os.path.join(tmp, "bench.db"))
+        schema.migrate(target=1)
+        # Loaded in the version 1 layout the legacy query was written for.
+        with connection.transaction() as conn:
+            conn.executemany("INSERT INTO transactions (date, category, amount, type) VALUES (?, ?, ?, ?)",
+                             generate_rows(args.rows))
+
+        before = {name: median_ms(legacy_get_all_transactions, kw, args.repeat) for name, kw in FILTERS}
+        schema.migrate()
+        after = {name: median_ms(database.get_all_transactions, kw, args.repeat) for name, kw in FILTERS}
+        connection.close_all()
+
+    print(f"{args.rows} rows, median of {args.repeat} runs")
+    print(f"{'filter':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name, _ in FILTERS:
+        print(f"{name:<22}{before[name]:>12.1f}{after[name]:>12.1f}{before[name] / after[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
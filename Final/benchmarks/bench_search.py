@@ -0,0 +1,72 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from ledger import generate_rows
+
+import connection
+import database
+
+# Note search through the FTS5 index against the LIKE '%...%' scan it
+# replaces, on a ledger where every row has a payee note. LIKE stops as soon
+# as it has enough rows, so it only falls behind on rare words; the FTS5
+# search has to stay under --budget-ms for all of them.
+
+SEARCHES = [
+    ("one word", "sushi"),
+    ("prefix", "gro"),
+    ("two words", "dental tai"),
+    ("rare pair", "vinyl penghu"),
+    ("no match", "zeppelin"),
+]
+
+
+def like_search(text, limit=database.SEARCH_LIMIT):
+    where = " AND ".join("t.note LIKE ?" for _ in text.split())
+    params = [f"%{word}%" for word in text.split()]
+    with connection.get_connection() as conn:
+        return conn.execute(f"SELECT {database.ROW_COLUMNS} FROM {database.ROW_SOURCE} WHERE {where} LIMIT ?",
+                            params + [limit]).fetchall()
+
+
+def median_ms(func, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Note search latency, FTS5 against LIKE.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=50, help="fail if an FTS search is slower")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.set_db_name(os.path.join(tmp, "bench.db"))
+        database.connect_db()
+        database.add_transactions(generate_rows(args.rows, notes=True))
+
+        like = {name: median_ms(like_search, text, args.repeat) for name, text in SEARCHES}
+        fts = {name: median_ms(database.search_transactions, text, args.repeat) for name, text in SEARCHES}
+        connection.close_all()
+
+    print(f"{args.rows} rows, median of {args.repeat} runs, up to {database.SEARCH_LIMIT} results")
+    print(f"{'search':<14}{'LIKE ms':>12}{'FTS5 ms':>12}{'speedup':>10}")
+    for name, _ in SEARCHES:
+        print(f"{name:<14}{like[name]:>12.1f}{fts[name]:>12.1f}{like[name] / max(fts[name], 0.01):>9.1f}x")
+    slow = [name for name, ms in fts.items() if ms > args.budget_ms]
+    if slow:
+        print(f"FAIL: over {args.budget_ms:.0f} ms: {', '.join(slow)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
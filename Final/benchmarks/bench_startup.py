@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Measures cold start of the GUI in fresh interpreters:
+#   import   - cumulative `-X importtime` of `import main`
+#   window   - wall time from interpreter start to the first drawn window,
+#              with the login dialog skipped (needs a display)
+# and exits with status 1 if either exceeds its budget or regressed against
+# a saved baseline.
+
+FINAL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+import main
+main.ExpenseTracker.login_screen = lambda self: (self.setup_ui(), self.refresh_table())
+root = tk.Tk()
+shown = []
+root.bind("<Expose>", lambda event: shown or shown.append((time.perf_counter() - start) * 1000))
+main.ExpenseTracker(root)
+while not shown:
+    root.update()
+print(shown[0])
+root.destroy()
+"""
+
+
+HEAVY_MODULES = {"matplotlib", "tkcalendar", "babel", "numpy", "pyarrow"}
+
+
+def profile_import(db_dir):
+    # Returns (cumulative ms of `import main`, heavy top-level packages it pulled in).
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=db_dir, env=_env(), capture_output=True, text=True, check=True)
+    total = None
+    loaded = set()
+    # Lines look like "import time: self [us] | cumulative | imported package".
+    for line in result.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) != 3:
+            continue
+        loaded.add(parts[2].split(".")[0])
+        if parts[2] == "main":
+            total = int(parts[1]) / 1000
+    if total is None:
+        raise RuntimeError("`import main` not found in -X importtime output")
+    return total, sorted(loaded & HEAVY_MODULES)
+
+
+def window_time_ms(db_dir):
+    result = subprocess.run([sys.executable, "-c", WINDOW_SCRIPT],
+                            cwd=db_dir, env=_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = FINAL_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def best_of(func, runs, *args):
+    results = [func(*args) for _ in range(runs)]
+    results = [r for r in results if r is not None]
+    return min(results) if results else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check GUI startup time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=250)
+    parser.add_argument("--max-window-ms", type=float, default=1000)
+    parser.add_argument("--baseline", help="JSON file written by --save to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        imports = [profile_import(db_dir) for _ in range(args.runs)]
+        results = {
+            "import_ms": min(ms for ms, _ in imports),
+            "window_ms": best_of(window_time_ms, args.runs, db_dir),
+            "heavy_modules": imports[0][1],
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if results["heavy_modules"]:
+        failures.append(f"imported at startup: {', '.join(results['heavy_modules'])}")
+    budgets = {"import_ms": args.max_import_ms, "window_ms": args.max_window_ms}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name in budgets:
+            if baseline.get(name):
+                budgets[name] = min(budgets[name], baseline[name] * (1 + args.tolerance))
+    for name, budget in budgets.items():
+        if results[name] is not None and results[name] > budget:
+            failures.append(f"{name} {results[name]:.1f} ms exceeds {budget:.1f} ms")
+    if results["window_ms"] is None:
+        print("No display available, window time not measured.", file=sys.stderr)
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+from datetime import date, timedelta
+from itertools import accumulate
+
+# Benchmarks live one level below the application modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ["Food", "Transport", "Bills", "Entertainment", "Salary", "Shopping", "Health", "Other"]
+
+
+PAYEES = {
+    "Food": ["Greenleaf Grocery", "Corner Bakery", "Sushi Palace", "Harbor Fish Market", "Noodle House"],
+    "Transport": ["City Metro", "Quickcab", "Shell Station", "Parkwise Garage"],
+    "Bills": ["Bright Electric", "Aqua Water Works", "Fibernet Broadband", "Northwind Mobile"],
+    "Entertainment": ["Starlight Cinema", "Vinyl Vault Records", "Arcadia Games"],
+    "Salary": ["Acme Payroll", "Freelance Invoice"],
+    "Shopping": ["Metro Department Store", "Bookworm Books", "Gadget Galaxy", "Thread and Needle"],
+    "Health": ["Riverside Pharmacy", "Downtown Dental", "Peak Fitness Gym"],
+    "Other": ["Post Office", "Charity Donation", "Gift Shop"],
+}
+CITIES = ["Taipei", "Hsinchu", "Taichung", "Tainan", "Kaohsiung", "Keelung", "Yilan", "Hualien",
+          "Taitung", "Chiayi", "Miaoli", "Changhua", "Nantou", "Yunlin", "Pingtung", "Penghu"]
+
+
+def category_weights(skew):
+    # Zipf-like weights: the n-th category is picked 1 / n**skew as often as
+    # the first, so 0 is uniform and larger values pile rows onto Food.
+    return [1 / (rank + 1) ** skew for rank in range(len(CATEGORIES))]
+
+
+def generate_rows(count, start=date(2015, 1, 1), days=3650, seed=0, notes=False, skew=0):
+    # Rows spread over `days` days from start. notes=True adds a payee and
+    # city note as a fifth column.
+    rng = random.Random(seed)
+    weights = list(accumulate(category_weights(skew))) if skew else None
+    for _ in range(count):
+        if weights:
+            category = rng.choices(CATEGORIES, cum_weights=weights)[0]
+        else:
+            category = rng.choice(CATEGORIES)
+        type_ = "Income" if category == "Salary" else "Expense"
+        day = start + timedelta(days=rng.randrange(days))
+        row = (day.isoformat(), category, round(rng.uniform(1, 500), 2), type_)
+        if notes:
+            row += (f"{rng.choice(PAYEES[category])} {rng.choice(CITIES)}",)
+        yield row
@@ -0,0 +1,158 @@
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ledger import generate_rows
+
+import aggregates
+import cache
+import connection
+import database
+from writer import WriteQueue
+
+# Runs --writers processes adding rows to one database file while --readers
+# threads in this process query it, then checks that every row arrived, that
+# the summary tables match, and that nothing failed with "database is
+# locked". Writers either commit every row on its own (--mode direct) or
+# feed a WriteQueue from --threads producer threads each (--mode queue).
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def _write_direct(rows):
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        database.add_transaction(*row)
+        latencies.append(time.perf_counter() - start)
+    return latencies, len(latencies)
+
+
+def _write_queued(rows, threads):
+    latencies = []
+    with WriteQueue() as writes:
+        def produce(part):
+            for row in part:
+                start = time.perf_counter()
+                writes.add(*row).result()
+                latencies.append(time.perf_counter() - start)
+
+        producers = [threading.Thread(target=produce, args=(rows[i::threads],)) for i in range(threads)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+    return latencies, writes.commits
+
+
+def writer(path, index, rows, mode, threads, busy_timeout):
+    # Runs in a child process. Returns (latencies in ms, commits, errors).
+    connection.set_db_name(path)
+    connection.set_busy_timeout(busy_timeout)
+    rows = list(generate_rows(rows, seed=index + 1, notes=True))
+    try:
+        if mode == "queue":
+            latencies, commits = _write_queued(rows, threads)
+        else:
+            latencies, commits = _write_direct(rows)
+    except Exception as e:
+        return [], 0, [f"writer {index}: {e!r}"]
+    finally:
+        connection.close_all()
+    return [s * 1000 for s in latencies], commits, []
+
+
+def reader(stop, latencies, errors, seed):
+    rng = random.Random(seed)
+    queries = [
+        lambda: database.count_transactions(),
+        lambda: database.get_summary(),
+        lambda: database.get_monthly_summary(),
+        lambda: database.get_transactions_page(year=str(rng.randint(2015, 2024))),
+        lambda: database.get_all_transactions(month=f"{rng.randint(1, 12):02d}", year="2020"),
+    ]
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            rng.choice(queries)()
+        except Exception as e:
+            errors.append(f"reader: {e!r}")
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent writer processes and reader threads on one database.")
+    parser.add_argument("--writers", type=int, default=4, help="writer processes")
+    parser.add_argument("--readers", type=int, default=4, help="reader threads")
+    parser.add_argument("--rows", type=int, default=2000, help="rows added by each writer")
+    parser.add_argument("--mode", choices=["direct", "queue"], default="queue")
+    parser.add_argument("--threads", type=int, default=8, help="producer threads per writer in queue mode")
+    parser.add_argument("--busy-timeout", type=float, default=connection.BUSY_TIMEOUT, help="seconds")
+    parser.add_argument("--db", help="database file to use instead of a temporary one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "stress.db")
+        connection.set_db_name(path)
+        connection.set_busy_timeout(args.busy_timeout)
+        database.connect_db()
+        cache.configure(0)
+        before = database.count_transactions()
+
+        stop = threading.Event()
+        read_latencies, errors = [], []
+        readers = [threading.Thread(target=reader, args=(stop, read_latencies, errors, i))
+                   for i in range(args.readers)]
+        start = time.perf_counter()
+        for thread in readers:
+            thread.start()
+        # Forking while the reader threads hold locks could leave them held
+        # forever in the children.
+        with ProcessPoolExecutor(args.writers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(writer, path, i, args.rows, args.mode, args.threads, args.busy_timeout)
+                       for i in range(args.writers)]
+            results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        write_latencies = [ms for latencies, _, _ in results for ms in latencies]
+        commits = sum(c for _, c, _ in results)
+        errors += [e for _, _, errs in results for e in errs]
+        added = database.count_transactions() - before
+        drift = aggregates.verify()
+        connection.close_all()
+
+    expected = args.writers * args.rows
+    print(f"{args.writers} writer processes ({args.mode}), {args.readers} reader threads, {elapsed:.2f} s")
+    print(f"writes: {added}/{expected} rows in {commits} commits, {added / elapsed:.0f} rows/s, "
+          f"latency p50 {percentile(write_latencies, 0.5):.1f} ms, p99 {percentile(write_latencies, 0.99):.1f} ms")
+    if read_latencies:
+        print(f"reads:  {len(read_latencies)} queries, p50 {statistics.median(read_latencies):.1f} ms, "
+              f"p99 {percentile(read_latencies, 0.99):.1f} ms")
+    failures = errors[:10]
+    if added != expected:
+        failures.append(f"expected {expected} new rows, found {added}")
+    if drift:
+        failures.append(f"{len(drift)} summary rows disagree with the transactions")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
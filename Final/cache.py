@@ -0,0 +1,128 @@
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from connection import data_state
+from records import ColumnStore
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _estimate_size(value):
+    # Good enough for the lists of row tuples the database functions return.
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            size += sys.getsizeof(item)
+            if isinstance(item, tuple):
+                size += sum(sys.getsizeof(v) for v in item)
+    return size
+
+
+class QueryCache:
+    # LRU cache of query results bounded by an estimate of their size in bytes.
+    # Every entry records the data state it was computed at and is discarded
+    # once the state has moved on, including after another process's writes.
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        if self.max_bytes <= 0:
+            return compute()
+        state = data_state()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] == state:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._discard(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        value = compute()
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self.entries:
+                self._discard(key)
+            self.entries[key] = (state, value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self.entries)))
+                self.evictions += 1
+        return value
+
+    def _discard(self, key):
+        self.size -= self.entries.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+query_cache = QueryCache()
+
+
+def configure(max_bytes):
+    # max_bytes=0 turns caching off.
+    query_cache.max_bytes = max_bytes
+    query_cache.clear()
+
+
+def stats():
+    return query_cache.stats()
+
+
+def _number_key(value, width):
+    # "6" and "06" share an entry. Anything else is kept as given; the query
+    # itself treats it as matching nothing.
+    try:
+        return f"{int(value):0{width}d}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _normalize_filters(month=None, year=None, category=None):
+    month = None if month in (None, "", "All") else _number_key(month, 2)
+    year = None if year in (None, "", "All") else _number_key(year, 1)
+    category = None if category in (None, "", "All") else category
+    return month, year, category
+
+
+def cached_query(func):
+    # Results are shared between callers, so lists and column stores are
+    # handed out as copies.
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__,) + _normalize_filters(*args, **kwargs)
+        value = query_cache.get(key, lambda: func(*args, **kwargs))
+        return value.copy() if isinstance(value, (list, ColumnStore)) else value
+
+    return wrapper
@@ -0,0 +1,162 @@
+import tkinter as tk
+from tkinter import messagebox
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.dates import num2date
+from matplotlib.figure import Figure
+
+import charts
+from charts import CHARTS
+from connection import data_state
+
+
+class ChartWindow:
+    # One Toplevel, Figure and canvas for a chart type, kept for as long as
+    # the window is open and redrawn in place when its data changes.
+
+    # Zoom and pan fire many limit changes; the view is re-queried once they
+    # have stopped for this long.
+    VIEW_DELAY_MS = 250
+
+    def __init__(self, root, kind, on_close, on_view_change):
+        self.kind = kind
+        self.chart = CHARTS[kind]()
+        self.on_close = on_close
+        self.on_view_change = on_view_change
+        self.generation = None
+        self.background = None
+        self.rendering = False
+        self.view_job = None
+
+        self.win = tk.Toplevel(root)
+        self.win.title(self.chart.title)
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.figure = Figure(figsize=self.chart.figsize)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.win)
+        if getattr(self.chart, "toolbar", False):
+            NavigationToolbar2Tk(self.canvas, self.win)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def render(self, data, generation, lift=True):
+        # Limit changes made while drawing are ours, not the user's.
+        self.rendering = True
+        try:
+            self._render(data)
+        finally:
+            self.rendering = False
+        self.generation = generation
+        if lift:
+            self.lift()
+
+    def _render(self, data):
+        if self.generation is None:
+            self.chart.draw(self.figure, data)
+            self._watch_view()
+        elif self.chart.update(data):
+            limits = self._limits()
+            self.chart.ax.relim()
+            self.chart.ax.autoscale_view()
+            self._mark_animated()
+            if self._limits() == limits and self.background is not None:
+                self._blit()
+            else:
+                self.canvas.draw()
+            return
+        else:
+            self.figure.clear()
+            self.chart.draw(self.figure, data)
+            self._watch_view()
+        self._mark_animated()
+        self.canvas.draw()
+
+    def _watch_view(self):
+        if getattr(self.chart, "toolbar", False):
+            self.chart.ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+    def _on_xlim_changed(self, ax):
+        if self.rendering:
+            return
+        if self.view_job is not None:
+            self.win.after_cancel(self.view_job)
+        self.view_job = self.win.after(self.VIEW_DELAY_MS, self._request_view)
+
+    def _request_view(self):
+        self.view_job = None
+        left, right = self.chart.ax.get_xlim()
+        view = (num2date(left).date().isoformat(), num2date(right).date().isoformat())
+        self.on_view_change(self.kind, view)
+
+    def _limits(self):
+        return self.chart.ax.get_xlim(), self.chart.ax.get_ylim()
+
+    def _mark_animated(self):
+        # Animated artists are left out of the full draw, so the saved
+        # background is everything but them.
+        for artist in self.chart.animated:
+            artist.set_animated(True)
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.chart.animated:
+            self.figure.draw_artist(artist)
+
+    def _blit(self):
+        self.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
+
+    def lift(self):
+        self.win.deiconify()
+        self.win.lift()
+
+    def close(self):
+        if self.view_job is not None:
+            self.win.after_cancel(self.view_job)
+        self.figure.clear()
+        self.canvas.get_tk_widget().destroy()
+        self.win.destroy()
+        self.background = None
+        self.on_close(self.kind)
+
+
+class ChartManager:
+    def __init__(self, root, tasks):
+        self.root = root
+        self.tasks = tasks
+        self.windows = {}
+
+    def is_current(self, kind):
+        # True when the chart is open and nothing was written since it was
+        # drawn, by this process or another one.
+        window = self.windows.get(kind)
+        return window is not None and window.generation == data_state()
+
+    def lift(self, kind):
+        self.windows[kind].lift()
+
+    def render(self, kind, data, generation):
+        if data is None:
+            chart = CHARTS[kind]
+            messagebox.showinfo(chart.empty_title, chart.empty_message)
+            return
+        window = self.windows.get(kind)
+        if window is None:
+            window = self.windows[kind] = ChartWindow(self.root, kind, self._closed, self.request_view)
+        window.render(data, generation)
+
+    def request_view(self, kind, view):
+        # Re-queries only the visible date range after a zoom or pan.
+        def show(result):
+            window = self.windows.get(kind)
+            if window is not None and result[0] is not None:
+                window.render(*result, lift=False)
+
+        self.tasks.submit(charts.load, kind, view, on_done=show, key=kind)
+
+    def _closed(self, kind):
+        self.windows.pop(kind, None)
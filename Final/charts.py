@@ -0,0 +1,254 @@
+# Chart definitions for the chart buttons. They only use matplotlib.figure,
+# not pyplot, so load() can run on a worker thread; main.py imports this
+# module there on the first chart click to keep matplotlib out of startup.
+#
+# draw() builds a chart on an empty figure. update() changes the existing
+# artists in place for new data and returns False when the shape of the data
+# changed and the chart has to be drawn again. The artists update() touches
+# are listed in self.animated so chart_windows can blit just those.
+
+from datetime import date
+
+from matplotlib import cm
+from matplotlib.dates import date2num
+
+import analytics
+from connection import data_state
+from database import get_date_range, get_timeseries
+
+
+class BarChart:
+    title = "Category-wise Expenses"
+    empty_title, empty_message = "Bar Chart", "No expense data to display."
+    figsize = (10, 6)
+
+    def load(self):
+        return analytics.snapshot().category_totals("Expense") or None
+
+    def draw(self, fig, category_totals):
+        self.categories = list(category_totals.keys())
+        values = list(category_totals.values())
+
+        self.ax = ax = fig.add_subplot()
+        self.bars = ax.bar(self.categories, values, color=cm.Pastel1.colors)
+
+        ax.set_title("Expenses by Category")
+        ax.set_ylabel("Amount")
+        ax.set_xlabel("Category")
+        ax.grid(axis="y", linestyle="--", alpha=0.7)
+        ax.tick_params(axis="x", labelrotation=45)
+
+        self.labels = []
+        for bar in self.bars:
+            height = bar.get_height()
+            self.labels.append(ax.text(bar.get_x() + bar.get_width() / 2, height + max(values) * 0.01,
+                                       f"${height:.2f}", ha='center', va='bottom', fontsize=9))
+        self.animated = list(self.bars) + self.labels
+
+    def update(self, category_totals):
+        if list(category_totals.keys()) != self.categories:
+            return False
+        values = list(category_totals.values())
+        for bar, label, value in zip(self.bars, self.labels, values):
+            bar.set_height(value)
+            label.set_y(value + max(values) * 0.01)
+            label.set_text(f"${value:.2f}")
+        return True
+
+
+class WaterfallChart:
+    title = "Income Waterfall Chart"
+    empty_title, empty_message = None, None
+    figsize = (8, 5)
+
+    def load(self):
+        data = analytics.snapshot()
+        income = data.type_total("Income")
+        expense = data.type_total("Expense")
+        return income, expense
+
+    @staticmethod
+    def _steps(income, expense):
+        values = [income, -expense, income - expense]
+        cum_values = [0]
+        for val in values[:-1]:
+            cum_values.append(cum_values[-1] + val)
+        return values, cum_values
+
+    def draw(self, fig, totals):
+        values, cum_values = self._steps(*totals)
+        steps = ["Income", "Expense", "Net"]
+        colors = ["green", "red", "blue"]
+
+        self.ax = ax = fig.add_subplot()
+        self.bars = ax.bar(steps, values, bottom=cum_values, color=colors)
+        ax.axhline(0, color="black", linewidth=0.8)
+        ax.set_title("Income Statement Waterfall")
+        ax.set_ylabel("Amount")
+        ax.grid(axis="y", linestyle="--", alpha=0.6)
+
+        self.labels = [ax.text(i, cum_values[i] + val / 2, f"${val:.2f}", ha="center", va="center",
+                               color="white", fontsize=10)
+                       for i, val in enumerate(values)]
+        self.animated = list(self.bars) + self.labels
+
+    def update(self, totals):
+        values, cum_values = self._steps(*totals)
+        for bar, label, value, bottom in zip(self.bars, self.labels, values, cum_values):
+            bar.set_y(bottom)
+            bar.set_height(value)
+            label.set_y(bottom + value / 2)
+            label.set_text(f"${value:.2f}")
+        return True
+
+
+class PieChart:
+    title = "Expense Pie Chart"
+    empty_title, empty_message = "Pie Chart", "No expense data to display."
+    figsize = None
+
+    def load(self):
+        return analytics.snapshot().category_totals("Expense") or None
+
+    def draw(self, fig, category_totals):
+        labels = list(category_totals.keys())
+        sizes = list(category_totals.values())
+        colors = cm.Set3.colors
+
+        def make_autopct(sizes):
+            def autopct(pct):
+                total = sum(sizes)
+                val = int(round(pct * total / 100.0))
+                return f"{pct:.1f}%\n(${val})"
+
+            return autopct
+
+        self.ax = ax = fig.add_subplot()
+        wedges, texts, autotexts = ax.pie(
+            sizes, labels=labels, autopct=make_autopct(sizes), startangle=140, colors=colors
+        )
+        ax.axis("equal")
+        ax.set_title("Expenses by Category")
+        self.animated = []
+
+    def update(self, category_totals):
+        # Every wedge angle and label moves, so the pie is always redrawn.
+        return False
+
+
+class TimeSeriesChart:
+    # Income and expenses over time. The bucket size follows the visible
+    # range, buckets are computed in SQL for that range only, and zooming or
+    # panning asks for a new load(view) of just the visible dates.
+    title = "Income and Expenses over Time"
+    empty_title, empty_message = "Monthly Chart", "No data available."
+    figsize = (12, 6)
+    toolbar = True
+
+    # (longest visible span in days, granularity, bucket length in days)
+    GRANULARITIES = [
+        (62, "day", 1),
+        (366, "week", 7),
+        (5 * 366, "month", 30.4),
+        (15 * 366, "quarter", 91.3),
+        (None, "year", 365.25),
+    ]
+    LABEL_WIDTH_PX = 60
+
+    def load(self, view=None):
+        first, last = get_date_range()
+        if first is None:
+            return None
+        start, end = view or (first, last)
+        span = (date.fromisoformat(end) - date.fromisoformat(start)).days
+        for max_days, granularity, days in self.GRANULARITIES:
+            if max_days is None or span <= max_days:
+                break
+        return {
+            "view": (start, end),
+            "granularity": granularity,
+            "days": days,
+            "buckets": get_timeseries(start, end, granularity),
+        }
+
+    def draw(self, fig, data):
+        self.fig = fig
+        self.ax = ax = fig.add_subplot()
+        ax.xaxis_date()
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Amount")
+        ax.grid(axis="y", linestyle="--", alpha=0.7)
+        self._plot(data)
+        ax.legend()
+
+    def update(self, data):
+        # The bars for the previous view are replaced, the axes are kept so
+        # the toolbar's zoom history stays valid.
+        for container in self.containers:
+            container.remove()
+        for label in self.labels:
+            label.remove()
+        self._plot(data)
+        return True
+
+    def _plot(self, data):
+        ax = self.ax
+        days = data["days"]
+        buckets = data["buckets"]
+        # Bars are centred in their bucket, income left of expense.
+        centres = [date2num(date.fromisoformat(b)) + days / 2 for b, _, _ in buckets]
+        income = [i for _, i, _ in buckets]
+        expense = [e for _, _, e in buckets]
+        width = days * 0.4
+
+        income_bars = ax.bar([c - width / 2 for c in centres], income, width=width, label="Income", color="green")
+        expense_bars = ax.bar([c + width / 2 for c in centres], expense, width=width, label="Expense", color="red")
+        self.containers = [income_bars, expense_bars]
+
+        start, end = data["view"]
+        ax.set_xlim(date2num(date.fromisoformat(start)), date2num(date.fromisoformat(end)) + 1)
+        # The y range follows the visible buckets, with room for the labels;
+        # a toolbar zoom fixes both limits, so autoscaling can't be relied on.
+        ax.set_ylim(0, max(income + expense, default=0) * 1.1 or 1)
+        ax.set_title(f"Income and Expenses by {data['granularity']}")
+
+        self.labels = self._labels(list(income_bars) + list(expense_bars))
+        self.animated = list(income_bars) + list(expense_bars) + self.labels
+
+    def _labels(self, bars):
+        # Labels go on the tallest bars first, skipping any bar too close to
+        # one already labelled so the texts don't overlap.
+        width_px = self.ax.get_position().width * self.fig.get_figwidth() * self.fig.dpi
+        low, high = self.ax.get_xlim()
+        if not bars or width_px <= 0:
+            return []
+        gap = self.LABEL_WIDTH_PX * (high - low) / width_px
+        offset = max(bar.get_height() for bar in bars) * 0.01
+        labels, taken = [], []
+        for bar in sorted(bars, key=lambda bar: bar.get_height(), reverse=True):
+            x = bar.get_x() + bar.get_width() / 2
+            if not bar.get_height() or not low <= x <= high:
+                continue
+            if any(abs(x - other) < gap for other in taken):
+                continue
+            taken.append(x)
+            labels.append(self.ax.text(x, bar.get_height() + offset, f"${bar.get_height():.2f}",
+                                       ha='center', va='bottom', fontsize=8))
+        return labels
+
+
+CHARTS = {
+    "bar": BarChart,
+    "waterfall": WaterfallChart,
+    "pie": PieChart,
+    "monthly": TimeSeriesChart,
+}
+
+
+def load(kind, view=None):
+    # Runs on a worker thread. The generation is read first so a write that
+    # lands while loading makes the result look stale, never fresh. view is a
+    # (start, end) date pair for charts that re-query on zoom and pan.
+    generation = data_state()
+    chart = CHARTS[kind]()
+    return (chart.load(view) if view else chart.load()), generation
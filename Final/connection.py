@@ -0,0 +1,175 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import InstrumentedConnection
+
+DB_NAME = "expenses.db"
+
+# Pragmas applied to every connection when it is opened. WAL lets readers
+# and the writer work at the same time, and synchronous=NORMAL only fsyncs
+# at checkpoints instead of on every commit. SQLite only enforces foreign
+# keys when asked to, per connection.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds a statement waits for another connection's lock, which may be in
+# another process, before failing with "database is locked".
+BUSY_TIMEOUT = float(os.environ.get("EXPENSES_BUSY_TIMEOUT", 5.0))
+
+# Taking the write lock is retried this many times after the busy timeout
+# ran out, sleeping RETRY_DELAY, then twice as long each time, with jitter so
+# waiting writers do not wake up together.
+WRITE_RETRIES = 5
+RETRY_DELAY = 0.05
+
+_local = threading.local()
+_lock = threading.Lock()
+_connections = []
+_epoch = 0
+_generation = 0
+_external_writes = 0
+
+
+def set_db_name(db_name):
+    global DB_NAME
+    close_all()
+    DB_NAME = db_name
+
+
+def set_busy_timeout(seconds):
+    global BUSY_TIMEOUT
+    close_all()
+    BUSY_TIMEOUT = seconds
+
+
+def _open_connection():
+    conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False, factory=InstrumentedConnection)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def _thread_connection():
+    conn = getattr(_local, "conn", None)
+    # A connection must never be shared with a forked child process.
+    if conn is not None and _local.pid == os.getpid() and _local.epoch == _epoch:
+        return conn
+    conn = _open_connection()
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.epoch = _epoch
+    _local.depth = 0
+    _local.data_version = None
+    with _lock:
+        _connections.append(conn)
+    return conn
+
+
+@contextmanager
+def get_connection():
+    yield _thread_connection()
+
+
+@contextmanager
+def transaction():
+    conn = _thread_connection()
+    if _local.depth:
+        # Nested blocks join the outer transaction, only the outermost commits.
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+
+    _local.depth = 1
+    changes = conn.total_changes
+    try:
+        if not conn.in_transaction:
+            _begin_immediate(conn)
+        with conn:
+            yield conn
+    finally:
+        _local.depth = 0
+    if conn.total_changes != changes:
+        _bump_generation()
+
+
+def is_locked_error(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error))
+
+
+def _begin_immediate(conn):
+    # A deferred transaction only asks for the write lock at its first
+    # write, and in WAL mode fails at once, without waiting, if another
+    # connection committed since it started reading. Taking the lock up front
+    # means all waiting happens here, before any work, so it is safe to retry.
+    delay = RETRY_DELAY
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if attempt == WRITE_RETRIES or not is_locked_error(e):
+                raise
+        time.sleep(delay * random.uniform(0.5, 1.5))
+        delay *= 2
+
+
+def _bump_generation():
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def data_generation():
+    # Increases after every committed write made through transaction(), so
+    # callers can tell whether anything they cached may be stale.
+    return _generation
+
+
+def data_state():
+    # Like data_generation(), but also changes after writes made by other
+    # processes, e.g. a CLI import while the GUI is open. PRAGMA data_version
+    # changes when any other connection commits, but is only comparable on
+    # the same connection, so each thread tracks its own connection's and a
+    # change bumps a shared counter. A thread's first read, on a connection
+    # it has just opened, only records the version: it has nothing to compare
+    # with, and bumping the counter would make everything cached look stale.
+    global _external_writes
+    conn = _thread_connection()
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if getattr(_local, "data_version", None) is None:
+        _local.data_version = version
+    elif _local.data_version != version:
+        _local.data_version = version
+        with _lock:
+            _external_writes += 1
+    return _generation, _external_writes
+
+
+def close_all():
+    global _epoch
+    with _lock:
+        _epoch += 1
+        conns = list(_connections)
+        _connections.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            pass
+    _local.__dict__.clear()
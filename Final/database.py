@@ -1,87 +1,491 @@
+import re
 import sqlite3
+from datetime import date as Date
+from itertools import islice
 
-DB_NAME = "expenses.db"
+from cache import cached_query
+import connection
+from connection import get_connection, transaction
+from records import ColumnStore, to_cents
+import schema
+
+IMPORT_BATCH_SIZE = 5000
+
+# Most rows search_transactions() returns; every match is ranked, so the
+# rest are the weakest matches.
+SEARCH_LIMIT = 500
+
+# Number of delete batches kept in deleted_transactions for undo_delete().
+UNDO_HISTORY = 20
+
+# Amounts are stored as integer cents (see schema.py) and returned in
+# currency units; summing the cents first keeps totals exact. Category and
+# type names are looked up by id. CROSS JOIN keeps transactions as the outer
+# loop so the date indexes still give the ORDER BY for free.
+ROW_COLUMNS = "t.id, t.date, c.name, t.amount_cents / 100.0, ty.name, t.note"
+ROW_SOURCE = ("transactions t CROSS JOIN categories c ON c.id = t.category_id "
+              "CROSS JOIN types ty ON ty.id = t.type_id")
+
+# Type ids for use inside SQL, evaluated once per statement.
+INCOME_ID = "(SELECT id FROM types WHERE name = 'Income')"
+EXPENSE_ID = "(SELECT id FROM types WHERE name = 'Expense')"
+
+
+_schema_checked = set()
 
 def connect_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL,
-            category TEXT NOT NULL,
-            amount REAL NOT NULL,
-            type TEXT NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def add_transaction(date, category, amount, type_):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("INSERT INTO transactions (date, category, amount, type) VALUES (?, ?, ?, ?)",
-              (date, category, amount, type_))
-    conn.commit()
-    conn.close()
+    # The schema check runs once per database per process; schema.migrate()
+    # itself only reads PRAGMA user_version when nothing needs upgrading.
+    if connection.DB_NAME in _schema_checked:
+        return
+    schema.migrate()
+    _schema_checked.add(connection.DB_NAME)
+
+def _category_id(conn, name):
+    # Categories that do not exist yet are created, so the GUI, imports and
+    # the CLI can all introduce new ones.
+    conn.execute("INSERT INTO categories (name) VALUES (?) ON CONFLICT (name) DO NOTHING", (name,))
+    return conn.execute("SELECT id FROM categories WHERE name = ?", (name,)).fetchone()[0]
+
+def _type_id(conn, name):
+    row = conn.execute("SELECT id FROM types WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        raise ValueError(f"Invalid type {name!r}, expected Income or Expense")
+    return row[0]
+
+def _resolve_ids(conn, rows, cents=False):
+    # (date, category, amount, type[, note]) rows to insertable (date,
+    # category_id, cents, type_id, note) rows, looking each distinct name up
+    # only once. With cents=True the amounts are already integer cents.
+    categories = {}
+    types = {}
+    for date, category, amount, type_, *note in rows:
+        if category not in categories:
+            categories[category] = _category_id(conn, category)
+        if type_ not in types:
+            types[type_] = _type_id(conn, type_)
+        yield date, categories[category], amount if cents else to_cents(amount), types[type_], note[0] if note else ""
+
+def insert_transaction(conn, row, cents=False):
+    # Inserts one (date, category, amount, type[, note]) row inside the
+    # caller's transaction and returns its id.
+    values, = _resolve_ids(conn, [row], cents)
+    return conn.execute("INSERT INTO transactions (date, category_id, amount_cents, type_id, note) "
+                        "VALUES (?, ?, ?, ?, ?)", values).lastrowid
+
+def add_transaction(date, category, amount, type_, note="", cents=False):
+    with transaction() as conn:
+        return insert_transaction(conn, (date, category, amount, type_, note), cents)
+
+def add_transactions(rows, batch_size=IMPORT_BATCH_SIZE, cents=False):
+    # rows is consumed lazily, so a generator over a huge file never sits in memory.
+    rows = iter(rows)
+    total = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return total
+        with transaction() as conn:
+            conn.executemany("INSERT INTO transactions (date, category_id, amount_cents, type_id, note) "
+                             "VALUES (?, ?, ?, ?, ?)", _resolve_ids(conn, batch, cents))
+        total += len(batch)
+
+def _month_range(year, month):
+    start = Date(year, month, 1)
+    end = Date(year + 1, 1, 1) if month == 12 else Date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def _year_of(value, default):
+    # Rows with malformed dates can sort before or after the real ones.
+    try:
+        return int(value[:4])
+    except ValueError:
+        return default
+
+
+def _filter_number(value, low, high):
+    # A month or year filter as an int, or None when it is not a number in
+    # range.
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if low <= number <= high else None
+
+
+def _date_ranges(conn, month, year):
+    # A month or year that is not a valid number matches nothing.
+    if month:
+        month = _filter_number(month, 1, 12)
+        if month is None:
+            return []
+    if year:
+        year = _filter_number(year, 1, 9998)
+        if year is None:
+            return []
+
+    if year and month:
+        return [_month_range(year, month)]
+    if year:
+        return [(Date(year, 1, 1).isoformat(), Date(year + 1, 1, 1).isoformat())]
+
+    # A month without a year becomes one range per year present in the table.
+    # MIN/MAX are answered from the date index without scanning; rows with an
+    # empty or malformed date are left out as in get_date_range().
+    first, last = conn.execute("""
+        SELECT (SELECT MIN(date) FROM transactions WHERE date >= '0000-01-01'),
+               (SELECT MAX(date) FROM transactions WHERE date <= '9999-12-31')
+    """).fetchone()
+    if not first:
+        return []
+    first_year = _year_of(first, 1900)
+    last_year = _year_of(last, Date.today().year)
+    return [_month_range(y, month) for y in range(first_year, last_year + 1)]
+
+
+def _filter_clauses(conn, month=None, year=None, category=None):
+    # Month and year become half-open date ranges instead of strftime()
+    # comparisons so SQLite can use the date indexes. Each range gets its own
+    # (where, params) pair, newest first: running them one after another reads
+    # the index in order, where an OR of ranges would need a full sort.
+    month = None if month == "All" else month
+    year = None if year == "All" else year
+    category = None if category == "All" else category
+
+    if month or year:
+        clauses = [("t.date >= ? AND t.date < ?", [start, end])
+                   for start, end in reversed(_date_ranges(conn, month, year))]
+    else:
+        clauses = [("1", [])]
 
+    if category:
+        clauses = [(f"{where} AND t.category_id = (SELECT id FROM categories WHERE name = ?)", params + [category])
+                   for where, params in clauses]
+    return clauses
+
+
+@cached_query
 def get_all_transactions(month=None, year=None, category=None):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    query = "SELECT id, date, category, amount, type FROM transactions WHERE 1=1"
-    params = []
-
-    if month and month != "All":
-        query += " AND strftime('%m', date) = ?"
-        params.append(month)
-    if year and year != "All":
-        query += " AND strftime('%Y', date) = ?"
-        params.append(year)
-    if category and category != "All":
-        query += " AND category = ?"
-        params.append(category)
-
-    query += " ORDER BY date DESC"
-
-    c.execute(query, params)
-    results = c.fetchall()
-    conn.close()
+    # Returned as a ColumnStore; the query cache hands each caller a copy.
+    with get_connection() as conn:
+        results = ColumnStore(dict(conn.execute("SELECT id, name FROM categories")),
+                              dict(conn.execute("SELECT id, name FROM types")))
+        for where, params in _filter_clauses(conn, month, year, category):
+            # Day ordinals are computed by SQLite; julianday() of 0001-01-01 is 1721425.5.
+            query = f"""
+                SELECT t.id,
+                       CASE WHEN date(t.date) IS t.date THEN CAST(julianday(t.date) - 1721424.5 AS INTEGER) ELSE 0 END,
+                       t.category_id, t.amount_cents, t.type_id,
+                       CASE WHEN date(t.date) IS t.date THEN NULL ELSE t.date END,
+                       NULLIF(t.note, '')
+                FROM transactions t WHERE {where} ORDER BY t.date DESC, t.id DESC
+            """
+            results.extend(conn.execute(query, params))
     return results
 
 
+def iter_transactions(month=None, year=None, category=None, chunk_size=1000):
+    # Same rows and order as get_all_transactions(), streamed with fetchmany()
+    # so callers can write out any number of rows in constant memory.
+    with get_connection() as conn:
+        for where, params in _filter_clauses(conn, month, year, category):
+            cursor = conn.execute(
+                f"SELECT {ROW_COLUMNS} FROM {ROW_SOURCE} WHERE {where} ORDER BY t.date DESC, t.id DESC",
+                params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+
+@cached_query
+def count_transactions(month=None, year=None, category=None):
+    total = 0
+    with get_connection() as conn:
+        for where, params in _filter_clauses(conn, month, year, category):
+            total += conn.execute(f"SELECT COUNT(*) FROM transactions t WHERE {where}", params).fetchone()[0]
+    return total
+
+
+def get_transactions_page(month=None, year=None, category=None, after=None, before=None, limit=200):
+    # Keyset pagination in (date, id) descending order. after=(date, id) returns
+    # the rows that follow that key, before=(date, id) the rows that precede it,
+    # so no page ever needs an OFFSET scan.
+    rows = []
+    with get_connection() as conn:
+        clauses = _filter_clauses(conn, month, year, category)
+        if before is None:
+            key, op, order = after, "<", "DESC"
+        else:
+            key, op, order = before, ">", "ASC"
+            clauses.reverse()
+        for where, params in clauses:
+            if key is not None:
+                where += f" AND (t.date, t.id) {op} (?, ?)"
+                params = params + list(key)
+            query = (f"SELECT {ROW_COLUMNS} FROM {ROW_SOURCE} WHERE {where} "
+                     f"ORDER BY t.date {order}, t.id {order} LIMIT ?")
+            rows.extend(conn.execute(query, params + [limit - len(rows)]))
+            if len(rows) >= limit:
+                break
+    if before is not None:
+        rows.reverse()
+    return rows
+
+
+def fts_query(text):
+    # Search box text to an FTS5 query: every word has to match, as a prefix
+    # of a word in the note, so 'gro sup' finds "Grocery superstore".
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words) or None
+
+def search_transactions(text, month=None, year=None, category=None, limit=SEARCH_LIMIT):
+    # Transactions whose note matches text, best match (bm25) first, through
+    # the transactions_fts index rather than a LIKE scan. All matches are
+    # scored and sorted in SQL; only the best limit rows reach Python.
+    query = fts_query(text)
+    if query is None:
+        return []
+    with get_connection() as conn:
+        clauses = _filter_clauses(conn, month, year, category)
+        # No clauses at all when the filter can match nothing.
+        where = " OR ".join(f"({w})" for w, _ in clauses) or "0"
+        params = [p for _, ps in clauses for p in ps]
+        if clauses == [("1", [])]:
+            # Unfiltered: let FTS5 rank and limit before the join.
+            return conn.execute(f"""
+                SELECT {ROW_COLUMNS} FROM (
+                    SELECT rowid, rank FROM transactions_fts
+                    WHERE transactions_fts MATCH ?
+                    ORDER BY rank, rowid DESC
+                    LIMIT ?
+                ) f
+                CROSS JOIN transactions t ON t.id = f.rowid
+                CROSS JOIN categories c ON c.id = t.category_id
+                CROSS JOIN types ty ON ty.id = t.type_id
+                ORDER BY f.rank, f.rowid DESC
+            """, [query, limit]).fetchall()
+        return conn.execute(f"""
+            SELECT {ROW_COLUMNS} FROM transactions_fts f
+            CROSS JOIN transactions t ON t.id = f.rowid
+            CROSS JOIN categories c ON c.id = t.category_id
+            CROSS JOIN types ty ON ty.id = t.type_id
+            WHERE transactions_fts MATCH ? AND ({where})
+            ORDER BY f.rank, f.rowid DESC
+            LIMIT ?
+        """, [query] + params + [limit]).fetchall()
+
 
 def delete_transaction(transaction_id):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
-    conn.commit()
-    conn.close()
+    delete_transactions([transaction_id])
+
+def _variable_limit(conn):
+    try:
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    except AttributeError:
+        # Connection.getlimit() needs Python 3.11; 999 is SQLite's oldest default.
+        return 999
+
+def delete_transactions(ids):
+    # Deletes all ids in one transaction and moves the rows into the delete
+    # journal. Returns the batch id to pass to undo_delete(), or None.
+    ids = list(ids)
+    if not ids:
+        return None
+    with transaction() as conn:
+        batch_id = conn.execute("SELECT COALESCE(MAX(batch_id), 0) + 1 FROM deleted_transactions").fetchone()[0]
+        chunk_size = _variable_limit(conn) - 1
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ", ".join("?" * len(chunk))
+            conn.execute(f"""
+                INSERT INTO deleted_transactions (batch_id, id, date, category_id, amount_cents, type_id, note)
+                SELECT ?, id, date, category_id, amount_cents, type_id, note FROM transactions WHERE id IN ({placeholders})
+            """, [batch_id] + chunk)
+            conn.execute(f"DELETE FROM transactions WHERE id IN ({placeholders})", chunk)
+        conn.execute("DELETE FROM deleted_transactions WHERE batch_id <= ?", (batch_id - UNDO_HISTORY,))
+    return batch_id
+
+def undo_delete(batch_id=None):
+    # Restores a delete batch, the most recent one by default. AUTOINCREMENT
+    # never reuses ids, so the rows come back with their original ids.
+    # Returns the number of rows restored.
+    with transaction() as conn:
+        if batch_id is None:
+            batch_id = conn.execute("SELECT MAX(batch_id) FROM deleted_transactions").fetchone()[0]
+            if batch_id is None:
+                return 0
+        restored = conn.execute("""
+            INSERT INTO transactions (id, date, category_id, amount_cents, type_id, note)
+            SELECT id, date, category_id, amount_cents, type_id, note FROM deleted_transactions WHERE batch_id = ?
+        """, (batch_id,)).rowcount
+        conn.execute("DELETE FROM deleted_transactions WHERE batch_id = ?", (batch_id,))
+    return restored
+
+def get_years():
+    # Distinct years, oldest first, found by seeking the date index once per
+    # year instead of scanning every row.
+    years = []
+    with get_connection() as conn:
+        row = conn.execute("SELECT MIN(date) FROM transactions WHERE date >= '0000'").fetchone()
+        while row[0]:
+            year = _year_of(row[0], None)
+            if year is None:
+                break
+            years.append(f"{year:04d}")
+            row = conn.execute("SELECT MIN(date) FROM transactions WHERE date >= ?", (f"{year + 1:04d}",)).fetchone()
+    return years
 
+@cached_query
 def get_summary():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("""
-        SELECT type, SUM(amount) FROM transactions GROUP BY type
-    """)
-    summary = c.fetchall()
-    conn.close()
-    return summary
+    # Served from the trigger-maintained summary tables (see schema.py).
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT ty.name, s.total_cents / 100.0 FROM summary_by_type s
+            JOIN types ty ON ty.id = s.type_id ORDER BY ty.name
+        """).fetchall()
 
+@cached_query
 def get_monthly_summary():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("""
-        SELECT 
-            strftime('%Y-%m', date) as month,
-            SUM(CASE WHEN type = 'Income' THEN amount ELSE 0 END) as income,
-            SUM(CASE WHEN type = 'Expense' THEN amount ELSE 0 END) as expense
-        FROM transactions
-        WHERE date IS NOT NULL AND date != ''
-        GROUP BY month
-        HAVING month IS NOT NULL AND month != ''
-        ORDER BY month
-    """)
-    data = c.fetchall()
-    conn.close()
-    return [(m, i or 0, e or 0) for m, i, e in data]
+    with get_connection() as conn:
+        return conn.execute(f"""
+            SELECT
+                month,
+                SUM(CASE WHEN type_id = {INCOME_ID} THEN total_cents ELSE 0 END) / 100.0 as income,
+                SUM(CASE WHEN type_id = {EXPENSE_ID} THEN total_cents ELSE 0 END) / 100.0 as expense
+            FROM summary_by_month
+            GROUP BY month
+            ORDER BY month
+        """).fetchall()
+
+@cached_query
+def get_categories():
+    with get_connection() as conn:
+        return [name for name, in conn.execute("SELECT name FROM categories ORDER BY name")]
+
+def get_default_category(type_):
+    # The category used most often with this type, or the first one when the
+    # type has no transactions yet. "" when there are no categories.
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT c.name FROM summary_by_category_month s
+            JOIN categories c ON c.id = s.category_id
+            WHERE s.type_id = (SELECT id FROM types WHERE name = ?)
+            GROUP BY s.category_id ORDER BY SUM(s.count) DESC, c.name LIMIT 1
+        """, (type_,)).fetchone()
+        if row is None:
+            row = conn.execute("SELECT name FROM categories ORDER BY name LIMIT 1").fetchone()
+    return row[0] if row else ""
+
+def _category_name(name):
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("Category name is required")
+    return name
+
+def add_category(name):
+    name = _category_name(name)
+    with transaction() as conn:
+        try:
+            conn.execute("INSERT INTO categories (name) VALUES (?)", (name,))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Category {name!r} already exists")
+
+def rename_category(name, new_name):
+    # Transactions refer to the category by id, so nothing else is rewritten.
+    new_name = _category_name(new_name)
+    with transaction() as conn:
+        try:
+            renamed = conn.execute("UPDATE categories SET name = ? WHERE name = ?", (new_name, name)).rowcount
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Category {new_name!r} already exists")
+    if not renamed:
+        raise ValueError(f"Unknown category {name!r}")
+
+def delete_category(name):
+    # Only unused categories can be removed; their budget goes with them.
+    with transaction() as conn:
+        try:
+            deleted = conn.execute("DELETE FROM categories WHERE name = ?", (name,)).rowcount
+        except sqlite3.IntegrityError:
+            # The reference is either a transaction or one kept for undo.
+            used = conn.execute("""
+                SELECT 1 FROM transactions WHERE category_id = (SELECT id FROM categories WHERE name = ?) LIMIT 1
+            """, (name,)).fetchone()
+            if used:
+                raise ValueError(f"Category {name!r} is still used by transactions")
+            raise ValueError(f"Category {name!r} is still used by deleted transactions that can be restored "
+                             f"with Undo")
+    if not deleted:
+        raise ValueError(f"Unknown category {name!r}")
+
+@cached_query
+def get_budgets():
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT c.name, b.amount_cents / 100.0 FROM budgets b
+            JOIN categories c ON c.id = b.category_id ORDER BY c.name
+        """).fetchall()
+
+def set_budget(category, amount):
+    # amount=None removes the budget.
+    with transaction() as conn:
+        if amount is None:
+            conn.execute("DELETE FROM budgets WHERE category_id = (SELECT id FROM categories WHERE name = ?)",
+                         (category,))
+            return
+        updated = conn.execute("""
+            INSERT INTO budgets (category_id, amount_cents) SELECT id, ? FROM categories WHERE name = ?
+            ON CONFLICT (category_id) DO UPDATE SET amount_cents = excluded.amount_cents
+        """, (to_cents(amount), category)).rowcount
+    if not updated:
+        raise ValueError(f"Unknown category {category!r}")
+
+def get_date_range():
+    # Oldest and newest well-formed dates, or (None, None) for an empty table.
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT MIN(date), MAX(date) FROM transactions WHERE date BETWEEN '0000-01-01' AND '9999-12-31'
+        """).fetchone()
+
+# Bucket start date for each granularity. Day and week buckets are computed
+# from transactions, the coarser ones from the summary_by_month table.
+_DAILY_BUCKETS = {
+    "day": "date",
+    "week": "date(date, '-6 days', 'weekday 1')",
+}
+_MONTHLY_BUCKETS = {
+    "month": "month || '-01'",
+    "quarter": "substr(month, 1, 5) || printf('%02d', (CAST(substr(month, 6, 2) AS INTEGER) - 1) / 3 * 3 + 1) || '-01'",
+    "year": "substr(month, 1, 4) || '-01-01'",
+}
+
+def get_timeseries(start, end, granularity):
+    # Income and expense per bucket for dates in [start, end], oldest first,
+    # as (bucket start date, income, expense).
+    with get_connection() as conn:
+        if granularity in _DAILY_BUCKETS:
+            bucket = _DAILY_BUCKETS[granularity]
+            return conn.execute(f"""
+                SELECT
+                    {bucket} AS bucket,
+                    SUM(CASE WHEN type_id = {INCOME_ID} THEN amount_cents ELSE 0 END) / 100.0,
+                    SUM(CASE WHEN type_id = {EXPENSE_ID} THEN amount_cents ELSE 0 END) / 100.0
+                FROM transactions
+                WHERE date >= ? AND date <= ?
+                GROUP BY bucket
+                ORDER BY bucket
+            """, (start, end)).fetchall()
+
+        bucket = _MONTHLY_BUCKETS[granularity]
+        return conn.execute(f"""
+            SELECT
+                {bucket} AS bucket,
+                SUM(CASE WHEN type_id = {INCOME_ID} THEN total_cents ELSE 0 END) / 100.0,
+                SUM(CASE WHEN type_id = {EXPENSE_ID} THEN total_cents ELSE 0 END) / 100.0
+            FROM summary_by_month
+            WHERE month >= ? AND month <= ?
+            GROUP BY bucket
+            ORDER BY bucket
+        """, (start[:7], end[:7])).fetchall()
@@ -0,0 +1,189 @@
+# Headless entry point: python -m expenses add|import|query|search|summary|export|category|budget
+# Only the database modules are imported here, never tkinter or matplotlib.
+
+import argparse
+import json
+import os
+import sys
+
+import connection
+import database
+import exporter
+import importer
+import metrics
+from exporter import write_rows
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--month", help="two-digit month, e.g. 03")
+    parser.add_argument("--year", help="four-digit year")
+    parser.add_argument("--category")
+
+
+def cmd_add(args):
+    row = importer.validate_row(
+        {"date": args.date, "category": args.category, "amount": args.amount, "type": args.type, "note": args.note})
+    database.add_transaction(*row, cents=True)
+    return 0
+
+
+def cmd_import(args):
+    report = importer.import_file(args.file, batch_size=args.batch_size)
+    for line, error in report.errors:
+        print(f"{args.file}:{line}: {error}", file=sys.stderr)
+    print(f"Imported {report.imported} transactions, skipped {report.rejected}.", file=sys.stderr)
+    return 1 if report.rejected else 0
+
+
+def cmd_query(args):
+    rows = database.iter_transactions(args.month, args.year, args.category)
+    write_rows(rows, sys.stdout, args.format)
+    return 0
+
+
+def cmd_search(args):
+    rows = database.search_transactions(args.text, args.month, args.year, args.category, limit=args.limit)
+    write_rows(rows, sys.stdout, args.format)
+    return 0
+
+
+def cmd_summary(args):
+    if args.monthly:
+        write_rows(database.get_monthly_summary(), sys.stdout, args.format, ["Month", "Income", "Expense"])
+    else:
+        write_rows(database.get_summary(), sys.stdout, args.format, ["Type", "Total"])
+    return 0
+
+
+def cmd_export(args):
+    def progress(done, total):
+        print(f"\rExported {done}/{total} rows", end="", file=sys.stderr)
+
+    exporter.export_transactions(args.file, args.format, args.month, args.year, args.category,
+                                 progress=progress if sys.stderr.isatty() else None)
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+    return 0
+
+
+def cmd_category(args):
+    if args.action == "add":
+        database.add_category(args.name)
+    elif args.action == "rename":
+        database.rename_category(args.name, args.new_name)
+    elif args.action == "remove":
+        database.delete_category(args.name)
+    else:
+        write_rows(([name] for name in database.get_categories()), sys.stdout, args.format, ["Category"])
+    return 0
+
+
+def cmd_budget(args):
+    if args.action == "set":
+        database.set_budget(args.category, args.amount)
+    elif args.action == "remove":
+        database.set_budget(args.category, None)
+    else:
+        write_rows(database.get_budgets(), sys.stdout, args.format, ["Category", "Budget"])
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="expenses", description="Expense database without the GUI.")
+    parser.add_argument("--db", default=connection.DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument("--busy-timeout", type=float, default=connection.BUSY_TIMEOUT,
+                        help="seconds to wait for another process's write lock (default: %(default)s)")
+    parser.add_argument("--metrics", choices=["text", "json"],
+                        help="time every SQL statement and print the stats to stderr when done")
+    parser.add_argument("--slow-ms", type=float, default=metrics.SLOW_QUERY_MS,
+                        help="log the query plan of statements slower than this (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add one transaction")
+    add.add_argument("date", help="YYYY-MM-DD")
+    add.add_argument("category")
+    add.add_argument("amount")
+    add.add_argument("type", choices=importer.TYPES)
+    add.add_argument("--note", default="", help="payee or description")
+    add.set_defaults(func=cmd_add)
+
+    import_ = commands.add_parser("import", help="import a CSV or JSON-lines file")
+    import_.add_argument("file")
+    import_.add_argument("--batch-size", type=int, default=database.IMPORT_BATCH_SIZE)
+    import_.set_defaults(func=cmd_import)
+
+    query = commands.add_parser("query", help="print transactions to stdout")
+    add_filter_arguments(query)
+    query.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    query.set_defaults(func=cmd_query)
+
+    search = commands.add_parser("search", help="print transactions whose note matches, best match first")
+    search.add_argument("text", help="words to look for; each matches as a prefix")
+    add_filter_arguments(search)
+    search.add_argument("--limit", type=int, default=database.SEARCH_LIMIT)
+    search.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    search.set_defaults(func=cmd_search)
+
+    summary = commands.add_parser("summary", help="print totals by type, or by month")
+    summary.add_argument("--monthly", action="store_true")
+    summary.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    summary.set_defaults(func=cmd_summary)
+
+    export = commands.add_parser("export", help="write transactions to a file")
+    export.add_argument("file")
+    add_filter_arguments(export)
+    export.add_argument("--format", choices=exporter.FORMATS,
+                        help="default: chosen from the file extension, csv otherwise")
+    export.set_defaults(func=cmd_export)
+
+    category = commands.add_parser("category", help="list or edit categories")
+    category.set_defaults(func=cmd_category)
+    actions = category.add_subparsers(dest="action", required=True)
+    actions.add_parser("list").add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    actions.add_parser("add").add_argument("name")
+    rename = actions.add_parser("rename")
+    rename.add_argument("name")
+    rename.add_argument("new_name")
+    actions.add_parser("remove", help="remove a category no transaction uses").add_argument("name")
+
+    budget = commands.add_parser("budget", help="list or edit category budgets")
+    budget.set_defaults(func=cmd_budget)
+    actions = budget.add_subparsers(dest="action", required=True)
+    actions.add_parser("list").add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    set_ = actions.add_parser("set")
+    set_.add_argument("category")
+    set_.add_argument("amount")
+    actions.add_parser("remove").add_argument("category")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+        metrics.SLOW_QUERY_MS = args.slow_ms
+    connection.set_db_name(args.db)
+    connection.set_busy_timeout(args.busy_timeout)
+    database.connect_db()
+    try:
+        return args.func(args)
+    except (ValueError, RuntimeError) as e:
+        print(f"expenses: {e}", file=sys.stderr)
+        return 2
+    except BrokenPipeError:
+        # The reader went away, e.g. `python -m expenses query | head`.
+        # Point stdout at devnull so the flush at exit does not fail again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        connection.close_all()
+        if args.metrics == "json":
+            json.dump(metrics.registry.snapshot(), sys.stderr, indent=2)
+            print(file=sys.stderr)
+        elif args.metrics:
+            print(metrics.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
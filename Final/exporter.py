@@ -0,0 +1,115 @@
+import csv
+import json
+from itertools import islice
+
+from database import count_transactions, iter_transactions
+
+HEADER = ["ID", "Date", "Category", "Amount", "Type", "Note"]
+FORMATS = ("csv", "jsonl", "parquet", "arrow")
+EXPORT_CHUNK_SIZE = 50000
+
+
+def format_for_path(path):
+    extension = path.rsplit(".", 1)[-1].lower()
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension in ("arrow", "feather", "ipc"):
+        return "arrow"
+    if extension == "parquet":
+        return "parquet"
+    return "csv"
+
+
+def _text_writer(out, fmt, header=HEADER):
+    if fmt == "jsonl":
+        keys = [h.lower() for h in header]
+
+        def write_chunk(rows):
+            out.writelines(json.dumps(dict(zip(keys, row))) + "\n" for row in rows)
+
+        return write_chunk
+
+    writer = csv.writer(out)
+    writer.writerow(header)
+    return writer.writerows
+
+
+def write_rows(rows, out, fmt, header=HEADER):
+    _text_writer(out, fmt, header)(rows)
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _arrow_writer(path, fmt):
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError(f"Exporting to {fmt} needs the pyarrow package (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.string()),
+        ("category", pa.string()),
+        ("amount", pa.float64()),
+        ("type", pa.string()),
+        ("note", pa.string()),
+    ])
+    if fmt == "parquet":
+        writer = pa.parquet.ParquetWriter(path, schema)
+        # Every chunk becomes one row group.
+        write = writer.write_table
+        to_batch = lambda columns: pa.Table.from_arrays(columns, schema=schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+        write = writer.write_batch
+        to_batch = lambda columns: pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    def write_chunk(chunk):
+        columns = [pa.array(column, type=field.type) for column, field in zip(zip(*chunk), schema)]
+        write(to_batch(columns))
+
+    return writer, write_chunk
+
+
+def export_transactions(path, fmt=None, month=None, year=None, category=None,
+                        progress=None, chunk_size=EXPORT_CHUNK_SIZE):
+    # Streams the filtered transactions to path without holding more than
+    # chunk_size rows in memory. progress(done, total) is called after every
+    # chunk. Returns the number of rows written.
+    fmt = fmt or format_for_path(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+
+    total = count_transactions(month, year, category)
+    rows = iter_transactions(month, year, category, chunk_size=chunk_size)
+    done = 0
+
+    if fmt in ("parquet", "arrow"):
+        writer, write_chunk = _arrow_writer(path, fmt)
+        try:
+            for chunk in _chunks(rows, chunk_size):
+                write_chunk(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+        finally:
+            writer.close()
+        return done
+
+    with open(path, mode="w", newline="", encoding="utf-8") as f:
+        write_chunk = _text_writer(f, fmt)
+        for chunk in _chunks(rows, chunk_size):
+            write_chunk(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    return done
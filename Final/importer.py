@@ -0,0 +1,96 @@
+import csv
+import json
+from datetime import datetime
+
+from database import add_transactions, IMPORT_BATCH_SIZE
+from records import to_cents
+
+TYPES = ("Income", "Expense")
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, message, max_errors=100):
+        self.rejected += 1
+        if len(self.errors) < max_errors:
+            self.errors.append((line, message))
+
+
+def _field(row, name):
+    # The exporter writes capitalised headers ("Date"), hand-written files often don't.
+    value = row.get(name.capitalize())
+    if value is None:
+        value = row.get(name)
+    return value
+
+
+def validate_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("Expected an object with date, category, amount and type")
+    date = str(_field(row, "date") or "").strip()
+    category = str(_field(row, "category") or "").strip()
+    amount = _field(row, "amount")
+    type_ = str(_field(row, "type") or "").strip()
+    note = str(_field(row, "note") or _field(row, "payee") or "").strip()
+
+    try:
+        parsed = datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid date {date!r}, expected YYYY-MM-DD")
+    # strptime also accepts "2024-1-5"; the stored form must be zero-padded
+    # for the date range filters and strftime() to see it.
+    date = parsed.date().isoformat()
+    if not category:
+        raise ValueError("Category is required")
+    # Converted to whole cents here and stored as is (cents=True when adding).
+    amount = to_cents(amount)
+    if type_ not in TYPES:
+        raise ValueError(f"Invalid type {type_!r}, expected Income or Expense")
+
+    return date, category, amount, type_, note
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line_num, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_num, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_num, ValueError(f"Invalid JSON: {e.msg}")
+
+
+def _valid_rows(rows, report):
+    for line_num, row in rows:
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            yield validate_row(row)
+        except ValueError as e:
+            report.reject(line_num, str(e))
+            continue
+        report.imported += 1
+
+
+def import_file(path, batch_size=IMPORT_BATCH_SIZE):
+    if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+        rows = read_jsonl(path)
+    else:
+        rows = read_csv(path)
+
+    report = ImportReport()
+    add_transactions(_valid_rows(rows, report), batch_size=batch_size, cents=True)
+    return report
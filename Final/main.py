@@ -1,23 +1,36 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
-from tkcalendar import DateEntry
-from database import connect_db, add_transaction, get_all_transactions, get_summary, delete_transaction, \
-    get_monthly_summary
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from database import connect_db, add_transaction, get_summary, delete_transactions, \
+    undo_delete, count_transactions, get_transactions_page, get_years, get_categories, add_category, \
+    get_default_category, rename_category, delete_category, get_budgets, set_budget, search_transactions, \
+    SEARCH_LIMIT
+import analytics
+import cache
+import metrics
+from virtual_table import VirtualTable
+from tasks import TaskRunner
 from datetime import datetime
-import csv
+from functools import partial
+import importer
+from exporter import export_transactions
 
-connect_db()
+# tkcalendar and matplotlib are slow to import and are not needed to show the
+# window, so they are imported on first use (see create_date_entry() and
+# show_chart()).
 
 
-class SafeDateEntry(DateEntry):
-    def _on_focus_out_cal(self, event):
-        try:
-            if self.focus_get() is not None:
-                self._top_cal.withdraw()
-        except KeyError:
-            pass
+def create_date_entry(master):
+    from tkcalendar import DateEntry
+
+    class SafeDateEntry(DateEntry):
+        def _on_focus_out_cal(self, event):
+            try:
+                if self.focus_get() is not None:
+                    self._top_cal.withdraw()
+            except KeyError:
+                pass
+
+    return SafeDateEntry(master)
 
 
 class ExpenseTracker:
@@ -27,7 +40,11 @@ class ExpenseTracker:
         self.root.geometry("1200x650")
 
         self.style = ttk.Style()
-        self.categories = ["Food", "Transport", "Bills", "Entertainment", "Salary", "Shopping", "Health", "Other"]
+        self.tasks = TaskRunner(self.root, on_busy=self.set_busy)
+        self.total = 0
+        self.charts = None
+
+        connect_db()
 
         self.login_screen()
 
@@ -50,30 +67,44 @@ class ExpenseTracker:
         self.month_combo.grid(row=0, column=1, padx=5, pady=5)
         self.month_combo.set("All")
 
-        self.year_combo = ttk.Combobox(filter_frame,
-                                       values=["All"] + [str(y) for y in range(2020, datetime.now().year + 1)], width=6,
-                                       state="readonly")
+        # The year list comes from the data and is only read when the list opens.
+        self.year_combo = ttk.Combobox(filter_frame, values=["All"], width=6, state="readonly",
+                                       postcommand=self.update_year_list)
         self.year_combo.grid(row=0, column=3, padx=5, pady=5)
         self.year_combo.set("All")
 
+        # Categories live in the database and can change while the app runs,
+        # so both category lists are refilled whenever they open.
+        categories = get_categories()
         ttk.Label(filter_frame, text="Category:").grid(row=0, column=4, padx=5, pady=5)
-        self.filter_category_combo = ttk.Combobox(filter_frame, values=["All"] + self.categories, state="readonly")
+        self.filter_category_combo = ttk.Combobox(filter_frame, values=["All"] + categories, state="readonly",
+                                                  postcommand=self.update_category_lists)
         self.filter_category_combo.grid(row=0, column=5, padx=5, pady=5)
         self.filter_category_combo.set("All")
 
-        ttk.Button(filter_frame, text="Apply Filter", command=self.apply_filter).grid(row=0, column=6, padx=5, pady=5)
+        # Searches the notes; words match as prefixes and results are ranked.
+        ttk.Label(filter_frame, text="Search:").grid(row=0, column=6, padx=5, pady=5)
+        self.search_entry = ttk.Entry(filter_frame)
+        self.search_entry.grid(row=0, column=7, padx=5, pady=5)
+        self.search_entry.bind("<Return>", lambda event: self.apply_filter())
+
+        ttk.Button(filter_frame, text="Apply Filter", command=self.apply_filter).grid(row=0, column=8, padx=5, pady=5)
 
         input_frame = ttk.LabelFrame(self.root, text="Add Transaction")
         input_frame.pack(fill="x", padx=10, pady=10)
 
         ttk.Label(input_frame, text="Date:").grid(row=0, column=0, padx=5, pady=5)
-        self.date_entry = SafeDateEntry(input_frame)
-        self.date_entry.grid(row=0, column=1, padx=5, pady=5)
+        # Built after the window is first drawn, see create_date_entry().
+        self.date_entry = None
+        self.root.after_idle(lambda: self.show_date_entry(input_frame))
 
         ttk.Label(input_frame, text="Category:").grid(row=0, column=2, padx=5, pady=5)
-        self.category_entry = ttk.Combobox(input_frame, values=self.categories, state="readonly")
+        # Read-only so a typo can't create a category; new ones are added in
+        # the Categories window.
+        self.category_entry = ttk.Combobox(input_frame, values=categories, state="readonly",
+                                           postcommand=self.update_category_lists)
         self.category_entry.grid(row=0, column=3, padx=5, pady=5)
-        self.category_entry.set("Food")
+        self.category_entry.set(get_default_category("Expense"))
 
         ttk.Label(input_frame, text="Amount:").grid(row=0, column=4, padx=5, pady=5)
         self.amount_entry = ttk.Entry(input_frame)
@@ -85,15 +116,31 @@ class ExpenseTracker:
         self.type_combo.set("Expense")
         self.type_combo.bind("<<ComboboxSelected>>", self.on_type_change)
 
-        ttk.Button(input_frame, text="Add", command=self.add_transaction).grid(row=0, column=8, padx=5, pady=5)
+        ttk.Label(input_frame, text="Note:").grid(row=0, column=8, padx=5, pady=5)
+        self.note_entry = ttk.Entry(input_frame)
+        self.note_entry.grid(row=0, column=9, padx=5, pady=5)
+
+        # Enabled once the date entry exists, see show_date_entry().
+        self.add_button = ttk.Button(input_frame, text="Add", command=self.add_transaction, state="disabled")
+        self.add_button.grid(row=0, column=10, padx=5, pady=5)
 
-        self.tree = ttk.Treeview(self.root, columns=("ID", "Date", "Category", "Amount", "Type"), show="headings")
+        table_frame = ttk.Frame(self.root)
+        table_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.tree = ttk.Treeview(table_frame, columns=("ID", "Date", "Category", "Amount", "Type", "Note"),
+                                 show="headings")
         for col in self.tree["columns"]:
             self.tree.heading(col, text=col)
             self.tree.column(col, anchor="center")
-        self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical")
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.table = VirtualTable(self.tree, scrollbar)
 
-        ttk.Button(self.root, text="Remove Selected Transaction", command=self.remove_transaction).pack(pady=5)
+        remove_frame = ttk.Frame(self.root)
+        remove_frame.pack(pady=5)
+        ttk.Button(remove_frame, text="Remove Selected Transaction", command=self.remove_transaction).pack(side="left", padx=5)
+        ttk.Button(remove_frame, text="Undo Remove", command=self.undo_remove).pack(side="left", padx=5)
 
         bottom_frame = ttk.Frame(self.root)
         bottom_frame.pack(fill="x", padx=10, pady=10)
@@ -101,40 +148,74 @@ class ExpenseTracker:
         self.summary_label = ttk.Label(bottom_frame, text="Summary")
         self.summary_label.pack(side="left")
 
+        self.count_label = ttk.Label(bottom_frame, text="")
+        self.count_label.pack(side="left", padx=10)
+
+        # Shown only while background work is running, see set_busy().
+        self.busy_indicator = ttk.Progressbar(bottom_frame, mode="indeterminate", length=80)
+
         ttk.Button(bottom_frame, text="Toggle Theme", command=self.toggle_theme).pack(side="right", padx=5)
-        ttk.Button(bottom_frame, text="Export to CSV", command=self.export_to_csv).pack(side="right", padx=5)
+        ttk.Button(bottom_frame, text="Export", command=self.export_to_csv).pack(side="right", padx=5)
+        ttk.Button(bottom_frame, text="Import", command=self.import_transactions).pack(side="right", padx=5)
         ttk.Button(bottom_frame, text="Pie Chart", command=self.show_pie_chart).pack(side="right", padx=5)
         ttk.Button(bottom_frame, text="Monthly Chart", command=self.show_monthly_chart).pack(side="right", padx=5)
         ttk.Button(bottom_frame, text="Bar Chart", command=self.show_bar_chart).pack(side="right", padx=5)
         ttk.Button(bottom_frame, text="Progress Bars", command=self.show_progress_bars).pack(side="right", padx=5)
+        ttk.Button(bottom_frame, text="Categories", command=self.show_categories).pack(side="right", padx=5)
         ttk.Button(bottom_frame, text="Income Waterfall", command=self.show_waterfall_chart).pack(side="right", padx=5)
 
+        # Debug panel, kept out of the button rows.
+        menubar = tk.Menu(self.root)
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        tools_menu.add_command(label="Query Stats", accelerator="F12", command=self.show_query_stats)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
+        self.root.config(menu=menubar)
+        self.root.bind("<F12>", lambda event: self.show_query_stats())
+
+    def show_date_entry(self, input_frame):
+        self.date_entry = create_date_entry(input_frame)
+        self.date_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.add_button.config(state="normal")
+
+    def update_year_list(self):
+        years = get_years()
+        current = datetime.now().year
+        if not years or int(years[-1]) < current:
+            years.append(str(current))
+        self.year_combo.config(values=["All"] + years)
+
+    def update_category_lists(self):
+        categories = get_categories()
+        self.filter_category_combo.config(values=["All"] + categories)
+        self.category_entry.config(values=categories)
+        # The selected category may have been renamed or removed meanwhile.
+        if self.category_entry.get() not in categories:
+            self.category_entry.set(get_default_category(self.type_combo.get()))
+
     def add_transaction(self):
         try:
             raw_date = self.date_entry.get()
             parsed_date = datetime.strptime(raw_date, '%m/%d/%y')
             date = parsed_date.strftime('%Y-%m-%d')
 
-            category = self.category_entry.get()
+            category = self.category_entry.get().strip()
             amount = float(self.amount_entry.get())
             type_ = self.type_combo.get()
 
             if not category:
                 raise ValueError("Category is required")
 
-            add_transaction(date, category, amount, type_)
+            add_transaction(date, category, amount, type_, self.note_entry.get().strip())
 
-            self.category_entry.set("Food")
+            self.category_entry.set(get_default_category(type_))
             self.amount_entry.delete(0, tk.END)
+            self.note_entry.delete(0, tk.END)
 
             self.refresh_table()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
-    def refresh_table(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
+    def current_filters(self):
         month = self.month_combo.get()
         year = self.year_combo.get()
         category = self.filter_category_combo.get()
@@ -142,217 +223,302 @@ class ExpenseTracker:
         month = None if month == "All" else month
         year = None if year == "All" else year
         category = None if category == "All" else category
+        return month, year, category
 
-        transactions = get_all_transactions(month, year, category)
-
-        for row in transactions:
-            if len(row) == 5:
-                self.tree.insert("", tk.END, values=row)
+    def refresh_table(self):
+        month, year, category = self.current_filters()
+        search = self.search_entry.get().strip()
+        # A newer refresh supersedes one that is still running.
+        if search:
+            self.tasks.submit(self._load_search, search, month, year, category, on_done=self._show_table,
+                              key="refresh")
+        else:
+            self.tasks.submit(self._load_table, month, year, category, on_done=self._show_table, key="refresh")
+
+    def _load_table(self, month, year, category):
+        fetch_page = partial(get_transactions_page, month, year, category)
+        # Rows are paged in as the user scrolls; only the count touches every match.
+        first_page = fetch_page(limit=self.table.page_size)
+        return fetch_page, first_page, count_transactions(month, year, category), get_summary()
+
+    def _load_search(self, search, month, year, category):
+        # Search results come ranked, not in date order, so they are shown as
+        # one page with nothing to scroll in.
+        rows = search_transactions(search, month, year, category)
+
+        def fetch_page(after=None, before=None, limit=None):
+            return []
+
+        return fetch_page, rows, len(rows), get_summary()
+
+    def _show_table(self, result):
+        fetch_page, first_page, total, summary = result
+        self.table.load(fetch_page, first_page)
+        self.show_counts(total, summary)
+
+    def show_counts(self, total, summary):
+        self.total = total
+        if self.search_entry.get().strip():
+            more = " (best matches only)" if total >= SEARCH_LIMIT else ""
+            self.count_label.config(text=f"{total} matching transactions{more}")
+        else:
+            self.count_label.config(text=f"{total} transactions")
 
-        summary = get_summary()
         summary_text = " | ".join(f"{t}: ${a:.2f}" for t, a in summary)
         self.summary_label.config(text=f"Summary: {summary_text}")
 
     def apply_filter(self):
         self.refresh_table()
 
+    def set_busy(self, busy):
+        if busy:
+            self.busy_indicator.pack(side="left", padx=10)
+            self.busy_indicator.start(10)
+        else:
+            self.busy_indicator.stop()
+            self.busy_indicator.pack_forget()
+
     def remove_transaction(self):
         selected = self.tree.selection()
         if not selected:
             messagebox.showinfo("Remove", "No transaction selected.")
             return
-        for item in selected:
-            item_id = self.tree.item(item)['values'][0]
-            delete_transaction(item_id)
-        self.refresh_table()
+        ids = [self.tree.item(item)['values'][0] for item in selected]
 
-    def show_bar_chart(self):
-        transactions = get_all_transactions()
-        expense_data = [t for t in transactions if t[4] == "Expense"]
+        def done(batch_id):
+            # Only the deleted rows leave the table; the rest stays loaded.
+            self.table.remove(selected)
+            self.tasks.submit(get_summary, on_done=partial(self.show_counts, self.total - len(ids)), key="summary")
 
-        if not expense_data:
-            messagebox.showinfo("Bar Chart", "No expense data to display.")
-            return
+        # Large selections are deleted in chunks, off the Tk thread.
+        self.tasks.submit(delete_transactions, ids, on_done=done)
 
-        category_totals = {}
-        for _, _, category, amount, _ in expense_data:
-            category_totals[category] = category_totals.get(category, 0) + amount
+    def undo_remove(self):
+        def done(restored):
+            if not restored:
+                messagebox.showinfo("Undo", "Nothing to undo.")
+                return
+            self.refresh_table()
 
-        categories = list(category_totals.keys())
-        values = list(category_totals.values())
+        self.tasks.submit(undo_delete, on_done=done)
 
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.bar(categories, values, color=plt.cm.Pastel1.colors)
+    def show_chart(self, kind):
+        # An open chart whose data has not changed is just brought to the front.
+        if self.charts is not None and self.charts.is_current(kind):
+            self.charts.lift(kind)
+            return
 
-        ax.set_title("Expenses by Category")
-        ax.set_ylabel("Amount")
-        ax.set_xlabel("Category")
-        ax.grid(axis="y", linestyle="--", alpha=0.7)
-        plt.xticks(rotation=45)
+        def load():
+            # Importing charts here, on a worker thread, is what loads matplotlib.
+            import charts
+            return charts.load(kind)
 
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width() / 2, height + max(values) * 0.01,
-                    f"${height:.2f}", ha='center', va='bottom', fontsize=9)
+        def show(result):
+            if self.charts is None:
+                from chart_windows import ChartManager
+                self.charts = ChartManager(self.root, self.tasks)
+            self.charts.render(kind, *result)
 
-        win = tk.Toplevel(self.root)
-        win.title("Category-wise Expenses")
+        self.tasks.submit(load, on_done=show, key=kind)
 
-        canvas = FigureCanvasTkAgg(fig, master=win)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+    def show_bar_chart(self):
+        self.show_chart("bar")
 
     def show_progress_bars(self):
-        category_budgets = {
-            "Food": 300, "Transport": 150, "Bills": 200, "Entertainment": 100,
-            "Salary": 0, "Shopping": 250, "Health": 100, "Other": 100
-        }
-
-        transactions = get_all_transactions()
-        expenses = [t for t in transactions if t[4] == "Expense"]
+        def show(utilisation):
+            win = tk.Toplevel(self.root)
+            win.title("Budget Progress Bars")
 
-        spent = {}
-        for _, _, category, amount, _ in expenses:
-            spent[category] = spent.get(category, 0) + amount
+            for category, amount_spent, budget, percent in utilisation:
+                label = ttk.Label(win, text=f"{category}: ${amount_spent:.2f} / ${budget:.2f} ({percent}%)")
+                label.pack(anchor="w", padx=10)
 
-        win = tk.Toplevel(self.root)
-        win.title("Budget Progress Bars")
-
-        for category, budget in category_budgets.items():
-            amount_spent = spent.get(category, 0)
-            percent = min(int((amount_spent / budget) * 100), 100) if budget else 0
+                progress = ttk.Progressbar(win, length=300, value=percent)
+                progress.pack(padx=10, pady=5)
 
-            label = ttk.Label(win, text=f"{category}: ${amount_spent:.2f} / ${budget} ({percent}%)")
-            label.pack(anchor="w", padx=10)
+        self.tasks.submit(lambda: analytics.snapshot().budget_utilisation(),
+                          on_done=show, key="Budget Progress Bars")
 
-            progress = ttk.Progressbar(win, length=300, value=percent)
-            progress.pack(padx=10, pady=5)
-
-    def show_waterfall_chart(self):
-        summary = get_summary()
-        income = sum(amount for t, amount in summary if t == "Income")
-        expense = sum(amount for t, amount in summary if t == "Expense")
-        net = income - expense
-
-        steps = ["Income", "Expense", "Net"]
-        values = [income, -expense, net]
-        colors = ["green", "red", "blue"]
-
-        cum_values = [0]
-        for val in values[:-1]:
-            cum_values.append(cum_values[-1] + val)
-
-        fig, ax = plt.subplots(figsize=(8, 5))
-        ax.bar(steps, values, bottom=cum_values, color=colors)
-        ax.axhline(0, color="black", linewidth=0.8)
-        ax.set_title("Income Statement Waterfall")
-        ax.set_ylabel("Amount")
-        ax.grid(axis="y", linestyle="--", alpha=0.6)
-
-        for i, val in enumerate(values):
-            ax.text(i, cum_values[i] + val / 2, f"${val:.2f}", ha="center", va="center", color="white", fontsize=10)
+    def show_categories(self):
+        win = tk.Toplevel(self.root)
+        win.title("Categories and Budgets")
+
+        tree = ttk.Treeview(win, columns=("Category", "Budget"), show="headings", height=12)
+        for col in tree["columns"]:
+            tree.heading(col, text=col)
+            tree.column(col, anchor="center")
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+        form = ttk.Frame(win)
+        form.pack(fill="x", padx=10, pady=5)
+        ttk.Label(form, text="Name:").grid(row=0, column=0, padx=5, pady=5)
+        name_entry = ttk.Entry(form)
+        name_entry.grid(row=0, column=1, padx=5, pady=5)
+        ttk.Label(form, text="Budget:").grid(row=0, column=2, padx=5, pady=5)
+        budget_entry = ttk.Entry(form, width=10)
+        budget_entry.grid(row=0, column=3, padx=5, pady=5)
+
+        def reload():
+            tree.delete(*tree.get_children())
+            budgets = dict(get_budgets())
+            for name in get_categories():
+                budget = budgets.get(name)
+                tree.insert("", "end", values=(name, "" if budget is None else f"{budget:.2f}"))
+
+        def selected_name():
+            selected = tree.selection()
+            if not selected:
+                raise ValueError("Select a category first")
+            return str(tree.item(selected[0], "values")[0])
+
+        def on_select(event):
+            selected = tree.selection()
+            if not selected:
+                return
+            name, budget = tree.item(selected[0], "values")
+            name_entry.delete(0, tk.END)
+            name_entry.insert(0, str(name))
+            budget_entry.delete(0, tk.END)
+            budget_entry.insert(0, str(budget))
+
+        def run(action):
+            try:
+                action()
+            except ValueError as e:
+                messagebox.showerror("Categories", str(e), parent=win)
+                return
+            reload()
+            # Renamed categories show up under their new name in the table.
+            self.refresh_table()
 
+        tree.bind("<<TreeviewSelect>>", on_select)
+        buttons = ttk.Frame(win)
+        buttons.pack(pady=5)
+        ttk.Button(buttons, text="Add", command=lambda: run(lambda: add_category(name_entry.get()))).pack(
+            side="left", padx=5)
+        ttk.Button(buttons, text="Rename", command=lambda: run(
+            lambda: rename_category(selected_name(), name_entry.get()))).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Remove", command=lambda: run(lambda: delete_category(selected_name()))).pack(
+            side="left", padx=5)
+        ttk.Button(buttons, text="Set Budget", command=lambda: run(
+            lambda: set_budget(selected_name(), budget_entry.get().strip() or None))).pack(side="left", padx=5)
+        reload()
+
+    def show_query_stats(self):
+        # Statements recorded by metrics, most total time first, refreshed
+        # every second while the window is open.
         win = tk.Toplevel(self.root)
-        win.title("Income Waterfall Chart")
+        win.title("Query Stats")
+
+        top = ttk.Frame(win)
+        top.pack(fill="x", padx=10, pady=5)
+        recording = tk.BooleanVar(value=metrics.ENABLED)
+        ttk.Checkbutton(top, text="Record statements", variable=recording,
+                        command=lambda: metrics.enable(recording.get())).pack(side="left")
+        cache_label = ttk.Label(top)
+        cache_label.pack(side="left", padx=10)
+
+        columns = ("Calls", "Rows", "Total ms", "Mean ms", "p95 ms", "Max ms", "CPU ms", "Slow", "SQL")
+        tree = ttk.Treeview(win, columns=columns, show="headings", height=15)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, anchor="e", width=70, stretch=False)
+        tree.column("SQL", anchor="w", width=600, stretch=True)
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+        details = tk.Text(win, height=10, wrap="word")
+        details.pack(fill="x", padx=10, pady=5)
+        stats = {}
+
+        def reload():
+            stats.clear()
+            for index, s in enumerate(metrics.registry.snapshot()):
+                stats[s["sql"]] = s
+                values = (s["calls"], metrics.row_count(s), f"{s['total_ms']:.1f}", f"{s['mean_ms']:.2f}",
+                          f"{s['p95_ms']:.2f}", f"{s['max_ms']:.1f}", f"{s['cpu_ms']:.1f}", s["slow"], s["sql"])
+                # Items are keyed by their SQL so the selection survives a refresh.
+                if tree.exists(s["sql"]):
+                    tree.item(s["sql"], values=values)
+                    tree.move(s["sql"], "", index)
+                else:
+                    tree.insert("", index, iid=s["sql"], values=values)
+            gone = [iid for iid in tree.get_children() if iid not in stats]
+            if gone:
+                tree.delete(*gone)
+            c = cache.stats()
+            cache_label.config(text=f"Query cache: {c['hits']} hits, {c['misses']} misses ({c['hit_rate']:.0%}), "
+                                    f"{c['entries']} entries")
+
+        def on_select(event=None):
+            selected = tree.selection()
+            s = stats.get(selected[0]) if selected else None
+            details.delete("1.0", tk.END)
+            if s is not None:
+                shapes = ", ".join(f"{shape} x{count}" for shape, count in s["shapes"].items())
+                unfetched = (f"\n\n{s['unfetched']} calls were never fetched; their rows are not counted."
+                             if s["unfetched"] else "")
+                details.insert(tk.END, f"{s['sql']}\n\nParameters: {shapes}{unfetched}\n\n"
+                                       f"{s['plan'] or 'No slow runs.'}")
+
+        def reset():
+            metrics.registry.reset()
+            reload()
+
+        def tick():
+            if win.winfo_exists():
+                reload()
+                win.after(1000, tick)
+
+        tree.bind("<<TreeviewSelect>>", on_select)
+        ttk.Button(top, text="Reset", command=reset).pack(side="right")
+        tick()
 
-        canvas = FigureCanvasTkAgg(fig, master=win)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+    def show_waterfall_chart(self):
+        self.show_chart("waterfall")
 
     def show_pie_chart(self):
-        transactions = get_all_transactions()
-        expense_data = [t for t in transactions if t[4] == "Expense"]
-
-        if not expense_data:
-            messagebox.showinfo("Pie Chart", "No expense data to display.")
-            return
-
-        category_totals = {}
-        for _, _, category, amount, _ in expense_data:
-            category_totals[category] = category_totals.get(category, 0) + amount
-
-        labels = list(category_totals.keys())
-        sizes = list(category_totals.values())
-        colors = plt.cm.Set3.colors
-
-        def make_autopct(sizes):
-            def autopct(pct):
-                total = sum(sizes)
-                val = int(round(pct * total / 100.0))
-                return f"{pct:.1f}%\n(${val})"
-
-            return autopct
-
-        fig, ax = plt.subplots()
-        wedges, texts, autotexts = ax.pie(
-            sizes, labels=labels, autopct=make_autopct(sizes), startangle=140, colors=colors
-        )
-        ax.axis("equal")
-        ax.set_title("Expenses by Category")
-
-        win = tk.Toplevel(self.root)
-        win.title("Expense Pie Chart")
-
-        canvas = FigureCanvasTkAgg(fig, master=win)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+        self.show_chart("pie")
 
     def show_monthly_chart(self):
-        monthly_data = get_monthly_summary()
-        if not monthly_data:
-            messagebox.showinfo("Monthly Chart", "No data available.")
-            return
-
-        months = [m for m, _, _ in monthly_data]
-        income = [i for _, i, _ in monthly_data]
-        expense = [e for _, _, e in monthly_data]
-
-        fig, ax = plt.subplots(figsize=(12, 6))
+        self.show_chart("monthly")
 
-        x = range(len(months))
-        width = 0.35
-
-        income_bars = ax.bar([p - width / 2 for p in x], income, width=width, label="Income", color="green")
-        expense_bars = ax.bar([p + width / 2 for p in x], expense, width=width, label="Expense", color="red")
-
-        ax.set_xticks(x)
-        ax.set_xticklabels(months, rotation=45, ha="right")
-        ax.set_title("Monthly Income and Expenses")
-        ax.set_xlabel("Month")
-        ax.set_ylabel("Amount")
-        ax.legend()
-        ax.grid(axis="y", linestyle="--", alpha=0.7)
+    def export_to_csv(self):
+        if not self.total:
+            messagebox.showinfo("Export", "No transactions to export.")
+            return
 
-        for bar in income_bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width() / 2, height + max(income) * 0.01,
-                    f"${height:.2f}", ha='center', va='bottom', fontsize=8)
+        file = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[
+            ["CSV files", "*.csv"], ["JSON lines", "*.jsonl"], ["Parquet", "*.parquet"], ["Arrow IPC", "*.arrow"]])
+        if not file:
+            return
 
-        for bar in expense_bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width() / 2, height + max(expense) * 0.01,
-                    f"${height:.2f}", ha='center', va='bottom', fontsize=8)
+        def progress(done, total):
+            self.tasks.post(lambda: self.count_label.config(text=f"Exporting {done}/{total} transactions"))
 
-        win = tk.Toplevel(self.root)
-        win.title("Monthly Summary")
+        def done(count):
+            self.count_label.config(text=f"{self.total} transactions")
+            messagebox.showinfo("Export", f"{count} transactions exported to {file}")
 
-        canvas = FigureCanvasTkAgg(fig, master=win)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+        # Exports what the filter frame currently shows.
+        month, year, category = self.current_filters()
+        self.tasks.submit(export_transactions, file, None, month, year, category, progress, on_done=done)
 
-    def export_to_csv(self):
-        transactions = get_all_transactions()
-        if not transactions:
-            messagebox.showinfo("Export", "No transactions to export.")
+    def import_transactions(self):
+        file = filedialog.askopenfilename(filetypes=[["CSV files", "*.csv"], ["JSON lines", "*.jsonl"]])
+        if not file:
             return
 
-        file = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[["CSV files", "*.csv"]])
-        if file:
-            with open(file, mode="w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(["ID", "Date", "Category", "Amount", "Type"])
-                writer.writerows(transactions)
-            messagebox.showinfo("Export", f"Transactions exported to {file}")
+        def done(report):
+            self.refresh_table()
+            message = f"Imported {report.imported} transactions."
+            if report.rejected:
+                details = "\n".join(f"Line {line}: {error}" for line, error in report.errors[:10])
+                message += f"\nSkipped {report.rejected} invalid rows:\n{details}"
+            messagebox.showinfo("Import", message)
+
+        # Large files take a while to parse and insert; the window stays
+        # responsive meanwhile and the busy indicator shows the import running.
+        self.tasks.submit(importer.import_file, file, on_done=done)
 
     def toggle_theme(self):
         current = self.style.theme_use()
@@ -360,13 +526,11 @@ class ExpenseTracker:
         self.style.theme_use(new_theme)
 
     def on_type_change(self, event):
-        if self.type_combo.get() == "Income":
-            self.category_entry.set("Salary")
-        else:
-            self.category_entry.set("Food")
+        self.category_entry.set(get_default_category(self.type_combo.get()))
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = ExpenseTracker(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.tasks.shutdown()
\ No newline at end of file
@@ -0,0 +1,300 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from itertools import chain
+
+# Per-statement timings for every query run through connection.py. Every
+# connection is an InstrumentedConnection; while recording is off its
+# execute() is one flag check away from sqlite3's. When on, each statement
+# adds its wall and CPU time, row count and parameter shape to the registry.
+# Every statement slower than SLOW_QUERY_MS is logged to the "expenses.sql"
+# logger, the first slow run of each with its EXPLAIN QUERY PLAN.
+#
+# Set EXPENSES_METRICS=1 to record from startup, e.g. to include the
+# migrations.
+
+logger = logging.getLogger("expenses.sql")
+
+ENABLED = os.environ.get("EXPENSES_METRICS", "") not in ("", "0")
+SLOW_QUERY_MS = 100
+
+# Upper bounds of the histogram buckets, in ms.
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+# Rows read per fetchmany() when a cursor is iterated, so the timing costs
+# one clock read per batch instead of per row.
+ITER_BATCH = 256
+
+_placeholder_lists = re.compile(r"\?(\s*,\s*\?)+")
+
+# Transaction control statements have no query plan.
+_no_plan = re.compile(r"\s*(BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+
+def normalize(sql):
+    # Statements that only differ in whitespace or in the length of an
+    # IN (?, ?, ...) list are counted together.
+    return _placeholder_lists.sub("?, ...", " ".join(sql.split()))
+
+
+def param_shape(params):
+    # "(int, str*3)" for positional parameters, "{a, b}" for named ones.
+    if isinstance(params, dict):
+        return "{" + ", ".join(sorted(params)) + "}"
+    runs = []
+    for value in params:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "(" + ", ".join(name if count == 1 else f"{name}*{count}" for name, count in runs) + ")"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        # Upper bound of the bucket holding the q-th value, at most the maximum.
+        if not self.count:
+            return 0.0
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= q * self.count:
+                return min(bound, self.max)
+        return self.max
+
+
+class StatementStats:
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.rows = 0
+        # Calls whose rows were never fetched, so their row count is unknown.
+        self.unfetched = 0
+        self.cpu_ms = 0.0
+        self.slow = 0
+        self.wall = Histogram()
+        self.shapes = {}
+        self.plan = None
+
+    def as_dict(self):
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "rows": self.rows,
+            "unfetched": self.unfetched,
+            "total_ms": self.wall.total,
+            "mean_ms": self.wall.total / self.calls if self.calls else 0.0,
+            "p50_ms": self.wall.percentile(0.5),
+            "p95_ms": self.wall.percentile(0.95),
+            "max_ms": self.wall.max,
+            "cpu_ms": self.cpu_ms,
+            "slow": self.slow,
+            "shapes": dict(self.shapes),
+            "histogram": dict(zip(map(str, BUCKETS_MS), self.wall.counts)),
+            "plan": self.plan,
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.statements = {}
+        self._lock = threading.Lock()
+
+    def record(self, conn, sql, shape, rows, wall_ms, cpu_ms, params=None):
+        # rows is None for a SELECT whose cursor was closed before any fetch.
+        # params is None when they are not known, e.g. an empty executemany().
+        key = normalize(sql)
+        slow = wall_ms >= SLOW_QUERY_MS
+        explain = False
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats(key)
+            stats.calls += 1
+            if rows is None:
+                stats.unfetched += 1
+            else:
+                stats.rows += max(rows, 0)
+            stats.cpu_ms += cpu_ms
+            stats.wall.add(wall_ms)
+            stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+            if slow:
+                stats.slow += 1
+                explain = stats.plan is None and params is not None and not _no_plan.match(sql)
+                if explain:
+                    stats.plan = ""
+        if slow:
+            plan = ""
+            if explain:
+                stats.plan = query_plan(conn, sql, params)
+                plan = "\n" + stats.plan
+            logger.warning("slow query (%.1f ms, %s rows): %s%s", wall_ms, "?" if rows is None or rows < 0 else rows,
+                           key, plan)
+
+    def snapshot(self):
+        # One dict per statement, most total time first.
+        with self._lock:
+            stats = [s.as_dict() for s in self.statements.values()]
+        return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+
+
+registry = Registry()
+
+
+def query_plan(conn, sql, params):
+    # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail); children are
+    # indented under their parent.
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return f"(no plan: {e})"
+    depth = {0: -1}
+    lines = []
+    for id_, parent, _, detail in rows:
+        depth[id_] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[id_] + detail)
+    return "\n".join(lines)
+
+
+def row_count(stats):
+    # "12" or, when some calls were never fetched, "12+" as a lower bound.
+    return f"{stats['rows']}+" if stats["unfetched"] else str(stats["rows"])
+
+
+def report(stats=None):
+    stats = registry.snapshot() if stats is None else stats
+    lines = [f"{'calls':>7}{'rows':>10}{'total ms':>11}{'mean':>9}{'p95':>9}{'max':>9}{'cpu ms':>10}{'slow':>6}  sql"]
+    for s in stats:
+        sql = s["sql"] if len(s["sql"]) <= 100 else s["sql"][:97] + "..."
+        lines.append(f"{s['calls']:>7}{row_count(s):>10}{s['total_ms']:>11.1f}{s['mean_ms']:>9.2f}{s['p95_ms']:>9.2f}"
+                     f"{s['max_ms']:>9.1f}{s['cpu_ms']:>10.1f}{s['slow']:>6}  {sql}")
+    return "\n".join(lines)
+
+
+class TimedCursor:
+    # Wraps the cursor of a SELECT so the time spent fetching its rows is
+    # added to the execute time. The statement is recorded once the rows run
+    # out, or when the cursor is closed or dropped; if nothing was fetched by
+    # then (e.g. PRAGMA journal_mode=WAL) it is counted as unfetched.
+
+    def __init__(self, conn, cursor, sql, params, wall, cpu):
+        self._conn = conn
+        self._cursor = cursor
+        self._sql = sql
+        self._params = params
+        self._wall = wall
+        self._cpu = cpu
+        self._rows = 0
+        self._fetched = False
+        self._done = False
+
+    def _fetch(self, fetch, *args):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        result = fetch(*args)
+        self._fetched = True
+        self._wall += time.perf_counter() - wall
+        self._cpu += time.thread_time() - cpu
+        return result
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            registry.record(self._conn, self._sql, param_shape(self._params), self._rows if self._fetched else None,
+                            self._wall * 1000, self._cpu * 1000, self._params)
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = size or self._cursor.arraysize
+        rows = self._fetch(self._cursor.fetchmany, size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(ITER_BATCH)
+            yield from rows
+            if len(rows) < ITER_BATCH:
+                return
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def execute(self, sql, parameters=()):
+        if not ENABLED:
+            return super().execute(sql, parameters)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        cursor = super().execute(sql, parameters)
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        if cursor.description is None:
+            registry.record(self, sql, param_shape(parameters), cursor.rowcount, wall * 1000, cpu * 1000,
+                            parameters)
+            return cursor
+        return TimedCursor(self, cursor, sql, parameters, wall, cpu)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not ENABLED:
+            return super().executemany(sql, seq_of_parameters)
+        # The parameters may be a generator that is gone afterwards, so the
+        # first set is kept aside for EXPLAIN QUERY PLAN.
+        rows = iter(seq_of_parameters)
+        first = next(rows, None)
+        if first is not None:
+            rows = chain([first], rows)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        cursor = super().executemany(sql, rows)
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        registry.record(self, sql, f"many*{max(cursor.rowcount, 0)}", cursor.rowcount, wall * 1000, cpu * 1000,
+                        first)
+        return cursor
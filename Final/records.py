@@ -0,0 +1,164 @@
+from array import array
+from datetime import date
+from itertools import islice
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENT = Decimal("0.01")
+# Cents are stored in SQLite INTEGER and array("q") columns.
+MAX_CENTS = 2 ** 63 - 1
+
+
+def to_cents(amount):
+    # Goes through the decimal text rather than amount * 100, which turns
+    # 0.29 into 28.999999999999996.
+    try:
+        value = Decimal(str(amount).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount {amount!r}") from None
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount {amount!r}")
+    try:
+        cents = int(value.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+    except InvalidOperation:
+        raise ValueError(f"Amount out of range {amount!r}") from None
+    if not -MAX_CENTS <= cents <= MAX_CENTS:
+        raise ValueError(f"Amount out of range {amount!r}")
+    return cents
+
+
+def from_cents(cents):
+    return cents / 100
+
+
+class Transaction:
+    # One row of a ColumnStore. Unpacks and indexes like the
+    # (id, date, category, amount, type, note) tuples the database functions
+    # return.
+    __slots__ = ("id", "date", "category", "amount_cents", "type", "note")
+
+    def __init__(self, id, date, category, amount_cents, type_, note=""):
+        self.id = id
+        self.date = date
+        self.category = category
+        self.amount_cents = amount_cents
+        self.type = type_
+        self.note = note
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
+    def astuple(self):
+        return self.id, self.date, self.category, self.amount, self.type, self.note
+
+    def __iter__(self):
+        return iter(self.astuple())
+
+    def __getitem__(self, index):
+        return self.astuple()[index]
+
+    def __len__(self):
+        return 6
+
+    def __eq__(self, other):
+        if isinstance(other, Transaction):
+            other = other.astuple()
+        return self.astuple() == other
+
+    def __repr__(self):
+        return f"Transaction{self.astuple()!r}"
+
+
+class ColumnStore:
+    # Transactions held column by column in typed arrays: about 25 bytes a row
+    # instead of a tuple of five Python objects. Dates are day ordinals and
+    # categories and types are the integer ids of the categories and types
+    # tables, with the names looked up once per query in category_names and
+    # type_names.
+
+    def __init__(self, category_names=None, type_names=None):
+        self.ids = array("q")
+        self.days = array("l")
+        self.amounts = array("q")
+        self.categories = array("L")
+        self.types = array("B")
+        self.category_names = category_names or {}
+        self.type_names = type_names or {}
+        # Dates that are not plain YYYY-MM-DD and non-empty notes are kept as
+        # text, keyed by row index.
+        self.odd_dates = {}
+        self.notes = {}
+
+    # Rows are transposed this many at a time, so only one chunk of row
+    # tuples is alive on top of the arrays.
+    CHUNK_SIZE = 10000
+
+    def extend(self, rows):
+        # rows are (id, day ordinal, category id, cents, type id, odd date,
+        # note), where day is 0 and odd date is the text for dates that do
+        # not parse, and note is None when empty. A cursor is read as it goes.
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.CHUNK_SIZE))
+            if not chunk:
+                return
+            self._extend_columns(*zip(*chunk))
+
+    def _extend_columns(self, ids, days, categories, amounts, types, odd, notes):
+        start = len(self.ids)
+        for texts, target in ((odd, self.odd_dates), (notes, self.notes)):
+            if any(texts):
+                target.update((start + i, text) for i, text in enumerate(texts) if text is not None)
+        self.ids.extend(ids)
+        self.days.extend(days)
+        self.amounts.extend(amounts)
+        self.categories.extend(categories)
+        self.types.extend(types)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def copy(self):
+        # Arrays copy as one block each; the name maps are shared, they are
+        # never changed after a query.
+        other = ColumnStore(self.category_names, self.type_names)
+        for name in ("ids", "days", "amounts", "categories", "types"):
+            setattr(other, name, getattr(self, name)[:])
+        other.odd_dates = dict(self.odd_dates)
+        other.notes = dict(self.notes)
+        return other
+
+    def _date(self, index):
+        day = self.days[index]
+        if day == 0:
+            return self.odd_dates[index]
+        return date.fromordinal(day).isoformat()
+
+    def record(self, index):
+        return Transaction(self.ids[index], self._date(index),
+                           self.category_names[self.categories[index]],
+                           self.amounts[index], self.type_names[self.types[index]],
+                           self.notes.get(index, ""))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ColumnStore index out of range")
+        return self.record(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def __eq__(self, other):
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self)
+                + sum(column.__sizeof__() for column in (self.ids, self.days, self.amounts,
+                                                         self.categories, self.types))
+                + self.category_names.__sizeof__() + self.type_names.__sizeof__()
+                + self.odd_dates.__sizeof__() + self.notes.__sizeof__())
@@ -0,0 +1,332 @@
+from connection import get_connection, transaction
+from records import to_cents
+
+
+def _create_transactions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            type TEXT NOT NULL
+        )
+    """)
+
+
+def _add_date_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions (category, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_type_date ON transactions (type, date)")
+
+
+# Running totals for get_summary()/get_monthly_summary() and the category
+# charts, as (table, key columns, key expressions over a transactions row).
+# Rows whose date does not parse are left out of the monthly tables, the same
+# way the old GROUP BY queries skipped them.
+AGGREGATE_TABLES = [
+    ("summary_by_type", ["type_id"], ["{row}.type_id"]),
+    ("summary_by_month", ["month", "type_id"], ["strftime('%Y-%m', {row}.date)", "{row}.type_id"]),
+    ("summary_by_category_month", ["category_id", "month", "type_id"],
+     ["{row}.category_id", "strftime('%Y-%m', {row}.date)", "{row}.type_id"]),
+]
+
+# The same tables keyed by the category and type names, as versions 3 to 5
+# created them. Only the migrations use this.
+_TEXT_AGGREGATE_TABLES = [
+    ("summary_by_type", ["type"], ["{row}.type"]),
+    ("summary_by_month", ["month", "type"], ["strftime('%Y-%m', {row}.date)", "{row}.type"]),
+    ("summary_by_category_month", ["category", "month", "type"],
+     ["{row}.category", "strftime('%Y-%m', {row}.date)", "{row}.type"]),
+]
+
+
+def _column_type(column):
+    return "INTEGER" if column.endswith("_id") else "TEXT"
+
+
+# amount/total name the transactions and aggregate columns, which changed
+# from amount/total (REAL) to amount_cents/total_cents in version 5.
+def _aggregate_add(tables, row, amount="amount", total="total"):
+    statements = []
+    for table, columns, exprs in tables:
+        values = [e.format(row=row) for e in exprs]
+        not_null = " AND ".join(f"{v} IS NOT NULL" for v in values)
+        statements.append(f"""
+            INSERT INTO {table} ({", ".join(columns)}, {total}, count)
+            SELECT {", ".join(values)}, {row}.{amount}, 1 WHERE {not_null}
+            ON CONFLICT ({", ".join(columns)}) DO UPDATE SET {total} = {total} + excluded.{total}, count = count + 1""")
+    return statements
+
+
+def _aggregate_remove(tables, row, amount="amount", total="total"):
+    statements = []
+    for table, columns, exprs in tables:
+        match = " AND ".join(f"{c} = {e.format(row=row)}" for c, e in zip(columns, exprs))
+        statements.append(f"UPDATE {table} SET {total} = {total} - {row}.{amount}, count = count - 1 WHERE {match}")
+        statements.append(f"DELETE FROM {table} WHERE {match} AND count <= 0")
+    return statements
+
+
+def _create_aggregate_triggers(conn, tables, amount="amount", total="total"):
+    # The update trigger watches every column the tables are keyed or summed on.
+    watched = ["date", amount] + sorted({c for _, columns, _ in tables for c in columns} - {"month"})
+    triggers = [
+        ("transactions_aggregate_insert", "AFTER INSERT", _aggregate_add(tables, "NEW", amount, total)),
+        ("transactions_aggregate_delete", "AFTER DELETE", _aggregate_remove(tables, "OLD", amount, total)),
+        ("transactions_aggregate_update", f"AFTER UPDATE OF {', '.join(watched)}",
+         _aggregate_remove(tables, "OLD", amount, total) + _aggregate_add(tables, "NEW", amount, total)),
+    ]
+    for name, event, statements in triggers:
+        body = ";\n".join(statements)
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} ON transactions BEGIN {body}; END")
+
+
+def _drop_aggregate_triggers(conn):
+    for name in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS transactions_aggregate_{name}")
+
+
+def _rebuild_aggregate_tables(conn, tables, amount, total):
+    # Drops and recreates the summary tables in the given layout, filled from
+    # the current transactions.
+    for table, columns, exprs in tables:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"""
+            CREATE TABLE {table} (
+                {" ".join(f"{c} {_column_type(c)} NOT NULL," for c in columns)}
+                {total} INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY ({", ".join(columns)})
+            ) WITHOUT ROWID
+        """)
+        values = [e.format(row="transactions") for e in exprs]
+        conn.execute(f"""
+            INSERT INTO {table} ({", ".join(columns)}, {total}, count)
+            SELECT {", ".join(values)}, SUM({amount}), COUNT(*) FROM transactions
+            WHERE {" AND ".join(f"{v} IS NOT NULL" for v in values)}
+            GROUP BY {", ".join(values)}
+        """)
+    _create_aggregate_triggers(conn, tables, amount, total)
+
+
+def _add_aggregate_tables(conn):
+    for table, columns, exprs in _TEXT_AGGREGATE_TABLES:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {" ".join(f"{c} TEXT NOT NULL," for c in columns)}
+                total REAL NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY ({", ".join(columns)})
+            ) WITHOUT ROWID
+        """)
+        values = [e.format(row="transactions") for e in exprs]
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO {table} ({", ".join(columns)}, total, count)
+            SELECT {", ".join(values)}, SUM(amount), COUNT(*) FROM transactions
+            WHERE {" AND ".join(f"{v} IS NOT NULL" for v in values)}
+            GROUP BY {", ".join(values)}
+        """)
+
+    _create_aggregate_triggers(conn, _TEXT_AGGREGATE_TABLES)
+
+
+def _add_delete_journal(conn):
+    # Rows removed by delete_transactions() are kept here, grouped by batch,
+    # so the most recent deletes can be undone.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS deleted_transactions (
+            batch_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            type TEXT NOT NULL,
+            PRIMARY KEY (batch_id, id)
+        ) WITHOUT ROWID
+    """)
+
+
+def _replace_table(conn, table, definition, select):
+    # SQLite cannot change column types or add foreign keys in place: the
+    # table is copied into a new one built from definition and renamed.
+    # The AUTOINCREMENT counter is carried over so ids of journalled rows
+    # are never handed out again.
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    conn.execute(f"CREATE TABLE {table}_new {definition}")
+    conn.execute(f"INSERT INTO {table}_new {select}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    if row is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (row[0], table))
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+                     "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)", (table, row[0], table))
+
+
+def _store_amounts_in_cents(conn):
+    # Amounts become whole cents so sums are exact. They are converted with
+    # to_cents, as new rows are, so 0.285 is 29 cents either way.
+    conn.create_function("to_cents", 1, to_cents, deterministic=True)
+    _drop_aggregate_triggers(conn)
+    _replace_table(conn, "transactions", """(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            type TEXT NOT NULL
+        )""", "SELECT id, date, category, to_cents(amount), type FROM transactions")
+    _add_date_indexes(conn)
+    _replace_table(conn, "deleted_transactions", """(
+            batch_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            PRIMARY KEY (batch_id, id)
+        ) WITHOUT ROWID""", """
+        SELECT batch_id, id, date, category, to_cents(amount), type FROM deleted_transactions
+    """)
+    _rebuild_aggregate_tables(conn, _TEXT_AGGREGATE_TABLES, "amount_cents", "total_cents")
+
+
+# What the GUI had hardcoded before categories and budgets moved into the
+# database. New databases start with these; budgets are in whole units.
+DEFAULT_CATEGORIES = ["Food", "Transport", "Bills", "Entertainment", "Salary", "Shopping", "Health", "Other"]
+DEFAULT_BUDGETS = {
+    "Food": 300, "Transport": 150, "Bills": 200, "Entertainment": 100,
+    "Salary": 0, "Shopping": 250, "Health": 100, "Other": 100,
+}
+TYPES = ("Income", "Expense")
+
+
+def _normalize_categories(conn):
+    # Category and type names move into lookup tables and transactions keep
+    # integer ids, so filters and GROUP BYs compare integers.
+    conn.execute("CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.execute("CREATE TABLE types (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.execute("""
+        CREATE TABLE budgets (
+            category_id INTEGER PRIMARY KEY REFERENCES categories (id) ON DELETE CASCADE,
+            amount_cents INTEGER NOT NULL
+        )
+    """)
+    conn.executemany("INSERT INTO types (name) VALUES (?)", [(t,) for t in TYPES])
+    conn.executemany("INSERT INTO categories (name) VALUES (?)", [(c,) for c in DEFAULT_CATEGORIES])
+    for table in ("transactions", "deleted_transactions"):
+        conn.execute(f"INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM {table} ORDER BY category")
+        conn.execute(f"INSERT OR IGNORE INTO types (name) SELECT DISTINCT type FROM {table} ORDER BY type")
+    conn.executemany("INSERT INTO budgets (category_id, amount_cents) SELECT id, ? FROM categories WHERE name = ?",
+                     [(amount * 100, name) for name, amount in DEFAULT_BUDGETS.items()])
+
+    _drop_aggregate_triggers(conn)
+    _replace_table(conn, "transactions", """(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            amount_cents INTEGER NOT NULL,
+            type_id INTEGER NOT NULL REFERENCES types (id)
+        )""", """
+        SELECT t.id, t.date, c.id, t.amount_cents, ty.id FROM transactions t
+        JOIN categories c ON c.name = t.category
+        JOIN types ty ON ty.name = t.type
+    """)
+    conn.execute("CREATE INDEX idx_transactions_date ON transactions (date)")
+    conn.execute("CREATE INDEX idx_transactions_category_date ON transactions (category_id, date)")
+    conn.execute("CREATE INDEX idx_transactions_type_date ON transactions (type_id, date)")
+    _replace_table(conn, "deleted_transactions", """(
+            batch_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            category_id INTEGER NOT NULL REFERENCES categories (id),
+            amount_cents INTEGER NOT NULL,
+            type_id INTEGER NOT NULL REFERENCES types (id),
+            PRIMARY KEY (batch_id, id)
+        ) WITHOUT ROWID""", """
+        SELECT d.batch_id, d.id, d.date, c.id, d.amount_cents, ty.id FROM deleted_transactions d
+        JOIN categories c ON c.name = d.category
+        JOIN types ty ON ty.name = d.type
+    """)
+    _rebuild_aggregate_tables(conn, AGGREGATE_TABLES, "amount_cents", "total_cents")
+
+
+def _add_notes_and_search(conn):
+    # A free-text note (payee, description) on every transaction, indexed by
+    # an external-content FTS5 table: the text lives only in transactions and
+    # the triggers keep the index in step. Rows with an empty note are indexed
+    # too, so the index matches what FTS5's 'rebuild' and 'integrity-check'
+    # expect.
+    conn.execute("ALTER TABLE transactions ADD COLUMN note TEXT NOT NULL DEFAULT ''")
+    conn.execute("ALTER TABLE deleted_transactions ADD COLUMN note TEXT NOT NULL DEFAULT ''")
+    # prefix='2 3' keeps extra index entries for short prefixes so "gro*"
+    # does not have to walk every term that starts with it.
+    conn.execute("""
+        CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            note, content='transactions', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, note) VALUES (NEW.id, NEW.note);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, note) VALUES ('delete', OLD.id, OLD.note);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER transactions_fts_update AFTER UPDATE OF note ON transactions BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, note) VALUES ('delete', OLD.id, OLD.note);
+            INSERT INTO transactions_fts (rowid, note) VALUES (NEW.id, NEW.note);
+        END
+    """)
+    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+# Each entry upgrades the schema by one version. PRAGMA user_version records
+# how many have been applied, so only append to this list, never reorder it.
+MIGRATIONS = [
+    _create_transactions,
+    _add_date_indexes,
+    _add_aggregate_tables,
+    _add_delete_journal,
+    _store_amounts_in_cents,
+    _normalize_categories,
+    _add_notes_and_search,
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(target=LATEST_VERSION):
+    with get_connection() as conn:
+        version = get_version(conn)
+    if version >= target:
+        return version
+
+    with transaction() as conn:
+        # transaction() holds the write lock from the start, so a concurrent
+        # process cannot run the same migration; re-check under it.
+        version = get_version(conn)
+        if version >= target:
+            return version
+        for number in range(version, target):
+            MIGRATIONS[number](conn)
+        # PRAGMA does not accept bound parameters.
+        conn.execute(f"PRAGMA user_version = {int(target)}")
+    with transaction() as conn:
+        conn.execute("ANALYZE")
+        # Statistics taken while the FTS5 shadow tables are nearly empty make
+        # the planner pick slow plans for FTS5's own statements as they grow,
+        # and FTS5 does not need them.
+        conn.execute("DELETE FROM sqlite_stat1 WHERE tbl LIKE 'transactions_fts%'")
+        # Reloads the statistics this connection plans with.
+        conn.execute("ANALYZE sqlite_schema")
+    return target
@@ -0,0 +1,89 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+
+class TaskRunner:
+    # Runs database queries and figure preparation on worker threads and
+    # hands the results back to Tk on the main loop. Tk widgets must only be
+    # touched from the callbacks, never from the submitted functions.
+
+    def __init__(self, root, workers=2, poll_ms=25, on_busy=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="expense-task")
+        self.results = queue.Queue()
+        self.calls = queue.Queue()
+        self.latest = {}
+        self.pending = 0
+        self._polling = False
+
+    def submit(self, func, *args, on_done=None, on_error=None, key=None):
+        # A task submitted with the same key as an earlier one supersedes it:
+        # the earlier task is cancelled if it has not started, and its result
+        # is dropped if it has.
+        if key is not None and key in self.latest:
+            self.latest[key][1].cancel()
+
+        future = self.executor.submit(func, *args)
+        token = object()
+        if key is not None:
+            self.latest[key] = (token, future)
+        future.add_done_callback(lambda f: self.results.put((token, key, f, on_done, on_error)))
+
+        self.pending += 1
+        if self.pending == 1 and self.on_busy:
+            self.on_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+        return future
+
+    def post(self, func, *args):
+        # Safe to call from a worker thread: func(*args) runs on the Tk loop.
+        # Used for progress updates from long tasks.
+        self.calls.put((func, args))
+
+    def _poll(self):
+        while True:
+            try:
+                func, args = self.calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+
+        while True:
+            try:
+                token, key, future, on_done, on_error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            self._finish(token, key, future, on_done, on_error)
+
+        if self.pending == 0 and self.on_busy:
+            self.on_busy(False)
+        if self.pending:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _finish(self, token, key, future, on_done, on_error):
+        if future.cancelled():
+            return
+        if key is not None:
+            if self.latest.get(key, (None,))[0] is not token:
+                return
+            del self.latest[key]
+
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                messagebox.showerror("Error", str(error))
+        elif on_done:
+            on_done(future.result())
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Tests live one level below the application modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+import connection
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    # A freshly migrated database file per test, with an empty query cache.
+    path = str(tmp_path / "expenses.db")
+    connection.set_db_name(path)
+    cache.configure(cache.DEFAULT_MAX_BYTES)
+    database.connect_db()
+    yield path
+    connection.close_all()
@@ -0,0 +1,35 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench_database
+
+
+def test_sizes_parse_and_label():
+    assert [bench_database.parse_size(s) for s in ("10k", "1.5M", "250")] == [10_000, 1_500_000, 250]
+    assert [bench_database.size_label(n) for n in (10_000, 2_000_000, 1_500)] == ["10k", "2M", "1500"]
+
+
+def test_compare_flags_only_slow_enough_regressions():
+    baseline = {"meta": {"commit": "abc"}, "results": {"10k": {
+        "a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}, "tiny": {"median_ms": 0.1}}}}
+    results = {"10k": {"a": {"median_ms": 11.0}, "b": {"median_ms": 15.0}, "tiny": {"median_ms": 0.5},
+                       "new": {"median_ms": 99.0}}}
+    assert bench_database.compare(results, baseline, tolerance=0.2, min_ms=1.0) == ["10k b 1.50x"]
+
+
+def test_run_size_deletes_distinct_ids(tmp_path, monkeypatch):
+    deleted = []
+    delete = bench_database.database.delete_transactions
+    monkeypatch.setattr(bench_database.database, "delete_transactions",
+                        lambda ids: deleted.append(list(ids)) or delete(ids))
+    args = argparse.Namespace(days=60, skew=1.0, seed=0, repeat=2, ops=2, delete_rows=150, only=None,
+                              data_dir=str(tmp_path / "data"))
+    os.makedirs(args.data_dir)
+    results = bench_database.run_size(200, args, str(tmp_path))
+
+    assert {"get_summary", "export", "delete", "undo", "add_transaction"} <= set(results)
+    assert [len(set(ids)) for ids in deleted] == [150, 150]
+    assert results["delete"]["rows"] == 150
@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+
+import analytics
+import cache
+import connection
+import database
+
+
+def in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_month_and_year_keys_are_normalized():
+    assert cache._normalize_filters("6", "2024", "Food") == ("06", "2024", "Food")
+    assert cache._normalize_filters("All", "", None) == (None, None, None)
+
+
+def test_invalid_month_or_year_matches_nothing(db):
+    database.add_transaction("2024-06-01", "Food", 5, "Expense", "lunch")
+    for month, year in (("ab", None), ("13", "2024"), (None, "20x4")):
+        assert database.count_transactions(month, year) == 0
+        assert len(database.get_all_transactions(month, year)) == 0
+        assert database.get_transactions_page(month, year) == []
+        assert database.search_transactions("lunch", month, year) == []
+    assert database.count_transactions("6", "2024") == 1
+
+
+def test_new_thread_does_not_invalidate_other_threads_entries(db):
+    database.add_transaction("2024-06-01", "Food", 5, "Expense")
+    assert database.count_transactions() == 1
+    hits = cache.stats()["hits"]
+
+    assert in_thread(database.count_transactions) == 1
+    assert database.count_transactions() == 1
+    assert cache.stats()["hits"] == hits + 2
+    assert cache.stats()["invalidations"] == 0
+
+
+def test_write_from_another_connection_invalidates(db):
+    database.add_transaction("2024-06-01", "Food", 5, "Expense")
+    assert database.count_transactions() == 1
+
+    other = sqlite3.connect(db)
+    with other:
+        other.execute("INSERT INTO transactions (date, category_id, amount_cents, type_id) "
+                      "SELECT '2024-06-02', category_id, amount_cents, type_id FROM transactions")
+    other.close()
+    assert database.count_transactions() == 2
+
+
+def test_analytics_and_data_state_see_writes_from_another_connection(db):
+    database.add_transaction("2024-06-01", "Food", 5, "Expense")
+    assert analytics.snapshot().category_totals("Expense") == {"Food": 5}
+    state = connection.data_state()
+
+    other = sqlite3.connect(db)
+    with other:
+        other.execute("INSERT INTO transactions (date, category_id, amount_cents, type_id) "
+                      "SELECT '2024-06-02', category_id, amount_cents, type_id FROM transactions")
+    other.close()
+    assert analytics.snapshot().category_totals("Expense") == {"Food": 10}
+    assert connection.data_state() != state
@@ -0,0 +1,53 @@
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+
+from matplotlib.figure import Figure
+
+import charts
+import database
+
+
+@pytest.fixture
+def ledger(db):
+    rows = []
+    for day in range(1, 29):
+        rows.append((f"2024-01-{day:02d}", "Food", 10 + day, "Expense", ""))
+        rows.append((f"2024-03-{day:02d}", "Bills", 20.25, "Expense", ""))
+    rows.append(("2024-01-15", "Salary", 1000, "Income", ""))
+    database.add_transactions(rows)
+    return db
+
+
+@pytest.mark.parametrize("kind", sorted(charts.CHARTS))
+def test_charts_draw_and_update_in_place(ledger, kind):
+    data, _ = charts.load(kind)
+    chart = charts.CHARTS[kind]()
+    fig = Figure(figsize=chart.figsize)
+    chart.draw(fig, data)
+    fig.canvas.draw()
+
+    database.add_transaction("2024-03-02", "Food", 7.5, "Expense", "")
+    data, _ = charts.load(kind)
+    if chart.update(data):
+        fig.canvas.draw()
+
+
+def test_time_series_labels_keep_cents(ledger):
+    data, _ = charts.load("monthly", ("2024-03-01", "2024-03-28"))
+    chart = charts.TimeSeriesChart()
+    chart.draw(Figure(figsize=chart.figsize), data)
+    assert data["granularity"] == "day"
+    assert "$20.25" in [label.get_text() for label in chart.labels]
+
+
+def test_time_series_zoom_rescales_y(ledger):
+    chart = charts.TimeSeriesChart()
+    chart.draw(Figure(figsize=chart.figsize), charts.load("monthly")[0])
+    full = chart.ax.get_ylim()[1]
+
+    data, _ = charts.load("monthly", ("2024-03-01", "2024-03-28"))
+    assert chart.update(data)
+    assert chart.ax.get_ylim()[1] < full
+    assert chart.ax.get_ylim()[1] == pytest.approx(20.25 * 1.1)
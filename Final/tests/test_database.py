@@ -0,0 +1,48 @@
+import pytest
+
+import database
+
+
+def test_default_category_follows_use_per_type(db):
+    assert database.get_default_category("Income") == database.get_categories()[0]
+    database.add_transactions([("2024-01-01", "Salary", 900, "Income", ""),
+                               ("2024-01-02", "Food", 5, "Expense", ""),
+                               ("2024-01-03", "Transport", 3, "Expense", ""),
+                               ("2024-01-04", "Transport", 4, "Expense", "")])
+    assert database.get_default_category("Income") == "Salary"
+    assert database.get_default_category("Expense") == "Transport"
+
+
+def test_delete_category_names_the_table_that_uses_it(db):
+    database.add_category("Travel")
+    database.add_transaction("2024-01-01", "Travel", 5, "Expense", "")
+    with pytest.raises(ValueError, match="used by transactions"):
+        database.delete_category("Travel")
+
+    ids = [row[0] for row in database.get_all_transactions(category="Travel")]
+    database.delete_transactions(ids)
+    with pytest.raises(ValueError, match="restored with Undo"):
+        database.delete_category("Travel")
+
+
+def test_search_ranks_every_match_not_just_the_newest(db):
+    # The best match is the oldest row, behind more than 5000 newer and
+    # weaker ones.
+    rows = [("2020-01-01", "Food", 5, "Expense", "sushi")]
+    rows += [("2024-01-01", "Food", 5, "Expense", "lunch with the team, sushi place downtown near the office")] * 6000
+    database.add_transactions(rows)
+    results = database.search_transactions("sushi", limit=3)
+    assert len(results) == 3
+    assert results[0][1] == "2020-01-01"
+    filtered = database.search_transactions("sushi", year="2020", limit=3)
+    assert [r[1] for r in filtered] == ["2020-01-01"]
+
+
+@pytest.mark.parametrize("bad_date", ["", "n/a"])
+def test_month_filter_ignores_malformed_dates(db, bad_date):
+    database.add_transactions([("2023-03-04", "Food", 5, "Expense", ""),
+                               ("2024-03-05", "Food", 6, "Expense", ""),
+                               ("2024-04-01", "Food", 7, "Expense", "")])
+    assert len(database.get_all_transactions(month="03")) == 2
+    database.add_transactions([(bad_date, "Food", 8, "Expense", "")])
+    assert len(database.get_all_transactions(month="03")) == 2
@@ -0,0 +1,39 @@
+import pytest
+
+import database
+import importer
+
+
+def test_validate_row_zero_pads_dates():
+    row = {"date": "2024-1-5", "category": "Food", "amount": "2.50", "type": "Expense"}
+    assert importer.validate_row(row) == ("2024-01-05", "Food", 250, "Expense", "")
+
+
+@pytest.mark.parametrize("date", ["", "2024-13-01", "2024-02-30", "01/05/24"])
+def test_validate_row_rejects_bad_dates(date):
+    row = {"date": date, "category": "Food", "amount": "1", "type": "Expense"}
+    with pytest.raises(ValueError):
+        importer.validate_row(row)
+
+
+def test_import_csv_with_bom_and_unpadded_dates(db, tmp_path):
+    path = tmp_path / "excel.csv"
+    path.write_bytes("Date,Category,Amount,Type\r\n2024-1-5,Food,0.29,Expense\r\n2024-01-06,Food,x,Expense\r\n"
+                     .encode("utf-8-sig"))
+    report = importer.import_file(str(path))
+    assert (report.imported, report.rejected) == (1, 1)
+    assert report.errors[0][0] == 3
+
+    rows = database.get_all_transactions(month="01", year="2024")
+    assert [(t.date, t.amount_cents) for t in rows] == [("2024-01-05", 29)]
+    assert database.get_date_range() == ("2024-01-05", "2024-01-05")
+
+
+def test_import_jsonl_reports_bad_lines(db, tmp_path):
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"date": "2024-02-01", "category": "Pay", "amount": 1000, "type": "Income"}\n'
+                    '{not json}\n'
+                    '["2024-02-02"]\n', encoding="utf-8")
+    report = importer.import_file(str(path))
+    assert (report.imported, report.rejected) == (1, 2)
+    assert [line for line, _ in report.errors] == [2, 3]
@@ -0,0 +1,53 @@
+import pytest
+
+import connection
+import metrics
+
+
+@pytest.fixture
+def recording(db):
+    metrics.registry.reset()
+    metrics.enable()
+    yield metrics.registry
+    metrics.enable(False)
+    metrics.registry.reset()
+
+
+def stats_for(registry, sql):
+    return next(s for s in registry.snapshot() if s["sql"] == sql)
+
+
+def test_fetched_rows_are_counted(recording):
+    with connection.get_connection() as conn:
+        conn.execute("SELECT name FROM categories").fetchall()
+    s = stats_for(recording, "SELECT name FROM categories")
+    assert s["rows"] == 8 and s["unfetched"] == 0
+    assert metrics.row_count(s) == "8"
+
+
+def test_statements_never_fetched_are_marked(recording):
+    with connection.get_connection() as conn:
+        conn.execute("PRAGMA journal_mode").close()
+        conn.execute("PRAGMA journal_mode").fetchone()
+    s = stats_for(recording, "PRAGMA journal_mode")
+    assert (s["calls"], s["rows"], s["unfetched"]) == (2, 1, 1)
+    assert metrics.row_count(s) == "1+"
+    assert "1+" in metrics.report()
+
+
+def test_every_slow_statement_is_logged(recording, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 0)
+    caplog.set_level("WARNING", logger="expenses.sql")
+    with connection.transaction() as conn:
+        conn.execute("DELETE FROM transactions WHERE id = ?", (1,))
+        conn.execute("DELETE FROM transactions WHERE id = ?", (2,))
+        conn.executemany("UPDATE transactions SET note = ? WHERE id = ?", [("a", 1), ("b", 2)])
+    logged = [r.getMessage() for r in caplog.records]
+
+    delete = "DELETE FROM transactions WHERE id = ?"
+    assert sum(delete in m for m in logged) == 2
+    assert stats_for(recording, delete)["slow"] == 2
+    assert "transactions" in stats_for(recording, delete)["plan"]
+    assert "transactions" in stats_for(recording, "UPDATE transactions SET note = ? WHERE id = ?")["plan"]
+    assert any("BEGIN IMMEDIATE" in m for m in logged)
+    assert stats_for(recording, "BEGIN IMMEDIATE")["plan"] is None
@@ -0,0 +1,61 @@
+import pytest
+
+import connection
+import database
+import importer
+import schema
+from records import ColumnStore, to_cents
+
+
+def test_to_cents_rounds_half_up_from_the_decimal_text():
+    assert to_cents(0.29) == 29
+    assert to_cents(0.285) == 29
+    assert to_cents("-1.005") == -101
+
+
+@pytest.mark.parametrize("amount", ["abc", "nan", "inf", 1e20, "1e30", -1e17])
+def test_to_cents_rejects_bad_and_out_of_range_amounts(amount):
+    with pytest.raises(ValueError):
+        to_cents(amount)
+
+
+def test_importer_reports_out_of_range_amount_as_invalid_row():
+    row = {"date": "2024-01-01", "category": "Food", "amount": "1e30", "type": "Expense"}
+    with pytest.raises(ValueError):
+        importer.validate_row(row)
+
+
+def test_cents_migration_rounds_like_to_cents(tmp_path):
+    connection.set_db_name(str(tmp_path / "old.db"))
+    try:
+        schema.migrate(target=4)
+        with connection.transaction() as conn:
+            conn.executemany("INSERT INTO transactions (date, category, amount, type) VALUES (?, ?, ?, ?)",
+                             [("2024-01-01", "Food", 0.285, "Expense"), ("2024-01-02", "Food", 0.29, "Expense")])
+        schema.migrate(target=5)
+        with connection.get_connection() as conn:
+            cents = [c for c, in conn.execute("SELECT amount_cents FROM transactions ORDER BY id")]
+        assert cents == [to_cents(0.285), to_cents(0.29)] == [29, 29]
+    finally:
+        connection.close_all()
+
+
+def test_cached_column_store_is_not_shared(db):
+    database.add_transaction("2024-01-01", "Food", 5, "Expense", "lunch")
+    first = database.get_all_transactions()
+    first.amounts[0] = 1
+    first.notes.clear()
+    again = database.get_all_transactions()
+    assert again[0].amount == 5
+    assert again[0].note == "lunch"
+
+
+def test_column_store_extends_in_chunks(monkeypatch):
+    monkeypatch.setattr(ColumnStore, "CHUNK_SIZE", 3)
+    store = ColumnStore({1: "Food"}, {2: "Expense"})
+    store.extend((i, 738000 + i, 1, i * 100, 2, None, "n" if i == 5 else None) for i in range(1, 8))
+    assert len(store) == 7
+    assert [t.amount for t in store] == [1, 2, 3, 4, 5, 6, 7]
+    assert store.notes == {4: "n"}
+    store.extend(iter(()))
+    assert len(store) == 7
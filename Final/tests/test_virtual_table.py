@@ -0,0 +1,88 @@
+import tkinter as tk
+
+from virtual_table import VirtualTable
+
+
+class FakeTree:
+    # The parts of ttk.Treeview that VirtualTable uses, without a display.
+
+    def __init__(self):
+        self.items = []
+        self.values = {}
+        self.counter = 0
+
+    def insert(self, parent, index, values):
+        self.counter += 1
+        item = f"I{self.counter}"
+        self.values[item] = values
+        self.items.insert(len(self.items) if index == tk.END else index, item)
+        return item
+
+    def delete(self, *items):
+        for item in items:
+            self.items.remove(item)
+            del self.values[item]
+
+    def exists(self, item):
+        return item in self.values
+
+    def get_children(self):
+        return list(self.items)
+
+    def yview(self):
+        return 0.0, 1.0
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def configure(self, **options):
+        pass
+
+    def after_idle(self, func):
+        pass
+
+
+class FakeScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        pass
+
+
+def make_fetch(rows):
+    # rows sorted by (date, id) descending, like get_transactions_page().
+    def fetch_page(after=None, before=None, limit=None):
+        if after is not None:
+            return [r for r in rows if (r[1], r[0]) < after][:limit]
+        if before is not None:
+            return [r for r in rows if (r[1], r[0]) > before][-limit:]
+        return rows[:limit]
+    return fetch_page
+
+
+def test_removing_every_loaded_row_loads_the_next_ones():
+    rows = [(i, f"2024-01-{31 - i // 10:02d}", "Food", 1.0, "Expense", "") for i in range(25)]
+    tree = FakeTree()
+    table = VirtualTable(tree, FakeScrollbar(), page_size=10)
+    fetch = make_fetch(rows)
+    table.load(fetch)
+
+    deleted = {tree.values[item][0] for item in tree.get_children()}
+    rows[:] = [r for r in rows if r[0] not in deleted]
+    table.remove(tree.get_children())
+
+    assert [tree.values[item] for item in tree.get_children()] == rows[:10]
+    assert table.has_after
+
+
+def test_remove_skips_items_gone_after_a_reload():
+    rows = [(i, "2024-01-01", "Food", 1.0, "Expense", "") for i in range(5)]
+    tree = FakeTree()
+    table = VirtualTable(tree, FakeScrollbar(), page_size=10)
+    table.load(make_fetch(rows))
+    stale = tree.get_children()[:2]
+    table.load(make_fetch(rows))
+
+    table.remove(stale)
+    assert len(tree.get_children()) == 5
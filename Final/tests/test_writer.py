@@ -0,0 +1,26 @@
+import sqlite3
+
+import pytest
+
+import database
+from writer import WriteQueue
+
+
+def test_bad_rows_do_not_fail_their_group(db):
+    # A long delay so all rows land in one group.
+    with WriteQueue(max_delay=0.5) as writes:
+        futures = [writes.add("2024-01-01", "Food", 1, "Expense"),
+                   writes.add("2024-01-01", "Food", 1e20, "Expense"),
+                   writes.add("2024-01-01", "Food", 2, "Expense", object()),
+                   writes.add("2024-01-01", "Brand new", 5, "Sideways"),
+                   writes.add("2024-01-01", "Food", 3, "Expense")]
+    assert writes.commits == 1
+    with pytest.raises(ValueError):
+        futures[1].result()
+    with pytest.raises(sqlite3.Error):
+        futures[2].result()
+    with pytest.raises(ValueError):
+        futures[3].result()
+    ids = [futures[0].result(), futures[4].result()]
+    assert sorted(t[0] for t in database.get_all_transactions()) == sorted(ids)
+    assert "Brand new" not in database.get_categories()
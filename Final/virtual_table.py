@@ -0,0 +1,136 @@
+import tkinter as tk
+
+
+class VirtualTable:
+    # Shows a large result set in a Treeview by keeping only a window of
+    # max_pages pages in the widget. Pages are fetched with keyset pagination
+    # as the view nears either end and dropped from the opposite end.
+
+    def __init__(self, tree, scrollbar, page_size=200, max_pages=5):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.fetch_page = None
+        self.pages = []
+        self.has_before = False
+        self.has_after = False
+        self._check_pending = False
+
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.scrollbar.configure(command=self.tree.yview)
+
+    @staticmethod
+    def _key(row):
+        return row[1], row[0]
+
+    def load(self, fetch_page, rows=None):
+        # fetch_page(after=None, before=None, limit=...) returns rows in
+        # (date, id) descending order. The first page may be passed in when it
+        # was already fetched off the Tk thread.
+        self.fetch_page = fetch_page
+        self.tree.delete(*self.tree.get_children())
+        self.pages = []
+        self.has_before = False
+
+        if rows is None:
+            rows = fetch_page(limit=self.page_size)
+        self.has_after = len(rows) == self.page_size
+        if rows:
+            self.pages.append(self._insert(rows, tk.END))
+        self.tree.yview_moveto(0)
+
+    def _insert(self, rows, index):
+        # A page remembers the keys of its first and last row so the next
+        # fetch does not depend on values read back from Tk.
+        items = []
+        for row in rows:
+            item = self.tree.insert("", index, values=row)
+            if index != tk.END:
+                index += 1
+            items.append(item)
+        return [items, self._key(rows[0]), self._key(rows[-1])]
+
+    def _on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self._check_pending:
+            self._check_pending = True
+            # Never change the tree from inside its own scroll callback.
+            self.tree.after_idle(self._check_edges)
+
+    def _loaded_count(self):
+        return sum(len(items) for items, _, _ in self.pages)
+
+    def _check_edges(self):
+        self._check_pending = False
+        if not self.pages:
+            return
+        first, last = (float(f) for f in self.tree.yview())
+        if last > 0.9 and self.has_after:
+            self._load_after()
+        elif first < 0.1 and self.has_before:
+            self._load_before()
+
+    def _load_after(self):
+        rows = self.fetch_page(after=self.pages[-1][2], limit=self.page_size)
+        self.has_after = len(rows) == self.page_size
+        if not rows:
+            return
+        first = float(self.tree.yview()[0])
+        before = self._loaded_count()
+        self.pages.append(self._insert(rows, tk.END))
+
+        dropped = 0
+        if len(self.pages) > self.max_pages:
+            items = self.pages.pop(0)[0]
+            self.tree.delete(*items)
+            dropped = len(items)
+            self.has_before = True
+        # Keep the same rows in view after the window shifted.
+        self.tree.yview_moveto((first * before - dropped) / self._loaded_count())
+
+    def _load_before(self):
+        rows = self.fetch_page(before=self.pages[0][1], limit=self.page_size)
+        self.has_before = len(rows) == self.page_size
+        if not rows:
+            return
+        first = float(self.tree.yview()[0])
+        before = self._loaded_count()
+        self.pages.insert(0, self._insert(rows, 0))
+
+        if len(self.pages) > self.max_pages:
+            self.tree.delete(*self.pages.pop()[0])
+            self.has_after = True
+        self.tree.yview_moveto((first * before + len(rows)) / self._loaded_count())
+
+    def remove(self, items):
+        # Drops rows from the loaded window without refetching. Page keys stay
+        # valid as cursors even when the rows they came from are gone. Items
+        # no longer in the tree, e.g. after a reload, are skipped.
+        removed = {item for item in items if self.tree.exists(item)}
+        if not removed:
+            return
+        self.tree.delete(*removed)
+        for page in self.pages:
+            page[0][:] = [item for item in page[0] if item not in removed]
+        window = self.pages
+        self.pages = [page for page in self.pages if page[0]]
+        if not self.pages:
+            # With nothing left loaded, scrolling cannot load anything either:
+            # refill from just past the removed window, or just before it.
+            self._refill(window[0][1], window[-1][2])
+
+    def _refill(self, first_key, last_key):
+        if self.has_after:
+            rows = self.fetch_page(after=last_key, limit=self.page_size)
+            self.has_after = len(rows) == self.page_size
+            if rows:
+                self.pages.append(self._insert(rows, tk.END))
+                self.tree.yview_moveto(0)
+                return
+        if self.has_before:
+            rows = self.fetch_page(before=first_key, limit=self.page_size)
+            self.has_before = len(rows) == self.page_size
+            if rows:
+                self.pages.append(self._insert(rows, tk.END))
+                self.tree.yview_moveto(1)
@@ -0,0 +1,107 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from connection import is_locked_error, transaction
+from database import insert_transaction
+
+# Every commit costs a WAL append and, at checkpoints, an fsync, and only one
+# connection can write at a time. WriteQueue lets any number of threads add
+# transactions while a single writer thread commits them in groups: it waits
+# for the first row, collects whatever else arrives within max_delay (up to
+# max_batch rows) and commits them together.
+
+MAX_BATCH = 1000
+MAX_DELAY = 0.01
+
+
+class WriteQueue:
+    def __init__(self, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = queue.Queue()
+        self.closed = False
+        self.commits = 0
+        self.rows = 0
+        self.thread = threading.Thread(target=self._run, name="expense-writer", daemon=True)
+        self.thread.start()
+
+    def add(self, date, category, amount, type_, note=""):
+        # Safe to call from any thread. Returns a Future that resolves to the
+        # new row id once its group is committed, or to the error for a row
+        # that could not be inserted; such rows do not stop the rest of the
+        # group.
+        if self.closed:
+            raise RuntimeError("WriteQueue is closed")
+        future = Future()
+        self.queue.put(((date, category, amount, type_, note), future))
+        return future
+
+    def close(self):
+        # Commits everything added so far and stops the writer thread.
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with transaction() as conn:
+                for row, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    # A savepoint per row undoes a category created for a
+                    # row whose type or amount then turns out to be invalid,
+                    # or that SQLite refuses. A lock error is not about the
+                    # row and fails the whole group.
+                    conn.execute("SAVEPOINT queued_row")
+                    try:
+                        results.append((future, insert_transaction(conn, row), None))
+                    except (ValueError, OverflowError, sqlite3.Error) as e:
+                        if is_locked_error(e):
+                            raise
+                        conn.execute("ROLLBACK TO queued_row")
+                        results.append((future, None, e))
+                    conn.execute("RELEASE queued_row")
+        except Exception as e:
+            for row, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.commits += 1
+        for future, row_id, error in results:
+            if error is None:
+                self.rows += 1
+                future.set_result(row_id)
+            else:
+                future.set_exception(error)